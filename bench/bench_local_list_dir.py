@@ -0,0 +1,99 @@
+"""Benchmark: LocalDiskClient.list_dir on a synthetic 100k-entry directory.
+
+Compares the old implementation (os.listdir + per-entry Path.is_dir/is_file/stat on the event loop,
+truncated to 500) with the scandir-based paginated listing, and measures event-loop stalls.
+
+Run: PYTHONPATH=src python bench/bench_local_list_dir.py [entries]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.storage import LocalDiskClient
+
+
+async def legacy_list_dir(root: Path, path: str, cap: int | None = 500) -> list[dict]:
+    # Pre-scandir implementation, kept here only as the baseline.
+    base = (root / path.lstrip("/")).resolve()
+    out: list[dict] = []
+    for name in sorted(os.listdir(base))[:cap]:
+        full = base / name
+        if full.is_dir():
+            out.append({"name": name, "type": "dir", "path": path.rstrip("/") + "/" + name})
+        elif full.is_file():
+            st = full.stat()
+            out.append({"name": name, "type": "file", "path": path.rstrip("/") + "/" + name, "size": int(st.st_size), "modified": None})
+    return out
+
+
+async def measure(coro_factory) -> tuple[float, float, object]:
+    """Return (wall seconds, max event-loop stall seconds, result)."""
+    stall = 0.0
+    done = False
+
+    async def ticker() -> None:
+        nonlocal stall
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stall = max(stall, now - last - 0.001)
+            last = now
+
+    t = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    t0 = time.perf_counter()
+    result = await coro_factory()
+    wall = time.perf_counter() - t0
+    done = True
+    await t
+    return wall, stall, result
+
+
+async def main(entries: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        big = Path(tmp) / "big"
+        big.mkdir()
+        t0 = time.perf_counter()
+        for i in range(entries):
+            if i % 50 == 0:
+                (big / f"dir_{i:07d}").mkdir()
+            else:
+                with open(big / f"file_{i:07d}.pdf", "wb") as f:
+                    f.write(b"x" * (i % 97))
+        print(f"created {entries} entries in {time.perf_counter() - t0:.1f}s")
+
+        wall, stall, res = await measure(lambda: legacy_list_dir(Path(tmp), "/big"))
+        print(f"legacy  : {wall * 1000:8.1f} ms, max loop stall {stall * 1000:8.1f} ms, entries returned {len(res)} (truncated)")
+        wall, stall, res = await measure(lambda: legacy_list_dir(Path(tmp), "/big", cap=None))
+        print(f"legacy* : {wall * 1000:8.1f} ms, max loop stall {stall * 1000:8.1f} ms, entries returned {len(res)} (no 500 cap)")
+
+        client = LocalDiskClient(tmp)
+
+        async def full_paged() -> list[dict]:
+            out: list[dict] = []
+            while True:
+                page = await client.list_dir("/big", limit=200, offset=len(out))
+                out.extend(page)
+                if len(page) < 200:
+                    return out
+
+        wall, stall, res = await measure(full_paged)
+        print(f"scandir : {wall * 1000:8.1f} ms, max loop stall {stall * 1000:8.1f} ms, entries returned {len(res)} (all pages of 200)")
+
+        client = LocalDiskClient(tmp)
+        wall, stall, res = await measure(lambda: client.list_dir("/big", limit=200, offset=0))
+        print(f"1st page: {wall * 1000:8.1f} ms, max loop stall {stall * 1000:8.1f} ms (cold scan)")
+        wall, stall, res = await measure(lambda: client.list_dir("/big", limit=200, offset=50_000))
+        print(f"deep pg : {wall * 1000:8.1f} ms, max loop stall {stall * 1000:8.1f} ms (cached listing)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
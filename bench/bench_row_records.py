@@ -0,0 +1,77 @@
+"""Benchmark: per-row dicts vs records for a catalog page (fetch_children) and an audit page.
+
+Run: PYTHONPATH=src python bench/bench_row_records.py [children]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+from adaspeas.common.records import CatalogEntry, from_rows
+
+_CHILDREN_SQL = """
+SELECT id, kind, title, size_bytes, path
+FROM catalog_items
+WHERE parent_path IS ? AND is_deleted=0
+ORDER BY kind DESC, title ASC
+LIMIT ? OFFSET ?
+"""
+
+
+def as_dicts(rows):
+    # Previous shape of fetch_children results.
+    return [{"id": int(r[0]), "kind": r[1], "title": r[2], "size_bytes": r[3]} for r in rows]
+
+
+def as_records(rows):
+    return from_rows(CatalogEntry, rows)
+
+
+def measure(build, rows, rounds: int) -> tuple[float, int]:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        build(rows)
+    per_page_us = (time.perf_counter() - t0) / rounds * 1e6
+    # Retained memory per page, amortized over many pages.
+    pages = max(1, 20_000 // max(1, len(rows)))
+    tracemalloc.start()
+    keep = [build(rows) for _ in range(pages)]
+    retained, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del keep
+    return per_page_us, retained // pages
+
+
+async def main(children: int) -> None:
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            await db.executemany(
+                "INSERT INTO catalog_items(path, kind, title, parent_path, size_bytes) VALUES (?, 'file', ?, '/', ?)",
+                [(f"/f{i:06d}.pdf", f"f{i:06d}.pdf", i) for i in range(children)],
+            )
+            await db.commit()
+            for page in (25, 200, children):
+                cur = await db.execute(_CHILDREN_SQL, ("/", page, 0))
+                rows = await cur.fetchall()
+                rounds = max(10, 200_000 // max(1, len(rows)))
+                t_d, m_d = measure(as_dicts, rows, rounds)
+                t_r, m_r = measure(as_records, rows, rounds)
+                print(
+                    f"page={len(rows):7d}: dicts {t_d:10.1f} us {m_d / 1024:9.1f} KiB | "
+                    f"records {t_r:10.1f} us {m_r / 1024:9.1f} KiB"
+                )
+        finally:
+            await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000))
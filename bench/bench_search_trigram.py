@@ -0,0 +1,95 @@
+"""Benchmark: substring search via the trigram index vs the LIKE scan it replaces.
+
+Builds a synthetic catalog (folders of ~200 documents with numbered titles), then times a search page
+for infix queries through search_catalog_items_page and through the old LIKE fallback query.
+
+Run: PYTHONPATH=src python bench/bench_search_trigram.py [items]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+
+_LIKE_SQL = """
+SELECT id, kind, title, size_bytes, path
+FROM catalog_items
+WHERE is_deleted=0
+  AND path LIKE '/%'
+  AND (title LIKE ? ESCAPE '\\' OR path LIKE ? ESCAPE '\\')
+ORDER BY kind DESC, title ASC, id ASC
+LIMIT 26
+"""
+
+_WORDS = ["Приказ", "Отчёт", "Договор", "Протокол", "Инструкция", "Report", "Manual", "Invoice"]
+_QUERIES = ["2345", "АБ-10", "оговор 1", "anua", "ротокол", "77777"]
+
+
+def _rows(items: int):
+    rnd = random.Random(42)
+    rows = [("/", "folder", "root", None)]
+    folders = max(1, items // 200)
+    for f in range(folders):
+        rows.append((f"/d{f:05d}", "folder", f"Раздел {f}", "/"))
+    for i in range(items):
+        f = i % folders
+        title = f"{rnd.choice(_WORDS)} АБ-{rnd.randrange(10**6):06d}"
+        rows.append((f"/d{f:05d}/{title} ({i}).pdf", "file", title, f"/d{f:05d}"))
+    return rows
+
+
+async def _time(fn, rounds: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        await fn()
+    return (time.perf_counter() - t0) / rounds * 1000
+
+
+async def main(items: int) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bench.sqlite")
+        db = await db_mod.connect(path)
+        try:
+            await db_mod.ensure_schema(db)
+            # Load with the index backfill pending, then fill it the way the worker does.
+            await db_mod.request_backfill(db, "catalog_trgm")
+            await db.executemany(
+                "INSERT INTO catalog_items(path, kind, title, parent_path) VALUES (?, ?, ?, ?)",
+                _rows(items),
+            )
+            await db.commit()
+            t0 = time.perf_counter()
+            while await db_mod.run_backfill_batch(db, "catalog_trgm", batch_size=5000):
+                pass
+            build_s = time.perf_counter() - t0
+            cur = await db.execute("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'catalog_items_trgm%'")
+            size = (await cur.fetchone())[0] or 0
+            print(f"items={items}: trigram backfill {build_s:.1f} s, index {size / 2**20:.1f} MiB")
+
+            for q in _QUERIES:
+                like = f"%{db_mod._like_escape(q)}%"
+
+                async def via_like():
+                    cur = await db.execute(_LIKE_SQL, (like, like))
+                    return await cur.fetchall()
+
+                async def via_index():
+                    return await db_mod.search_catalog_items_page(db, query=q, scope_path="/", limit=25)
+
+                hits = len((await via_index())[0])
+                t_like = await _time(via_like, 3)
+                t_idx = await _time(via_index, 20)
+                print(f"{q!r:>12}: LIKE {t_like:9.2f} ms | index {t_idx:8.2f} ms  ({hits} on page)")
+        finally:
+            await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000))
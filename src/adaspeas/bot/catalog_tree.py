@@ -0,0 +1,110 @@
+"""In-memory snapshot of the live catalog for bot navigation.
+
+One read of catalog_items (plus folder sizes) builds id -> CatalogEntry, path -> id and, per folder,
+an array('q') of child ids in the UI order (kind DESC, title, id) -- the same order as
+db.fetch_children_page, so keyset cursors from either source stay valid. A page is a bisect plus a
+slice. The snapshot is immutable and tagged with the catalog version it was read at; the bot swaps
+in a new one when the version changes (see load_catalog_tree).
+
+Memory is bounded by max_items (a bigger catalog is not loaded and navigation stays on SQLite);
+nbytes is an estimate of the snapshot's footprint for /ready and metrics.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from adaspeas.common import db as db_mod
+from adaspeas.common.records import CatalogEntry
+
+
+def _order_key(e: CatalogEntry) -> tuple[int, str, int]:
+    # kind DESC puts folders before files; SQLite BINARY title order == code point order.
+    return (0 if e.kind == "folder" else 1, e.title or "", e.id)
+
+
+class CatalogTree:
+    def __init__(self, rows, *, version: int | None) -> None:
+        self.version = version
+        self.entries: dict[int, CatalogEntry] = {}
+        self.by_path: dict[str, int] = {}
+        self.sizes: dict[int, int] = {}
+        children: dict[int, list[CatalogEntry]] = {}
+        for item_id, kind, title, size_bytes, path, parent_id, folder_size in rows:
+            e = CatalogEntry(int(item_id), kind, title, size_bytes, path)
+            self.entries[e.id] = e
+            self.by_path[path] = e.id
+            if folder_size:
+                self.sizes[e.id] = int(folder_size)
+            if parent_id is not None:
+                children.setdefault(int(parent_id), []).append(e)
+        self.children: dict[int, array] = {}
+        for folder_id, kids in children.items():
+            kids.sort(key=_order_key)
+            self.children[folder_id] = array("q", (k.id for k in kids))
+        self.nbytes = self._estimate_nbytes()
+
+    def _estimate_nbytes(self) -> int:
+        size = sys.getsizeof(self.entries) + sys.getsizeof(self.by_path) + sys.getsizeof(self.children)
+        size += sys.getsizeof(self.sizes)
+        for e in self.entries.values():
+            size += sys.getsizeof(e) + sys.getsizeof(e.title) + sys.getsizeof(e.path) + sys.getsizeof(e.id)
+        for ids in self.children.values():
+            size += sys.getsizeof(ids)
+        return size
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, item_id: int) -> CatalogEntry | None:
+        return self.entries.get(int(item_id))
+
+    def folder(self, path: str) -> CatalogEntry | None:
+        item_id = self.by_path.get(path)
+        e = self.entries.get(item_id) if item_id is not None else None
+        return e if e is not None and e.kind == "folder" else None
+
+    def child_count(self, folder_id: int) -> int:
+        ids = self.children.get(int(folder_id))
+        return len(ids) if ids is not None else 0
+
+    def folder_size(self, folder_id: int) -> int | None:
+        return self.sizes.get(int(folder_id))
+
+    def children_page(
+        self,
+        folder_id: int,
+        *,
+        limit: int,
+        offset: int = 0,
+        after_id: int | None = None,
+        before_id: int | None = None,
+    ) -> tuple[list[CatalogEntry], bool]:
+        """db.fetch_children_page semantics (offset: legacy buttons); unknown cursors restart at page 1."""
+        ids = self.children.get(int(folder_id)) or array("q")
+        limit = max(1, int(limit))
+        cursor = self.entries.get(int(before_id if before_id is not None else after_id or 0))
+        key = (lambda i: _order_key(self.entries[i]))
+        if cursor is not None and before_id is not None:
+            end = bisect_left(ids, _order_key(cursor), key=key)
+            start = max(0, end - limit)
+            return [self.entries[i] for i in ids[start:end]], start > 0
+        if cursor is not None:
+            start = bisect_right(ids, _order_key(cursor), key=key)
+        else:
+            start = max(0, int(offset))
+        page = ids[start:start + limit]
+        return [self.entries[i] for i in page], start + limit < len(ids)
+
+
+async def load_catalog_tree(db, *, max_items: int, version: int | None) -> CatalogTree | None:
+    """Read a snapshot of the live catalog; None when it has more than max_items rows."""
+    if max_items <= 0:
+        return None
+    rows = await db_mod.fetch_catalog_tree_rows(db, limit=max_items + 1)
+    if len(rows) > max_items:
+        return None
+    return await asyncio.to_thread(CatalogTree, rows, version=version)
@@ -4,6 +4,8 @@ import asyncio
 import os
 import uuid
 import math
+import re
+import time
 
 from aiogram import Bot, Dispatcher, F
 from aiogram.client.session.aiohttp import AiohttpSession
@@ -12,22 +14,36 @@ from aiogram.filters import Command
 from aiogram.types import Message, BotCommand, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
 from aiogram.exceptions import TelegramUnauthorizedError, TelegramNetworkError, TelegramServerError
 from aiohttp import web
-from prometheus_client import Counter, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, generate_latest, CONTENT_TYPE_LATEST
 import structlog
 
+from adaspeas.bot.catalog_tree import CatalogTree, load_catalog_tree
+from adaspeas.bot.webhook import make_webhook_handler, update_lag_middleware
 from adaspeas.common.logging import setup_logging
 from adaspeas.common.settings import Settings
 from adaspeas.common import db as db_mod
-from adaspeas.common.queue import get_redis, enqueue
+from adaspeas.common.cache import TTLCache, get_or_build
+from adaspeas.common.fuzzy import FuzzyIndex
+from adaspeas.common.leader import LeaderLease, default_replica_id
+from adaspeas.common.records import CatalogEntry, User
+from adaspeas.common.queue import get_redis, enqueue, listen_catalog_versions
 
 log = structlog.get_logger()
 
 REQ_TOTAL = Counter("bot_requests_total", "Bot requests total", ["command"])
 JOB_ENQUEUE_TOTAL = Counter("jobs_enqueued_total", "Jobs enqueued total")
+SEARCH_CACHE_TOTAL = Counter("search_cache_total", "Search result cache lookups", ["result"])
+DIR_CACHE_TOTAL = Counter("dir_cache_total", "Rendered catalog page cache lookups", ["result"])
+CATALOG_TREE_ITEMS = Gauge("catalog_tree_items", "Items in the in-memory catalog tree (0: not loaded)")
+CATALOG_TREE_BYTES = Gauge("catalog_tree_bytes", "Estimated memory of the in-memory catalog tree")
+# "Обновлено" on catalog pages lags catalog_last_sync_at by at most this much.
+LAST_SYNC_REFRESH_SEC = 15.0
 
 
-async def make_app(state: dict) -> web.Application:
+async def make_app(state: dict, *, webhook_path: str | None = None) -> web.Application:
     app = web.Application()
+    # Set once the dispatcher is ready (the router is frozen when the app starts).
+    app["webhook"] = {"handler": None}
 
     async def health(_request: web.Request) -> web.Response:
         return web.json_response({"ok": True})
@@ -43,6 +59,10 @@ async def make_app(state: dict) -> web.Application:
                 "last_poll_ok_at": state.get("last_poll_ok_at"),
                 "db": state.get("db"),
                 "redis": state.get("redis"),
+                "catalog_version": state.get("catalog_version"),
+                "catalog_tree": state.get("catalog_tree"),
+                "replica": state.get("replica"),
+                "role": state.get("role"),
                 "last_init_error": state.get("last_init_error"),
             }
         )
@@ -54,10 +74,19 @@ async def make_app(state: dict) -> web.Application:
     async def root(_request: web.Request) -> web.StreamResponse:
         raise web.HTTPFound("/health")
 
+    async def webhook(request: web.Request) -> web.StreamResponse:
+        handler = app["webhook"]["handler"]
+        if handler is None:
+            # Not ready yet: Telegram retries the update later.
+            return web.Response(status=503)
+        return await handler(request)
+
     app.router.add_get("/", root)
     app.router.add_get("/health", health)
     app.router.add_get("/ready", ready)
     app.router.add_get("/metrics", metrics)
+    if webhook_path:
+        app.router.add_post(webhook_path, webhook)
     return app
 
 
@@ -71,12 +100,32 @@ async def main() -> None:
         "last_poll_ok_at": None,
         "db": "starting",
         "redis": "starting",
+        "catalog_version": None,
+        "catalog_tree": None,
+        "replica": (getattr(settings, "bot_replica_id", "") or "").strip() or default_replica_id(),
+        "role": "starting",
         "last_init_error": None,
     }
 
+    # Update intake: long polling (default) or a webhook on this same aiohttp app (behind Caddy).
+    bot_mode = (getattr(settings, "bot_mode", "polling") or "polling").strip().lower()
+    webhook_url = (getattr(settings, "webhook_base_url", "") or "").strip().rstrip("/")
+    webhook_path = "/" + (getattr(settings, "webhook_path", "/tg/webhook") or "/tg/webhook").strip().strip("/")
+    webhook_secret = (getattr(settings, "webhook_secret", "") or "").strip()
+    # The webhook path is public (Caddy); without a secret anyone could post updates as any user, admins included.
+    use_webhook = bot_mode == "webhook" and bool(webhook_url) and bool(webhook_secret)
+    if bot_mode == "webhook" and not webhook_url:
+        log.warning("webhook_base_url_missing_using_polling")
+    elif bot_mode == "webhook" and not webhook_secret:
+        log.warning("webhook_secret_missing_using_polling")
+    # getUpdates allows one consumer: with several polling replicas only the lease holder polls.
+    poll_on_leader_only = not use_webhook and int(getattr(settings, "bot_replicas", 1) or 1) > 1
+    if poll_on_leader_only:
+        log.warning("polling_with_replicas", replicas=int(settings.bot_replicas), hint="set BOT_MODE=webhook")
+
     # Start liveness endpoints ASAP so Docker healthcheck does not depend on Telegram network.
     # Any Telegram/DB failures should surface in logs, but /health must stay responsive.
-    app = await make_app(state)
+    app = await make_app(state, webhook_path=webhook_path if use_webhook else None)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, host="0.0.0.0", port=8080)
@@ -89,14 +138,21 @@ async def main() -> None:
     else:
         bot = Bot(token=settings.bot_token)
     dp = Dispatcher()
+    dp.update.outer_middleware(update_lag_middleware("webhook" if use_webhook else "polling"))
 
 
-    async def _init_db_with_retry() -> db_mod.Connection:
+    async def _init_db_with_retry() -> db_mod.DbPool:
         backoff = 1
         max_backoff = int(getattr(settings, "net_retry_max_sec", 30) or 30)
         while True:
             try:
-                dbi = await db_mod.connect(settings.sqlite_path)
+                # Writer + read-only pool: navigation/search reads do not queue behind writes.
+                dbi = await db_mod.connect_pool(
+                    settings.sqlite_path,
+                    read_pool_size=int(getattr(settings, "sqlite_read_pool_size", 4) or 0),
+                    commit_window_ms=int(getattr(settings, "sqlite_commit_window_ms", 0) or 0),
+                    commit_max_batch=int(getattr(settings, "sqlite_commit_max_batch", 64) or 64),
+                )
                 await db_mod.ensure_schema(dbi)
                 state["db"] = "ok"
                 state["last_init_error"] = None if state.get("redis") == "ok" else state.get("last_init_error")
@@ -150,7 +206,8 @@ async def main() -> None:
             BotCommand(command='sync', description='(admin) Синхронизировать каталог'),
             BotCommand(command='audit', description='(admin) Аудит загрузок'),
             BotCommand(command='stats', description='(admin) Статистика'),
-            BotCommand(command='diag', description='(admin) Диагностика')
+            BotCommand(command='diag', description='(admin) Диагностика'),
+            BotCommand(command='reindex', description='(admin) Переиндексировать поиск')
             ]), timeout=10)
         except Exception:
             # Never fail bot startup because of Telegram UI cosmetics.
@@ -163,6 +220,14 @@ async def main() -> None:
 
     r = await _init_redis_with_retry()
 
+    # Replicas share SQLite and Redis; jobs that must run once (schedulers) run on the lease holder only.
+    leader = LeaderLease(
+        r,
+        "bot",
+        replica_id=state["replica"],
+        ttl_sec=float(getattr(settings, "leader_lease_ttl_sec", 30) or 30),
+    )
+
     # Catalog navigation root (UI читает только SQLite; синхронизацию делает worker по /sync).
     storage_mode = (getattr(settings, "storage_mode", "yandex") or "yandex").strip().lower()
     root_path = (settings.yandex_base_path or "/").strip() if storage_mode != "local" else "/"
@@ -191,7 +256,27 @@ async def main() -> None:
         p = (path or "").rstrip("/")
         return p.rsplit("/", 1)[-1] or "Каталог"
 
-    # Ensure root folder exists in DB (even before first sync).
+    def human_size(n: int) -> str:
+        size = float(n)
+        for unit in ("Б", "КБ", "МБ"):
+            if size < 1024:
+                return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+            size /= 1024
+        return f"{size:.1f} ГБ"
+
+    def parse_page_cursor(page_s: str, cursor_s: str) -> tuple[int, int | None, int | None]:
+        """'<page>', 'a<id>' | 'b<id>' -> (page, after_id, before_id); bad input means page 1."""
+        try:
+            page = max(1, int(page_s))
+            cursor_id = int(cursor_s[1:])
+        except (ValueError, IndexError):
+            return 1, None, None
+        if cursor_s[0] == "a":
+            return page, cursor_id, None
+        if cursor_s[0] == "b":
+            return page, None, cursor_id
+        return 1, None, None
+
     # --- Access control (Milestone 2) ---
     def is_admin(uid: int | None) -> bool:
         if not uid:
@@ -210,6 +295,7 @@ async def main() -> None:
         lines: list[str] = []
         lines.append("Диагностика (bot)")
         lines.append(f"polling={state.get('polling')} db={state.get('db')} redis={state.get('redis')}")
+        lines.append(f"replica={state.get('replica')} role={state.get('role')}")
         if state.get("last_init_error"):
             lines.append(f"last_init_error={state.get('last_init_error')}")
         if state.get("last_poll_error"):
@@ -221,11 +307,18 @@ async def main() -> None:
         try:
             sv = await db_mod.get_schema_version(db)
             lines.append(f"schema_version={sv}")
+            lines.append(f"sqlite_read_pool={getattr(db, 'read_pool_size', 0)}")
             # lightweight counts
             users_by = await db_mod.group_count(db, "users", "status")
             lines.append("users=" + ", ".join([f"{k}:{v}" for k, v in sorted(users_by.items())]) if users_by else "users=0")
             items = await db_mod.count_rows(db, "catalog_items")
             lines.append(f"catalog_items={items}")
+            lines.append(f"catalog_version={state.get('catalog_version')}")
+            if state.get("catalog_tree"):
+                lines.append("catalog_tree=" + ", ".join(f"{k}:{v}" for k, v in state["catalog_tree"].items()))
+            backfills = await db_mod.fetch_backfill_progress(db)
+            if backfills:
+                lines.append("backfills=" + ", ".join(f"{k}:{v}" for k, v in backfills.items()))
         except Exception as e:
             lines.append(f"db_diag_error={e}")
 
@@ -239,11 +332,24 @@ async def main() -> None:
 
         await m.answer("\n".join(lines))
 
+    @dp.message(Command("reindex"))
+    async def cmd_reindex(m: Message) -> None:
+        REQ_TOTAL.labels(command="reindex").inc()
+        uid = int(getattr(m.from_user, "id", 0) or 0)
+        if not is_admin(uid):
+            await m.answer("Команда доступна только администратору.")
+            return
+        # Full rebuild of both search indexes, run by the worker in the background; hits fill back in as it goes.
+        for name in ("catalog_fts", "catalog_trgm"):
+            await db_mod.request_backfill(db, name)
+        log.info("search_reindex_requested", admin_id=uid)
+        await m.answer("Переиндексация поиска поставлена в очередь: worker выполнит её в фоне. Ход — в /diag (backfills).")
 
-    async def ensure_user(uid: int) -> dict:
+
+    async def ensure_user(uid: int) -> User:
         await db_mod.upsert_user(db, uid)
         u = await db_mod.fetch_user_by_tg_user_id(db, uid)
-        return u or {"tg_user_id": uid, "status": "guest", "expires_at": None, "user_note": None}
+        return u or User(tg_user_id=uid)
 
     async def ensure_active(uid: int, *, reply_chat_id: int, reply_cb) -> bool:
         # Admins bypass.
@@ -259,8 +365,8 @@ async def main() -> None:
             pass
 
         u = await ensure_user(uid)
-        status = str(u.get("status") or "guest")
-        expires_at = u.get("expires_at")
+        status = str(u.status or "guest")
+        expires_at = u.expires_at
 
         if status != "active":
             msg = "Доступ не выдан."
@@ -302,17 +408,21 @@ async def main() -> None:
         # Small startup delay.
         await asyncio.sleep(5)
         while True:
+            if not leader.is_leader:
+                # Another replica runs it; check again once the lease could have changed hands.
+                await asyncio.sleep(leader.ttl_sec)
+                continue
             try:
                 await db_mod.expire_users(db)
                 users = await db_mod.fetch_users_expiring_within(db, warn_before)
                 for u in users:
-                    uid = int(u["tg_user_id"])
-                    exp = u.get("expires_at") or "?"
+                    uid = int(u.tg_user_id)
+                    exp = u.expires_at or "?"
                     try:
                         await bot.send_message(chat_id=uid, text=f"Доступ истекает примерно через 24 часа. Срок: {exp} UTC. Напишите /note, если нужно продление.")
                     except Exception:
                         pass
-                    await notify_admins(f"⚠️ Истекает доступ: user_id={uid}, до {exp} UTC, note={u.get('user_note') or ''}")
+                    await notify_admins(f"⚠️ Истекает доступ: user_id={uid}, до {exp} UTC, note={u.user_note or ''}")
                     try:
                         await db_mod.mark_user_warned_24h(db, uid)
                     except Exception:
@@ -324,13 +434,65 @@ async def main() -> None:
             await asyncio.sleep(max(60, interval))
 
 
-    await db_mod.upsert_catalog_item(
-        db,
-        path=root_path,
-        kind="folder",
-        title=title_of(root_path),
-        yandex_id=root_path,
-        parent_path=None,
+    # Catalog tree snapshot for navigation, reloaded in the background when the catalog version changes;
+    # the previous snapshot keeps serving meanwhile. None: disabled or the catalog is over the size cap.
+    tree_cache: dict = {
+        "version": None, "tree": None, "task": None, "loaded": False, "failed_version": None, "failed_at": 0.0, "failures": 0,
+    }
+
+    async def build_catalog_tree(version) -> None:
+        max_items = int(getattr(settings, "catalog_tree_max_items", 200_000) or 0)
+        try:
+            tree = await load_catalog_tree(db, max_items=max_items, version=version)
+        except Exception as e:
+            tree_cache.update(failed_version=version, failed_at=time.monotonic(), failures=tree_cache["failures"] + 1)
+            log.warning("catalog_tree_error", version=version, failures=tree_cache["failures"], err=str(e))
+            return
+        tree_cache.update(version=version, tree=tree, loaded=True, failures=0)
+        CATALOG_TREE_ITEMS.set(len(tree) if tree is not None else 0)
+        CATALOG_TREE_BYTES.set(tree.nbytes if tree is not None else 0)
+        if tree is None:
+            state["catalog_tree"] = {"version": version, "items": 0, "status": "over_limit"}
+        else:
+            state["catalog_tree"] = {"version": version, "items": len(tree), "bytes": tree.nbytes}
+        log.info("catalog_tree_loaded", **state["catalog_tree"])
+
+    async def catalog_tree() -> CatalogTree | None:
+        if int(getattr(settings, "catalog_tree_max_items", 200_000) or 0) <= 0:
+            return None
+        version = state.get("catalog_version")
+        task = tree_cache["task"]
+        if (not tree_cache["loaded"] or tree_cache["version"] != version) and (task is None or task.done()):
+            # After a failure the same version is retried with exponential backoff (30 s .. 10 min).
+            failures = tree_cache["failures"]
+            backoff = min(600.0, 30.0 * 2 ** (failures - 1)) if failures else 0.0
+            if version != tree_cache["failed_version"] or time.monotonic() - tree_cache["failed_at"] >= backoff:
+                task = tree_cache["task"] = asyncio.create_task(build_catalog_tree(version), name="catalog_tree")
+        if not tree_cache["loaded"] and task is not None and not tree_cache["failures"]:
+            # First load only; later reloads (and retries after a failure) keep serving what there is
+            # meanwhile -- the previous snapshot, or SQLite.
+            await asyncio.shield(task)
+        return tree_cache["tree"]
+
+    # catalog_last_sync_at changes on every completed sync, even one that finds nothing new (the catalog
+    # version then stays put), so it is not part of cached pages: render_dir adds it from this memo.
+    last_sync: dict = {"value": None, "at": None}
+
+    async def catalog_last_sync_at() -> str | None:
+        now = time.monotonic()
+        if last_sync["at"] is None or now - last_sync["at"] >= LAST_SYNC_REFRESH_SEC:
+            try:
+                last_sync["value"] = await db_mod.get_meta(db, "catalog_last_sync_at")
+            except Exception as e:
+                log.warning("catalog_last_sync_read_error", err=str(e))
+            last_sync["at"] = now
+        return last_sync["value"]
+
+    # Rendered folder pages per (path, page cursor, admin/non-admin, catalog_version): a popular page costs
+    # a dict lookup.
+    dir_cache: TTLCache[tuple, tuple[str, InlineKeyboardMarkup]] = TTLCache(
+        int(getattr(settings, "dir_cache_size", 512) or 0),
+        float(getattr(settings, "dir_cache_ttl_sec", 300) or 0),
     )
 
     async def render_dir(
@@ -338,90 +500,123 @@ async def main() -> None:
         *,
         viewer_tg_user_id: int | None = None,
         offset: int = 0,
+        page: int = 1,
+        after_id: int | None = None,
+        before_id: int | None = None,
     ) -> tuple[str, InlineKeyboardMarkup]:
-        page_size = int(getattr(settings, "catalog_page_size", 30) or 30)
         offset = max(0, int(offset))
+        page = max(1, int(page))
+        admins = settings.admin_ids_set()
+        is_admin = bool(viewer_tg_user_id and admins and viewer_tg_user_id in admins)
+        version = state.get("catalog_version")
+        # No version (Redis down): not cached. A page rendered from the previous tree snapshot (reload in
+        # progress) is not kept under the new version.
+        body, markup = await get_or_build(
+            dir_cache,
+            (path, offset, page, after_id, before_id, is_admin),
+            lambda: build_dir_view(
+                path, is_admin=is_admin, offset=offset, page=page, after_id=after_id, before_id=before_id
+            ),
+            version=version,
+            counter=DIR_CACHE_TOTAL,
+            keep=lambda: tree_cache["tree"] is None or tree_cache["version"] == version,
+        )
+        text = f"{title_of(path)}"
+        synced_at = await catalog_last_sync_at()
+        if synced_at:
+            text += f"\n\nОбновлено: {synced_at}"
+        return text + body, markup
+
+    async def build_dir_view(
+        path: str,
+        *,
+        is_admin: bool,
+        offset: int,
+        page: int,
+        after_id: int | None,
+        before_id: int | None,
+    ) -> tuple[str, InlineKeyboardMarkup]:
+        """The page below its title and "Обновлено" line (render_dir adds those), and its keyboard."""
+        page_size = int(getattr(settings, "catalog_page_size", 30) or 30)
 
-        # Defensive: ensure current folder exists and has an id (needed for pagination callbacks).
-        cur_item = await db_mod.fetch_catalog_item_by_path(db, path)
-        if cur_item is None:
-            await db_mod.upsert_catalog_item(
+        # In-memory snapshot first: a folder it knows is rendered without touching SQLite.
+        # Otherwise one read-only folder view; missing folders are created by sync, never here.
+        tree = await catalog_tree()
+        cur_item = tree.folder(path) if tree is not None else None
+        if cur_item is not None:
+            cur_id = cur_item.id
+            total, folder_size = tree.child_count(cur_id), tree.folder_size(cur_id)
+            children, more = tree.children_page(
+                cur_id, limit=page_size, offset=offset, after_id=after_id, before_id=before_id
+            )
+            back = parent_of(path)
+            parent_item = tree.folder(back) if back is not None else None
+            root_item = tree.folder(root_path)
+            parent_id = parent_item.id if parent_item is not None else None
+            root_id = root_item.id if root_item is not None else None
+        else:
+            view = await db_mod.fetch_folder_view(
                 db,
-                path=path,
-                kind="folder",
-                title=title_of(path),
-                yandex_id=path,
-                parent_path=parent_of(path),
+                path,
+                root_path=root_path,
+                limit=page_size,
+                offset=offset,
+                after_id=after_id,
+                before_id=before_id,
             )
-            cur_item = await db_mod.fetch_catalog_item_by_path(db, path)
-
-        cur_id = int(cur_item["id"]) if cur_item else None
+            if view is not None:
+                cur_id, total, folder_size = view.folder.id, view.total, view.size_bytes
+                children, more = view.children, view.more
+                parent_id, root_id = view.parent_id, view.root_id
+                # Read in the same query anyway: refresh the memo for free.
+                last_sync.update(value=view.last_sync_at, at=time.monotonic())
+            else:
+                cur_id, total, folder_size, children, more = None, 0, None, [], False
+                parent_id, root_id = None, None
 
-        total = await db_mod.count_children(db, path)
-        children = await db_mod.fetch_children(db, path, limit=page_size, offset=offset)
+        if offset > 0:
+            # Legacy nav:<id>:<offset> buttons from messages sent before keyset paging.
+            page = (offset // page_size) + 1
+            has_prev, has_next = True, more
+        elif before_id is not None:
+            has_prev, has_next = more, True
+            if not more:
+                page = 1
+        else:
+            has_prev, has_next = page > 1, more
 
         kb: list[list[InlineKeyboardButton]] = []
         for ch in children:
-            is_folder = ch.get("kind") == "folder"
-            cb = f"nav:{ch['id']}:0" if is_folder else f"dl:{ch['id']}"
-            label = ("📁 " if is_folder else "📄 ") + str(ch.get("title") or "")
+            is_folder = ch.kind == "folder"
+            cb = f"nav:{ch.id}:0" if is_folder else f"dl:{ch.id}"
+            label = ("📁 " if is_folder else "📄 ") + str(ch.title or "")
             kb.append([InlineKeyboardButton(text=label[:64], callback_data=cb)])
 
-        # Page controls
-        if cur_id is not None and (offset > 0 or (offset + page_size) < total):
+        # Page controls: keyset cursors nav:<folder_id>:<page>:a<last_id> / b<first_id>
+        if cur_id is not None and children and (has_prev or has_next):
             row: list[InlineKeyboardButton] = []
-            if offset > 0:
-                row.append(InlineKeyboardButton(text="⬅️", callback_data=f"nav:{cur_id}:{max(0, offset - page_size)}"))
-            if (offset + page_size) < total:
-                row.append(InlineKeyboardButton(text="➡️", callback_data=f"nav:{cur_id}:{offset + page_size}"))
+            if has_prev:
+                row.append(InlineKeyboardButton(text="⬅️", callback_data=f"nav:{cur_id}:{page - 1}:b{children[0].id}"))
+            if has_next:
+                row.append(InlineKeyboardButton(text="➡️", callback_data=f"nav:{cur_id}:{page + 1}:a{children[-1].id}"))
             kb.append(row)
 
         # Nav controls
-        back = parent_of(path)
-        if back is not None:
-            parent_item = await db_mod.fetch_catalog_item_by_path(db, back)
-            if parent_item is None:
-                await db_mod.upsert_catalog_item(
-                    db,
-                    path=back,
-                    kind="folder",
-                    title=title_of(back),
-                    yandex_id=back,
-                    parent_path=parent_of(back),
-                )
-                parent_item = await db_mod.fetch_catalog_item_by_path(db, back)
-            if parent_item is not None:
-                kb.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=f"nav:{parent_item['id']}:0")])
+        if parent_id is not None and path != root_path:
+            kb.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=f"nav:{parent_id}:0")])
 
         # Root shortcut
-        if path != root_path:
-            root_item = await db_mod.fetch_catalog_item_by_path(db, root_path)
-            if root_item is None:
-                await db_mod.upsert_catalog_item(
-                    db,
-                    path=root_path,
-                    kind="folder",
-                    title=title_of(root_path),
-                    yandex_id=root_path,
-                    parent_path=None,
-                )
-                root_item = await db_mod.fetch_catalog_item_by_path(db, root_path)
-            if root_item is not None:
-                kb.append([InlineKeyboardButton(text="🏠 В корень", callback_data=f"nav:{root_item['id']}:0")])
-
-        text = f"{title_of(path)}"
-        last_sync = await db_mod.get_meta(db, 'catalog_last_sync_at')
-        if last_sync:
-            text += f"\n\nОбновлено: {last_sync}"
+        if root_id is not None and path != root_path:
+            kb.append([InlineKeyboardButton(text="🏠 В корень", callback_data=f"nav:{root_id}:0")])
 
+        text = ""
         if total > 0:
-            page = (offset // page_size) + 1
-            pages = max(1, math.ceil(total / page_size))
+            pages = max(page, math.ceil(total / page_size))
             text += f"\n\nСтраница {page}/{pages} (элементов: {total})"
+            if folder_size:
+                text += f"\nРазмер: {human_size(folder_size)}"
             text += "\nПоиск: /search <текст>"
 
-        admins = settings.admin_ids_set()
-        is_admin = bool(viewer_tg_user_id and admins and viewer_tg_user_id in admins)
         # Admins can see the underlying path for debugging.
         if is_admin:
             text += f"\n\n(путь: {path})"
@@ -434,15 +629,102 @@ async def main() -> None:
 
         return text, InlineKeyboardMarkup(inline_keyboard=kb)
 
+    # Ranked result ids per (query, scope, catalog_version): "➡️"/"⬅️" slice the list and load one page by
+    # primary key instead of re-running MATCH + bm25. A new catalog version changes the key.
+    search_cache: TTLCache[tuple, tuple[list[int], bool]] = TTLCache(
+        int(getattr(settings, "search_cache_size", 256) or 0),
+        float(getattr(settings, "search_cache_ttl_sec", 600) or 0),
+    )
+
+    async def search_page(
+        query: str,
+        scope_path: str,
+        *,
+        limit: int,
+        after_id: int | None = None,
+        before_id: int | None = None,
+    ) -> tuple[list[CatalogEntry], bool]:
+        """db_mod.search_catalog_items_page semantics, served from search_cache when possible."""
+        max_ids = int(getattr(settings, "search_cache_max_ids", 1000) or 0)
+        version = state.get("catalog_version")
+        if search_cache.maxsize <= 0 or max_ids <= 0 or version is None:
+            # No version yet (listener not started, Redis down): nothing would invalidate the entry.
+            return await db_mod.search_catalog_items_page(
+                db, query=query, scope_path=scope_path, limit=limit, after_id=after_id, before_id=before_id
+            )
+        key = (" ".join(query.casefold().split()), scope_path, version)
+        cached = search_cache.get(key)
+        if cached is None:
+            SEARCH_CACHE_TOTAL.labels(result="miss").inc()
+            rows, truncated = await db_mod.search_catalog_items_page(
+                db, query=query, scope_path=scope_path, limit=max(max_ids, limit)
+            )
+            cached = ([it.id for it in rows], truncated)
+            search_cache.set(key, cached)
+            if after_id is None and before_id is None:
+                return rows[:limit], len(rows) > limit or truncated
+        else:
+            SEARCH_CACHE_TOTAL.labels(result="hit").inc()
+
+        ids, truncated = cached
+        cursor_id = before_id if before_id is not None else after_id
+        pos = ids.index(cursor_id) if cursor_id in ids else None
+        if pos is None and cursor_id is not None and truncated:
+            pos = -1  # beyond the cached prefix
+        if before_id is not None and pos is not None and pos >= 0:
+            start = max(0, pos - limit)
+            page_ids, more = ids[start:pos], start > 0
+        else:
+            start = 0 if pos is None else pos + 1
+            if pos == -1 or (truncated and start + limit > len(ids)):
+                return await db_mod.search_catalog_items_page(
+                    db, query=query, scope_path=scope_path, limit=limit, after_id=after_id, before_id=before_id
+                )
+            page_ids, more = ids[start:start + limit], start + limit < len(ids) or truncated
+        return await db_mod.fetch_catalog_entries(db, page_ids), more
+
+    # Fuzzy tier: typo-tolerant index over the FTS vocabulary, rebuilt in the background when the catalog
+    # version changes. Consulted only when a search finds nothing.
+    fuzzy: dict = {"version": None, "index": None, "task": None, "failed_version": None, "failed_at": 0.0, "failures": 0}
+
+    async def build_fuzzy_index(version) -> None:
+        try:
+            vocab = await db_mod.fetch_catalog_vocabulary(db)
+            index = await asyncio.to_thread(FuzzyIndex, vocab)
+            fuzzy["version"], fuzzy["index"], fuzzy["failures"] = version, index, 0
+            log.info("fuzzy_index_built", version=version, terms=len(index))
+        except Exception as e:
+            fuzzy["failed_version"], fuzzy["failed_at"] = version, time.monotonic()
+            fuzzy["failures"] += 1
+            log.warning("fuzzy_index_error", version=version, failures=fuzzy["failures"], err=str(e))
+
+    async def fuzzy_correct(query: str) -> str | None:
+        version = state.get("catalog_version")
+        task = fuzzy["task"]
+        if fuzzy["version"] != version and (task is None or task.done()):
+            # After a failure the same version is retried with exponential backoff (30 s .. 10 min).
+            backoff = min(600.0, 30.0 * 2 ** (fuzzy["failures"] - 1)) if fuzzy["failures"] else 0.0
+            if version != fuzzy["failed_version"] or time.monotonic() - fuzzy["failed_at"] >= backoff:
+                task = fuzzy["task"] = asyncio.create_task(build_fuzzy_index(version), name="fuzzy_index")
+        if fuzzy["index"] is None and task is not None and not fuzzy["failures"]:
+            # First build only; later rebuilds (and retries after a failure) run in the background.
+            await asyncio.shield(task)
+        index = fuzzy["index"]
+        return index.correct(query) if index is not None else None
+
     async def render_search(
         token: str,
         *,
         viewer_tg_user_id: int,
         offset: int = 0,
+        page: int = 1,
+        after_id: int | None = None,
+        before_id: int | None = None,
     ) -> tuple[str, InlineKeyboardMarkup]:
         ttl_sec = int(getattr(settings, "search_session_ttl_sec", 3600) or 3600)
         page_size = int(getattr(settings, "search_page_size", 20) or 20)
         offset = max(0, int(offset))
+        page = max(1, int(page))
 
         sess = await db_mod.fetch_search_session(db, token)
         if not sess:
@@ -461,36 +743,68 @@ async def main() -> None:
 
         query = str(sess.get("query") or "").strip()
         scope_path = str(sess.get("scope_path") or root_path)
+        shown_query = query
 
-        items, has_more = await db_mod.search_catalog_items(
-            db,
-            query=query,
-            scope_path=scope_path,
-            limit=page_size,
-            offset=offset,
-        )
+        if offset > 0:
+            # Legacy s:<token>:<offset> buttons.
+            items, has_next = await db_mod.search_catalog_items(
+                db,
+                query=query,
+                scope_path=scope_path,
+                limit=page_size,
+                offset=offset,
+            )
+            page = (offset // page_size) + 1
+            has_prev = True
+        else:
+            items, more = await search_page(
+                query,
+                scope_path,
+                limit=page_size,
+                after_id=after_id,
+                before_id=before_id,
+            )
+            if not items:
+                corrected = await fuzzy_correct(query)
+                if corrected:
+                    items, more = await search_page(
+                        corrected,
+                        scope_path,
+                        limit=page_size,
+                        after_id=after_id,
+                        before_id=before_id,
+                    )
+                    if items:
+                        shown_query = f"{corrected} (исправлено из «{query}»)"
+            if before_id is not None:
+                has_prev, has_next = more, True
+                if not more:
+                    page = 1
+            else:
+                has_prev, has_next = page > 1, more
 
         kb: list[list[InlineKeyboardButton]] = []
         for it in items:
-            is_folder = it.get("kind") == "folder"
-            cb = f"nav:{it['id']}:0" if is_folder else f"dl:{it['id']}"
-            label = ("📁 " if is_folder else "📄 ") + str(it.get("title") or "")
+            is_folder = it.kind == "folder"
+            cb = f"nav:{it.id}:0" if is_folder else f"dl:{it.id}"
+            label = ("📁 " if is_folder else "📄 ") + str(it.title or "")
             kb.append([InlineKeyboardButton(text=label[:64], callback_data=cb)])
 
         # pagination
         nav_row: list[InlineKeyboardButton] = []
-        if offset > 0:
-            nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"s:{token}:{max(0, offset - page_size)}"))
-        if has_more:
-            nav_row.append(InlineKeyboardButton(text="➡️", callback_data=f"s:{token}:{offset + page_size}"))
+        if items and has_prev:
+            nav_row.append(InlineKeyboardButton(text="⬅️", callback_data=f"s:{token}:{page - 1}:b{items[0].id}"))
+        if items and has_next:
+            nav_row.append(InlineKeyboardButton(text="➡️", callback_data=f"s:{token}:{page + 1}:a{items[-1].id}"))
         if nav_row:
             kb.append(nav_row)
 
-        text = f"Результаты: {query}"
+        text = f"Результаты: {shown_query}"
         if not items:
             text += "\n\nНичего не найдено."
         else:
-            text += f"\nПоказаны {offset + 1}..{offset + len(items)}"
+            first = (page - 1) * page_size + 1
+            text += f"\nПоказаны {first}..{first + len(items) - 1}"
 
         return text, InlineKeyboardMarkup(inline_keyboard=kb)
 
@@ -511,8 +825,9 @@ async def main() -> None:
             "Админ:\n"
             "/users - управление доступом\n"
             "/sync - синхронизация каталога (worker)\n"
-            "/audit - аудит загрузок\n"
-            "/stats - статистика\n"
+            "/audit [N] - аудит загрузок (/audit archive [N] - архив)\n"
+            "/stats [48h|30d] - статистика\n"
+            "/reindex - переиндексировать поиск (в фоне)\n"
             "/seed - (local) добавить демо файл\n\n"
             "Debug:\n"
             "/list, /download <id>\n"
@@ -557,7 +872,7 @@ async def main() -> None:
             return
 
         u = await db_mod.fetch_user_by_tg_user_id(db, uid)
-        status = str((u or {}).get("status") or "guest")
+        status = (u.status if u else "guest")
         if status == "active":
             await m.answer("Доступ уже активен.")
             return
@@ -565,8 +880,8 @@ async def main() -> None:
             await m.answer("Доступ заблокирован. Обратитесь к администратору.")
             return
 
-        await db_mod.set_user_status(db, uid, "pending", expires_at=(u or {}).get("expires_at"))
-        note = (u or {}).get("user_note") or ""
+        await db_mod.set_user_status(db, uid, "pending", expires_at=(u.expires_at if u else None))
+        note = (u.user_note if u else None) or ""
         await notify_admins(f"🆕 Запрос доступа: user_id={uid}, note={note}")
         await m.answer("Заявка отправлена админам. Добавьте /note, если ещё не добавляли.")
 
@@ -602,10 +917,10 @@ async def main() -> None:
             lines.append("Пусто.")
         else:
             for u in users:
-                uid = int(u["tg_user_id"])
-                st = str(u.get("status") or "guest")
-                exp = u.get("expires_at") or "-"
-                note = _clip_text((u.get("user_note") or "").replace("\n", " "), 32)
+                uid = int(u.tg_user_id)
+                st = str(u.status or "guest")
+                exp = u.expires_at or "-"
+                note = _clip_text((u.user_note or "").replace("\n", " "), 32)
                 if note:
                     lines.append(f"{uid} · {st} · до {exp} · {note}")
                 else:
@@ -613,8 +928,8 @@ async def main() -> None:
 
         kb: list[list[InlineKeyboardButton]] = []
         for u in users:
-            uid = int(u["tg_user_id"])
-            st = str(u.get("status") or "guest")
+            uid = int(u.tg_user_id)
+            st = str(u.status or "guest")
             kb.append([InlineKeyboardButton(text=f"👤 {uid} ({st})", callback_data=f"um:{token}:{offset}:{uid}")])
 
         nav: list[InlineKeyboardButton] = []
@@ -638,9 +953,9 @@ async def main() -> None:
             await db_mod.upsert_user(db, target_uid)
             u = await db_mod.fetch_user_by_tg_user_id(db, target_uid)
 
-        st = str((u or {}).get("status") or "guest")
-        exp = (u or {}).get("expires_at") or "-"
-        note = ((u or {}).get("user_note") or "").strip()
+        st = (u.status if u else "guest")
+        exp = (u.expires_at if u else None) or "-"
+        note = ((u.user_note if u else None) or "").strip()
 
         out = [f"Пользователь {target_uid}", f"status={st}", f"expires_at={exp}"]
         if note:
@@ -801,25 +1116,33 @@ async def main() -> None:
             await m.answer("Недостаточно прав.")
             return
 
+        # /audit [N] | /audit archive [N]
         parts = (m.text or "").split()
+        archive_only = len(parts) >= 2 and parts[1].lower() in ("archive", "архив")
+        if archive_only:
+            parts = parts[1:]
         limit = 20
         if len(parts) >= 2 and parts[1].isdigit():
             limit = int(parts[1])
         limit = max(1, min(limit, 50))
 
-        rows = await db_mod.fetch_recent_download_audit(db, limit=limit, offset=0)
+        archive_path = settings.archive_sqlite_path
+        rows = [] if archive_only else await db_mod.fetch_recent_download_audit(db, limit=limit, offset=0)
+        if len(rows) < limit:
+            # Older rows moved out by retention are read from the archive file.
+            rows += await db_mod.fetch_archived_download_audit(archive_path, limit=limit - len(rows))
         if not rows:
             await m.answer("Аудит пока пуст.")
             return
 
-        out = ["Аудит скачиваний (последние):"]
+        out = ["Аудит скачиваний (архив):" if archive_only else "Аудит скачиваний (последние):"]
         for r in rows:
-            ts = str(r.get("created_at") or "")
-            res = "✅" if r.get("result") == "succeeded" else "❌"
-            title = str(r.get("title") or r.get("path") or "")
+            ts = str(r.created_at or "")
+            res = "✅" if r.result == "succeeded" else "❌"
+            title = str(r.title or r.path or "")
             if len(title) > 48:
                 title = title[:45] + "..."
-            out.append(f"{res} {ts} u={r.get('tg_user_id')} {title}")
+            out.append(f"{res} {ts} u={r.tg_user_id} {title}")
 
         await m.answer("\n".join(out))
 
@@ -831,20 +1154,37 @@ async def main() -> None:
             await m.answer("Недостаточно прав.")
             return
 
-        last_24h = await db_mod.count_download_audit_since(db, since_minutes=24 * 60)
+        # Optional window: /stats 48h | /stats 30d (default: 24h counters, 7d top).
+        arg = ((m.text or "").split(maxsplit=1)[1:] or [""])[0].strip().lower()
+        window_m = re.fullmatch(r"(\d{1,4})\s*([hdчд]?)", arg)
+        if window_m:
+            n = max(1, int(window_m.group(1)))
+            unit = "d" if window_m.group(2) in ("d", "д") else "h"
+            count_minutes = top_minutes = n * (24 * 60 if unit == "d" else 60)
+            count_label = top_label = f"{n}{'д' if unit == 'd' else 'ч'}"
+        else:
+            count_minutes, count_label = 24 * 60, "24ч"
+            top_minutes, top_label = 7 * 24 * 60, "7 дней"
+
+        # Rollup-backed (schema v19): cost depends on the window in hours, not on audit size.
+        counts = await db_mod.count_download_audit_since(db, since_minutes=count_minutes)
         users = await db_mod.count_users_by_status(db)
-        top_7d = await db_mod.top_downloads_since(db, since_minutes=7 * 24 * 60, limit=5)
+        top = await db_mod.top_downloads_since(db, since_minutes=top_minutes, limit=5)
+        # The per-user rollup is daily: counted over whole calendar days, labelled as such.
+        active_days = max(1, math.ceil(top_minutes / (24 * 60)))
+        active = await db_mod.count_active_downloaders(db, days=active_days)
 
         text = (
             "Статистика:\n"
-            f"Скачивания за 24ч: ✅ {last_24h.get('succeeded', 0)} / ❌ {last_24h.get('failed', 0)}\n"
+            f"Скачивания за {count_label}: ✅ {counts.get('succeeded', 0)} / ❌ {counts.get('failed', 0)}\n"
+            f"Скачивали (календарных дней: {active_days}, включая сегодня): {active}\n"
             "Пользователи: "
             + ", ".join([f"{k}={v}" for k, v in sorted(users.items())])
         )
 
-        if top_7d:
-            text += "\n\nТоп файлов (7 дней):"
-            for i, r in enumerate(top_7d, 1):
+        if top:
+            text += f"\n\nТоп файлов ({top_label}):"
+            for i, r in enumerate(top, 1):
                 title = str(r.get("title") or r.get("path") or "")
                 if len(title) > 48:
                     title = title[:45] + "..."
@@ -946,7 +1286,7 @@ async def main() -> None:
                 parent_path=None,
             )
         else:
-            root_id = int(root_item["id"])
+            root_id = int(root_item.id)
 
         job_id = await db_mod.insert_job(
             db,
@@ -962,7 +1302,7 @@ async def main() -> None:
 
     @dp.callback_query(F.data.startswith("nav:"))
     async def nav_cb(q: CallbackQuery) -> None:
-        # callback_data: nav:<folder_id>[:<offset>]
+        # callback_data: nav:<folder_id>[:<page>:a<last_id>|b<first_id>] (legacy: nav:<folder_id>:<offset>)
         parts = (q.data or "").split(":")
         if len(parts) < 2:
             await q.answer("Некорректная команда")
@@ -972,11 +1312,14 @@ async def main() -> None:
         except Exception:
             await q.answer("Некорректная команда")
             return
-        try:
-            offset = int(parts[2]) if len(parts) >= 3 else 0
-        except Exception:
-            offset = 0
-
+        offset, page, after_id, before_id = 0, 1, None, None
+        if len(parts) >= 4:
+            page, after_id, before_id = parse_page_cursor(parts[2], parts[3])
+        elif len(parts) == 3:
+            try:
+                offset = int(parts[2])
+            except Exception:
+                offset = 0
 
         async def _reply(text: str) -> None:
             try:
@@ -995,17 +1338,27 @@ async def main() -> None:
             await q.answer()
             return
 
-        try:
-            item = await db_mod.fetch_catalog_item(db, item_id)
-        except Exception:
-            await q.answer("Элемент не найден")
-            return
+        tree = await catalog_tree()
+        item = tree.get(item_id) if tree is not None else None
+        if item is None:
+            try:
+                item = await db_mod.fetch_catalog_item(db, item_id)
+            except Exception:
+                await q.answer("Элемент не найден")
+                return
 
-        if item.get("kind") != "folder":
+        if item.kind != "folder":
             await q.answer("Это не папка")
             return
 
-        text, markup = await render_dir(str(item.get("path") or root_path), viewer_tg_user_id=q.from_user.id, offset=offset)
+        text, markup = await render_dir(
+            str(item.path or root_path),
+            viewer_tg_user_id=q.from_user.id,
+            offset=offset,
+            page=page,
+            after_id=after_id,
+            before_id=before_id,
+        )
         if q.message:
             await q.message.edit_text(text, reply_markup=markup)
         await q.answer()
@@ -1014,15 +1367,20 @@ async def main() -> None:
 
     @dp.callback_query(F.data.startswith("s:"))
     async def search_cb(q: CallbackQuery) -> None:
+        # callback_data: s:<token>:<page>:a<last_id>|b<first_id> (legacy: s:<token>:<offset>)
         parts = (q.data or "").split(":")
-        if len(parts) != 3:
+        if len(parts) not in (3, 4):
             await q.answer()
             return
-        _tag, token, offset_s = parts
-        try:
-            offset = int(offset_s)
-        except Exception:
-            offset = 0
+        token = parts[1]
+        offset, page, after_id, before_id = 0, 1, None, None
+        if len(parts) == 4:
+            page, after_id, before_id = parse_page_cursor(parts[2], parts[3])
+        else:
+            try:
+                offset = int(parts[2])
+            except Exception:
+                offset = 0
 
         async def _reply(text: str) -> None:
             try:
@@ -1041,7 +1399,14 @@ async def main() -> None:
             await q.answer()
             return
 
-        text, markup = await render_search(token, viewer_tg_user_id=int(q.from_user.id), offset=offset)
+        text, markup = await render_search(
+            token,
+            viewer_tg_user_id=int(q.from_user.id),
+            offset=offset,
+            page=page,
+            after_id=after_id,
+            before_id=before_id,
+        )
         if q.message:
             await q.message.edit_text(text, reply_markup=markup)
         await q.answer()
@@ -1191,8 +1556,52 @@ startxref
         JOB_ENQUEUE_TOTAL.inc()
         await m.answer(f"Ок. Поставил задачу #{job_id}.")
 
+    async def catalog_version_listener() -> None:
+        # Catalog invalidation bus: keep state["catalog_version"] current; caches key on it.
+        # The stored version is read after subscribing and then periodically (None from the listener):
+        # a lost publish delays invalidation by at most catalog_version_reconcile_sec.
+        reconcile_sec = max(1, int(getattr(settings, "catalog_version_reconcile_sec", 30) or 30))
+        backoff = 1
+        while True:
+            try:
+                async for version in listen_catalog_versions(r, reconcile_sec=reconcile_sec):
+                    backoff = 1
+                    if version is None:
+                        version = await db_mod.get_catalog_version(db)
+                        if state.get("catalog_version") is None:
+                            state["catalog_version"] = version
+                    if version > int(state.get("catalog_version") or 0):
+                        state["catalog_version"] = version
+                        log.info("catalog_version_changed", version=version)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("catalog_version_listener_error", err=str(e), backoff_s=backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(30, backoff * 2)
+
     # Background: warn about expiring access (if enabled)
+    leader_task = asyncio.create_task(leader.run(state), name="leader_lease")
     warn_task = asyncio.create_task(access_warn_scheduler())
+    version_task = asyncio.create_task(catalog_version_listener(), name="catalog_version_listener")
+
+    webhook_concurrency = min(100, max(1, int(getattr(settings, "webhook_max_concurrency", 32) or 32)))
+    if use_webhook:
+        app["webhook"]["handler"] = make_webhook_handler(
+            dp, bot, secret=webhook_secret, max_concurrency=webhook_concurrency
+        )
+
+    async def stop_polling_on_lost_lease() -> None:
+        # A replica that loses the lease (Redis blip, stalled loop) must stop polling before the new leader
+        # starts, or both get conflicts from getUpdates.
+        while True:
+            if not leader.is_leader:
+                try:
+                    await dp.stop_polling()
+                    return
+                except RuntimeError:
+                    pass  # polling not started yet
+            await asyncio.sleep(1)
 
     # Keep the process alive even if Telegram long polling temporarily fails.
     # Otherwise the container may flap (unhealthy) and block deployments.
@@ -1216,7 +1625,38 @@ startxref
                     # fall through to the main handler below
                     raise
 
-                await dp.start_polling(bot)
+                if use_webhook:
+                    await bot.set_webhook(
+                        webhook_url + webhook_path,
+                        secret_token=webhook_secret,
+                        max_connections=webhook_concurrency,
+                        allowed_updates=dp.resolve_used_update_types(),
+                    )
+                    state["polling"] = "webhook"
+                    log.info("webhook_set", url=webhook_url + webhook_path, max_connections=webhook_concurrency)
+                    # Updates arrive via the aiohttp app from now on.
+                    await asyncio.Event().wait()
+                else:
+                    while poll_on_leader_only and not leader.is_leader:
+                        state["polling"] = "standby"
+                        await asyncio.sleep(leader.ttl_sec / 3)
+                    state["polling"] = "running"
+                    # A webhook left over from webhook mode makes getUpdates fail with a conflict.
+                    await bot.delete_webhook()
+                    watch = (
+                        asyncio.create_task(stop_polling_on_lost_lease(), name="polling_lease_watch")
+                        if poll_on_leader_only
+                        else None
+                    )
+                    try:
+                        await dp.start_polling(bot)
+                    finally:
+                        if watch is not None:
+                            watch.cancel()
+                    if poll_on_leader_only and not leader.is_leader:
+                        # Another replica may be polling by now: back to standby until the lease returns.
+                        log.warning("polling_stopped_lease_lost", replica=state["replica"])
+                        continue
                 # Normal exit (e.g., cancelled/shutdown)
                 break
             except asyncio.CancelledError:
@@ -1247,6 +1687,16 @@ startxref
             warn_task.cancel()
         except Exception:
             pass
+        leader_task.cancel()
+        try:
+            # Hand the lease over now instead of after its TTL.
+            await asyncio.wait_for(asyncio.gather(leader_task, return_exceptions=True), timeout=2)
+        except Exception:
+            pass
+        try:
+            version_task.cancel()
+        except Exception:
+            pass
         await bot.session.close()
         await db.close()
         await r.close()
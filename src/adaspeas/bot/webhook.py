@@ -0,0 +1,103 @@
+"""Telegram update intake: webhook handler for the bot's aiohttp app, and intake lag metrics.
+
+In webhook mode Telegram POSTs updates to WEBHOOK_PATH on the app that already serves /health.
+Each update is answered with 200 as soon as it is accepted and handled in its own task; at most
+max_concurrency updates are in flight, after that the request waits for a slot, which also slows
+Telegram down (it keeps at most max_connections requests open, see set_webhook).
+
+update_lag_middleware records the age of an update when it reaches the dispatcher, for polling
+and webhook alike.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import secrets
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from prometheus_client import Counter, Gauge, Histogram
+import structlog
+
+log = structlog.get_logger()
+
+UPDATE_LAG_SECONDS = Histogram(
+    "bot_update_lag_seconds",
+    "Age of an update (Telegram event date -> dispatch); updates without a date are not observed",
+    ["mode"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 300),
+)
+UPDATES_INFLIGHT = Gauge("bot_updates_inflight", "Webhook updates being handled")
+WEBHOOK_REQUESTS_TOTAL = Counter("bot_webhook_requests_total", "Webhook requests", ["result"])
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def _event_date(update: Update):
+    for event in (update.message, update.edited_message, update.channel_post, update.edited_channel_post):
+        if event is not None:
+            return event.date
+    return None
+
+
+def update_lag_middleware(mode: str):
+    """Outer middleware for dp.update: observe UPDATE_LAG_SECONDS{mode}."""
+
+    async def middleware(
+        handler: Callable[[Update, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        date = _event_date(event)
+        if date is not None:
+            UPDATE_LAG_SECONDS.labels(mode=mode).observe(max(0.0, time.time() - date.timestamp()))
+        return await handler(event, data)
+
+    return middleware
+
+
+def make_webhook_handler(
+    dp: Dispatcher,
+    bot: Bot,
+    *,
+    secret: str,
+    max_concurrency: int,
+) -> Callable[[web.Request], Awaitable[web.Response]]:
+    """aiohttp handler for POST webhook_path; secret is required (the path is reachable from anywhere)."""
+    if not secret:
+        raise ValueError("webhook secret is required")
+    slots = asyncio.Semaphore(max(1, int(max_concurrency)))
+    tasks: set[asyncio.Task] = set()
+
+    async def process(update: Update) -> None:
+        UPDATES_INFLIGHT.inc()
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            log.exception("webhook_update_error", update_id=update.update_id, err=str(e))
+        finally:
+            UPDATES_INFLIGHT.dec()
+            slots.release()
+
+    async def handle(request: web.Request) -> web.Response:
+        if not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""), secret):
+            WEBHOOK_REQUESTS_TOTAL.labels(result="unauthorized").inc()
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": bot})
+        except Exception as e:
+            # Not retryable: Telegram would resend the same payload forever.
+            WEBHOOK_REQUESTS_TOTAL.labels(result="invalid").inc()
+            log.warning("webhook_invalid_update", err=str(e))
+            return web.Response(status=200)
+        await slots.acquire()
+        task = asyncio.create_task(process(update), name=f"update:{update.update_id}")
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        WEBHOOK_REQUESTS_TOTAL.labels(result="accepted").inc()
+        return web.Response(status=200)
+
+    return handle
@@ -0,0 +1,90 @@
+"""Small in-process caches.
+
+TTLCache is an LRU map with a per-entry time-to-live. It is meant for derived data that is cheap to
+lose and keyed so that invalidation is implicit (e.g. by catalog version): stale keys are simply never
+asked for again and age out. Not thread-safe; use it from one event loop.
+
+get_or_build is the read-through pattern on top of it for values keyed by the catalog version.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    def __init__(self, maxsize: int, ttl_sec: float, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = max(0, int(maxsize))
+        self.ttl_sec = float(ttl_sec)
+        self._clock = clock
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        if self.maxsize <= 0 or self.ttl_sec <= 0:
+            return
+        self._data[key] = (self._clock() + self.ttl_sec, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> V | None:
+        entry = self._data.pop(key, None)
+        return None if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+async def get_or_build(
+    cache: TTLCache[tuple, V],
+    key: tuple,
+    build: Callable[[], Awaitable[V]],
+    *,
+    version: Hashable | None,
+    counter: Any = None,
+    keep: Callable[[], bool] | None = None,
+) -> V:
+    """Look up key + (version,), else build() and store the result.
+
+    Without a version nothing would invalidate the entry, so build() runs every time and nothing is
+    stored (or counted). keep(), checked after the build, can still refuse to store a result, e.g. one
+    computed from data older than version. counter: a prometheus Counter with a "result" label.
+    """
+    if version is None or cache.maxsize <= 0:
+        return await build()
+    full_key = (*key, version)
+    value = cache.get(full_key)
+    if value is not None:
+        if counter is not None:
+            counter.labels(result="hit").inc()
+        return value
+    if counter is not None:
+        counter.labels(result="miss").inc()
+    value = await build()
+    if keep is None or keep():
+        cache.set(full_key, value)
+    return value
@@ -1,10 +1,23 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import functools
+
 import aiosqlite
 import sqlite3
 import re
 import uuid
 
+from prometheus_client import Histogram
+import structlog
+
+from adaspeas.common.records import (
+    AuditRow, CatalogEntry, CatalogItem, ContentTask, FolderStats, FolderView, Job, User, from_row, from_rows,
+)
+
+log = structlog.get_logger()
+
 
 # NOTE: Use incremental schema versions. Do NOT edit older schema blocks in-place.
 SCHEMA_V1 = """
@@ -145,8 +158,25 @@ CREATE INDEX IF NOT EXISTS idx_download_audit_item_created ON download_audit(cat
 CREATE INDEX IF NOT EXISTS idx_jobs_type_created ON jobs(job_type, created_at);
 """
 
+# Progress of online backfills (see run_backfill_batch): a migration keeps to fast DDL and registers
+# its data step here. Created by every migration that registers one, since most predate v21.
+_SCHEMA_BACKFILLS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_backfills (
+  name TEXT PRIMARY KEY,
+  cursor INTEGER NOT NULL DEFAULT 0,
+  processed INTEGER NOT NULL DEFAULT 0,
+  total INTEGER,
+  done INTEGER NOT NULL DEFAULT 0,
+  started_at TEXT NOT NULL DEFAULT (datetime('now')),
+  updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+  finished_at TEXT
+);
+"""
+
+
 # v8: catalog search (IDEA-007): full-text search index for title/path (FTS5, external content).
-MIGRATION_V8 = """
+# Existing rows are indexed by the catalog_fts backfill rather than a blocking 'rebuild'.
+MIGRATION_V8 = _SCHEMA_BACKFILLS_DDL + """
 CREATE VIRTUAL TABLE IF NOT EXISTS catalog_items_fts USING fts5(
   title,
   path,
@@ -166,8 +196,10 @@ CREATE TRIGGER IF NOT EXISTS catalog_items_fts_au AFTER UPDATE ON catalog_items
   INSERT INTO catalog_items_fts(rowid, title, path) VALUES (new.id, new.title, new.path);
 END;
 
--- Ensure index is populated / consistent for existing rows.
-INSERT INTO catalog_items_fts(catalog_items_fts) VALUES('rebuild');
+-- Index existing rows in the background (worker); nothing to index on a fresh database.
+INSERT OR IGNORE INTO schema_backfills(name, done, finished_at)
+SELECT 'catalog_fts', 1, datetime('now') WHERE NOT EXISTS (SELECT 1 FROM catalog_items);
+INSERT OR IGNORE INTO schema_backfills(name) VALUES ('catalog_fts');
 """
 
 # v9: catalog search sessions to keep callback_data small (Telegram limit is 64 bytes).
@@ -197,10 +229,477 @@ CREATE INDEX IF NOT EXISTS idx_admin_sessions_user_created ON admin_sessions(tg_
 """
 
 
+# v11: resumable catalog sync. Traversal frontier + visited set live in SQLite, not in worker memory.
+# A row with done=0 is pending (frontier), done=1 is visited; UNIQUE(root_path, path) dedups revisits.
+MIGRATION_V11 = """
+CREATE TABLE IF NOT EXISTS sync_frontier (
+  id INTEGER PRIMARY KEY,
+  root_path TEXT NOT NULL,
+  path TEXT NOT NULL,
+  done INTEGER NOT NULL DEFAULT 0,
+  UNIQUE(root_path, path)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_frontier_pending ON sync_frontier(root_path, done, id);
+"""
+
+
+# v12: generation-based soft-delete. Every row touched by a sync run gets the run's integer generation;
+# the deletion pass is a range over (is_deleted=0, sync_generation < current) instead of a subtree LIKE scan.
+# Sync now rewrites every row per run, so the FTS update trigger is narrowed to the indexed columns.
+MIGRATION_V12 = """
+ALTER TABLE catalog_items ADD COLUMN sync_generation INTEGER NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS idx_catalog_deleted_generation ON catalog_items(is_deleted, sync_generation);
+
+DROP TRIGGER IF EXISTS catalog_items_fts_au;
+CREATE TRIGGER IF NOT EXISTS catalog_items_fts_au AFTER UPDATE OF title, path ON catalog_items BEGIN
+  INSERT INTO catalog_items_fts(catalog_items_fts, rowid, title, path) VALUES('delete', old.id, old.title, old.path);
+  INSERT INTO catalog_items_fts(rowid, title, path) VALUES (new.id, new.title, new.path);
+END;
+"""
+
+
+# v13: catalog change feed. Triggers stamp every visible change with the *next* catalog version
+# (meta catalog_version + 1); commit_catalog_version() publishes it. One row per (version, item).
+MIGRATION_V13 = """
+CREATE TABLE IF NOT EXISTS catalog_changes (
+  version INTEGER NOT NULL,
+  item_id INTEGER NOT NULL,
+  change TEXT NOT NULL CHECK(change IN ('added','updated','removed')),
+  PRIMARY KEY (version, item_id)
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO meta(key, value) VALUES ('catalog_version', '0');
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_changes_ai AFTER INSERT ON catalog_items WHEN new.is_deleted=0 BEGIN
+  INSERT INTO catalog_changes(version, item_id, change)
+  VALUES (COALESCE((SELECT CAST(value AS INTEGER) FROM meta WHERE key='catalog_version'), 0) + 1, new.id, 'added')
+  ON CONFLICT(version, item_id) DO UPDATE SET change='added';
+END;
+CREATE TRIGGER IF NOT EXISTS catalog_items_changes_au AFTER UPDATE OF kind, title, yandex_id, size_bytes, parent_path, is_deleted ON catalog_items
+WHEN new.is_deleted IS NOT old.is_deleted
+  OR new.kind IS NOT old.kind
+  OR new.title IS NOT old.title
+  OR new.yandex_id IS NOT old.yandex_id
+  OR new.size_bytes IS NOT old.size_bytes
+  OR new.parent_path IS NOT old.parent_path
+BEGIN
+  INSERT INTO catalog_changes(version, item_id, change)
+  VALUES (
+    COALESCE((SELECT CAST(value AS INTEGER) FROM meta WHERE key='catalog_version'), 0) + 1,
+    new.id,
+    CASE WHEN new.is_deleted=1 THEN 'removed' WHEN old.is_deleted=1 THEN 'added' ELSE 'updated' END
+  )
+  ON CONFLICT(version, item_id) DO UPDATE SET
+    change=CASE WHEN catalog_changes.change='added' AND excluded.change='updated' THEN 'added' ELSE excluded.change END;
+END;
+"""
+
+
+# v14: content-addressed Telegram upload cache. Sync stores Yandex md5/sha256 per file;
+# tg_file_cache maps a content hash to a Telegram file_id, so duplicates share one upload.
+# A content hash change is a catalog change too (change feed trigger is recreated).
+MIGRATION_V14 = """
+ALTER TABLE catalog_items ADD COLUMN content_md5 TEXT;
+ALTER TABLE catalog_items ADD COLUMN content_sha256 TEXT;
+
+CREATE TABLE IF NOT EXISTS tg_file_cache (
+  content_hash TEXT PRIMARY KEY,
+  tg_file_id TEXT NOT NULL,
+  tg_file_unique_id TEXT,
+  updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+DROP TRIGGER IF EXISTS catalog_items_changes_au;
+CREATE TRIGGER IF NOT EXISTS catalog_items_changes_au AFTER UPDATE OF kind, title, yandex_id, size_bytes, parent_path, is_deleted, content_md5, content_sha256 ON catalog_items
+WHEN new.is_deleted IS NOT old.is_deleted
+  OR new.kind IS NOT old.kind
+  OR new.title IS NOT old.title
+  OR new.yandex_id IS NOT old.yandex_id
+  OR new.size_bytes IS NOT old.size_bytes
+  OR new.parent_path IS NOT old.parent_path
+  OR new.content_md5 IS NOT old.content_md5
+  OR new.content_sha256 IS NOT old.content_sha256
+BEGIN
+  INSERT INTO catalog_changes(version, item_id, change)
+  VALUES (
+    COALESCE((SELECT CAST(value AS INTEGER) FROM meta WHERE key='catalog_version'), 0) + 1,
+    new.id,
+    CASE WHEN new.is_deleted=1 THEN 'removed' WHEN old.is_deleted=1 THEN 'added' ELSE 'updated' END
+  )
+  ON CONFLICT(version, item_id) DO UPDATE SET
+    change=CASE WHEN catalog_changes.change='added' AND excluded.change='updated' THEN 'added' ELSE excluded.change END;
+END;
+"""
+
+
+# v15: materialized per-folder stats (O(1) page counts in the bot UI).
+# Direct children counts/sizes are maintained by triggers on every insert/update/delete of a live row;
+# recursive totals (total_size_bytes, total_last_modified) are refreshed by refresh_folder_totals
+# after a sync run / live update, since ancestors cannot be walked from a trigger cheaply.
+# Existing rows are counted by the folder_stats backfill; until it is done, triggers skip rows above its cursor.
+# catalog_items.modified_at: storage "modified" timestamp (ISO 8601), when known.
+MIGRATION_V15 = _SCHEMA_BACKFILLS_DDL + """
+ALTER TABLE catalog_items ADD COLUMN modified_at TEXT;
+
+CREATE TABLE IF NOT EXISTS catalog_folder_stats (
+  folder_path TEXT PRIMARY KEY,
+  child_count INTEGER NOT NULL DEFAULT 0,
+  file_count INTEGER NOT NULL DEFAULT 0,
+  size_bytes INTEGER NOT NULL DEFAULT 0,
+  last_modified TEXT,
+  total_size_bytes INTEGER,
+  total_last_modified TEXT
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO schema_backfills(name, done, finished_at)
+SELECT 'folder_stats', 1, datetime('now') WHERE NOT EXISTS (SELECT 1 FROM catalog_items);
+INSERT OR IGNORE INTO schema_backfills(name) VALUES ('folder_stats');
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_stats_ai AFTER INSERT ON catalog_items
+WHEN new.is_deleted=0 AND new.parent_path IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM schema_backfills WHERE name='folder_stats' AND done=0 AND new.id > cursor)
+BEGIN
+  INSERT INTO catalog_folder_stats(folder_path, child_count, file_count, size_bytes, last_modified)
+  VALUES (
+    new.parent_path, 1, new.kind='file',
+    CASE WHEN new.kind='file' THEN COALESCE(new.size_bytes, 0) ELSE 0 END,
+    new.modified_at
+  )
+  ON CONFLICT(folder_path) DO UPDATE SET
+    child_count=child_count + 1,
+    file_count=file_count + excluded.file_count,
+    size_bytes=size_bytes + excluded.size_bytes,
+    last_modified=CASE WHEN excluded.last_modified > COALESCE(last_modified, '') THEN excluded.last_modified ELSE last_modified END;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_stats_au AFTER UPDATE OF kind, size_bytes, parent_path, is_deleted, modified_at ON catalog_items
+WHEN (new.is_deleted IS NOT old.is_deleted
+  OR new.kind IS NOT old.kind
+  OR new.size_bytes IS NOT old.size_bytes
+  OR new.parent_path IS NOT old.parent_path
+  OR new.modified_at IS NOT old.modified_at)
+  AND NOT EXISTS (SELECT 1 FROM schema_backfills WHERE name='folder_stats' AND done=0 AND new.id > cursor)
+BEGIN
+  UPDATE catalog_folder_stats SET
+    child_count=child_count - 1,
+    file_count=file_count - (old.kind='file'),
+    size_bytes=size_bytes - CASE WHEN old.kind='file' THEN COALESCE(old.size_bytes, 0) ELSE 0 END
+  WHERE folder_path=old.parent_path AND old.is_deleted=0;
+  INSERT INTO catalog_folder_stats(folder_path, child_count, file_count, size_bytes, last_modified)
+  SELECT new.parent_path, 1, new.kind='file',
+         CASE WHEN new.kind='file' THEN COALESCE(new.size_bytes, 0) ELSE 0 END,
+         new.modified_at
+  WHERE new.is_deleted=0 AND new.parent_path IS NOT NULL
+  ON CONFLICT(folder_path) DO UPDATE SET
+    child_count=child_count + 1,
+    file_count=file_count + excluded.file_count,
+    size_bytes=size_bytes + excluded.size_bytes,
+    last_modified=CASE WHEN excluded.last_modified > COALESCE(last_modified, '') THEN excluded.last_modified ELSE last_modified END;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_stats_ad AFTER DELETE ON catalog_items
+WHEN old.is_deleted=0 AND old.parent_path IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM schema_backfills WHERE name='folder_stats' AND done=0 AND old.id > cursor)
+BEGIN
+  UPDATE catalog_folder_stats SET
+    child_count=child_count - 1,
+    file_count=file_count - (old.kind='file'),
+    size_bytes=size_bytes - CASE WHEN old.kind='file' THEN COALESCE(old.size_bytes, 0) ELSE 0 END
+  WHERE folder_path=old.parent_path;
+END;
+"""
+
+
+# v16: keyset (seek) pagination of folder listings: (kind DESC, title, id) within a folder.
+# The index ends with the implicit rowid, so `kind=? AND (title, id) > (?, ?)` is a range seek.
+MIGRATION_V16 = """
+CREATE INDEX IF NOT EXISTS idx_catalog_children_seek ON catalog_items(parent_path, is_deleted, kind, title);
+"""
+
+
+# v17: integer hierarchy. Children are found by parent_id (INTEGER) instead of parent_path (TEXT):
+# navigation indexes shrink from full path strings to 8-byte keys. parent_path stays as the
+# denormalized source of truth written by sync; triggers keep parent_id in step with it.
+# Orphans (a child written before its folder) get parent_id when the folder row appears; the
+# partial index only covers such rows. Existing rows are linked by the catalog_parent_id backfill.
+MIGRATION_V17 = _SCHEMA_BACKFILLS_DDL + """
+ALTER TABLE catalog_items ADD COLUMN parent_id INTEGER REFERENCES catalog_items(id) ON DELETE SET NULL;
+
+INSERT OR IGNORE INTO schema_backfills(name, done, finished_at)
+SELECT 'catalog_parent_id', 1, datetime('now') WHERE NOT EXISTS (SELECT 1 FROM catalog_items);
+INSERT OR IGNORE INTO schema_backfills(name) VALUES ('catalog_parent_id');
+
+CREATE INDEX IF NOT EXISTS idx_catalog_children ON catalog_items(parent_id, is_deleted, kind, title);
+CREATE INDEX IF NOT EXISTS idx_catalog_orphans ON catalog_items(parent_path) WHERE parent_id IS NULL;
+
+DROP INDEX IF EXISTS idx_catalog_children_seek;
+DROP INDEX IF EXISTS idx_catalog_deleted_parent;
+DROP INDEX IF EXISTS idx_catalog_parent_path;
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_parent_ai AFTER INSERT ON catalog_items
+WHEN new.parent_path IS NOT NULL
+BEGIN
+  UPDATE catalog_items SET parent_id = (SELECT id FROM catalog_items WHERE path = new.parent_path)
+  WHERE id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_parent_au AFTER UPDATE OF parent_path ON catalog_items
+WHEN new.parent_path IS NOT old.parent_path
+BEGIN
+  UPDATE catalog_items SET parent_id = (SELECT id FROM catalog_items WHERE path = new.parent_path)
+  WHERE id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_parent_adopt AFTER INSERT ON catalog_items
+WHEN new.kind = 'folder'
+BEGIN
+  UPDATE catalog_items SET parent_id = new.id
+  WHERE parent_id IS NULL AND parent_path = new.path;
+END;
+"""
+
+
+# v18: closure table for subtree scoping. catalog_tree holds (ancestor, descendant, depth) for every
+# item and each of its ancestors (including itself at depth 0), so "everything under folder X" is
+# the primary-key range ancestor_id=X instead of `path LIKE 'X/%'`. Maintained from parent_id.
+# Existing rows are filled by the catalog_tree backfill. A move (parent_id change) while it is in
+# flight can stale rows it already wrote, so a move restarts it from the beginning.
+MIGRATION_V18 = _SCHEMA_BACKFILLS_DDL + """
+CREATE TABLE IF NOT EXISTS catalog_tree (
+  ancestor_id INTEGER NOT NULL,
+  descendant_id INTEGER NOT NULL,
+  depth INTEGER NOT NULL,
+  PRIMARY KEY (ancestor_id, descendant_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_catalog_tree_descendant ON catalog_tree(descendant_id);
+
+INSERT OR IGNORE INTO schema_backfills(name, done, finished_at)
+SELECT 'catalog_tree', 1, datetime('now') WHERE NOT EXISTS (SELECT 1 FROM catalog_items);
+INSERT OR IGNORE INTO schema_backfills(name) VALUES ('catalog_tree');
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_tree_restart AFTER UPDATE OF parent_id ON catalog_items
+WHEN new.parent_id IS NOT old.parent_id
+  AND EXISTS (SELECT 1 FROM schema_backfills WHERE name='catalog_tree' AND done=0 AND cursor > 0)
+BEGIN
+  UPDATE schema_backfills SET cursor=0, processed=0, updated_at=datetime('now') WHERE name='catalog_tree';
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_tree_ai AFTER INSERT ON catalog_items BEGIN
+  INSERT OR IGNORE INTO catalog_tree(ancestor_id, descendant_id, depth) VALUES (new.id, new.id, 0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_tree_au AFTER UPDATE OF parent_id ON catalog_items
+WHEN new.parent_id IS NOT old.parent_id
+BEGIN
+  INSERT OR IGNORE INTO catalog_tree(ancestor_id, descendant_id, depth) VALUES (new.id, new.id, 0);
+  -- Detach the subtree from its old ancestors, then attach it under the new parent's ancestors.
+  DELETE FROM catalog_tree
+  WHERE descendant_id IN (SELECT descendant_id FROM catalog_tree WHERE ancestor_id = new.id)
+    AND ancestor_id IN (SELECT ancestor_id FROM catalog_tree WHERE descendant_id = new.id AND ancestor_id != new.id);
+  INSERT OR REPLACE INTO catalog_tree(ancestor_id, descendant_id, depth)
+  SELECT a.ancestor_id, d.descendant_id, a.depth + d.depth + 1
+  FROM catalog_tree a, catalog_tree d
+  WHERE a.descendant_id = new.parent_id AND d.ancestor_id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_tree_ad AFTER DELETE ON catalog_items BEGIN
+  DELETE FROM catalog_tree WHERE ancestor_id = old.id OR descendant_id = old.id;
+END;
+"""
+
+
+# v19: download audit rollups for /stats. Hour × item × result and day × user counters are bumped
+# by a trigger as audit rows are written, so window queries read O(hours × items) rollup rows instead
+# of grouping raw audit. Rollups are history: deleting/archiving raw audit rows does not touch them.
+# Existing audit is rolled up by the audit_rollups backfill; until it is done, the trigger skips rows
+# above its cursor.
+MIGRATION_V19 = _SCHEMA_BACKFILLS_DDL + """
+CREATE TABLE IF NOT EXISTS download_audit_hourly (
+  hour TEXT NOT NULL,
+  catalog_item_id INTEGER NOT NULL,
+  result TEXT NOT NULL,
+  downloads INTEGER NOT NULL DEFAULT 0,
+  bytes INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (hour, catalog_item_id, result)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS download_audit_daily_users (
+  day TEXT NOT NULL,
+  tg_user_id INTEGER NOT NULL,
+  succeeded INTEGER NOT NULL DEFAULT 0,
+  failed INTEGER NOT NULL DEFAULT 0,
+  bytes INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, tg_user_id)
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO schema_backfills(name, done, finished_at)
+SELECT 'audit_rollups', 1, datetime('now') WHERE NOT EXISTS (SELECT 1 FROM download_audit);
+INSERT OR IGNORE INTO schema_backfills(name) VALUES ('audit_rollups');
+
+CREATE TRIGGER IF NOT EXISTS download_audit_rollup_ai AFTER INSERT ON download_audit
+WHEN NOT EXISTS (SELECT 1 FROM schema_backfills WHERE name='audit_rollups' AND done=0 AND new.id > cursor)
+BEGIN
+  INSERT INTO download_audit_hourly(hour, catalog_item_id, result, downloads, bytes)
+  VALUES (strftime('%Y-%m-%d %H:00:00', new.created_at), new.catalog_item_id, new.result, 1, COALESCE(new.bytes, 0))
+  ON CONFLICT(hour, catalog_item_id, result) DO UPDATE SET
+    downloads = downloads + 1,
+    bytes = bytes + excluded.bytes;
+  INSERT INTO download_audit_daily_users(day, tg_user_id, succeeded, failed, bytes)
+  VALUES (date(new.created_at), new.tg_user_id, new.result = 'succeeded', new.result = 'failed', COALESCE(new.bytes, 0))
+  ON CONFLICT(day, tg_user_id) DO UPDATE SET
+    succeeded = succeeded + excluded.succeeded,
+    failed = failed + excluded.failed,
+    bytes = bytes + excluded.bytes;
+END;
+"""
+
+
+# v20: retention pass picks terminal jobs by age (see archive_jobs_batch).
+MIGRATION_V20 = """
+CREATE INDEX IF NOT EXISTS idx_jobs_state_updated ON jobs(state, updated_at);
+"""
+
+
+# v21: online backfills. Migrations keep to fast DDL; heavy data steps are rows in schema_backfills
+# that the worker processes in small resumable batches while both services serve (see run_backfill_batch).
+# FTS triggers skip rows above the cursor of a pending catalog_fts rebuild: the rebuild indexes them
+# when it gets there, so a chunked rebuild never races the triggers.
+MIGRATION_V21 = _SCHEMA_BACKFILLS_DDL + """
+DROP TRIGGER IF EXISTS catalog_items_fts_ai;
+CREATE TRIGGER IF NOT EXISTS catalog_items_fts_ai AFTER INSERT ON catalog_items
+WHEN NOT EXISTS (SELECT 1 FROM schema_backfills WHERE name='catalog_fts' AND done=0 AND new.id > cursor)
+BEGIN
+  INSERT INTO catalog_items_fts(rowid, title, path) VALUES (new.id, new.title, new.path);
+END;
+
+DROP TRIGGER IF EXISTS catalog_items_fts_ad;
+CREATE TRIGGER IF NOT EXISTS catalog_items_fts_ad AFTER DELETE ON catalog_items
+WHEN NOT EXISTS (SELECT 1 FROM schema_backfills WHERE name='catalog_fts' AND done=0 AND old.id > cursor)
+BEGIN
+  INSERT INTO catalog_items_fts(catalog_items_fts, rowid, title, path) VALUES('delete', old.id, old.title, old.path);
+END;
+
+DROP TRIGGER IF EXISTS catalog_items_fts_au;
+CREATE TRIGGER IF NOT EXISTS catalog_items_fts_au AFTER UPDATE OF title, path ON catalog_items
+WHEN NOT EXISTS (SELECT 1 FROM schema_backfills WHERE name='catalog_fts' AND done=0 AND old.id > cursor)
+BEGIN
+  INSERT INTO catalog_items_fts(catalog_items_fts, rowid, title, path) VALUES('delete', old.id, old.title, old.path);
+  INSERT INTO catalog_items_fts(rowid, title, path) VALUES (new.id, new.title, new.path);
+END;
+
+-- Recursive folder totals (v15) are filled in the background instead of at every worker start.
+INSERT OR IGNORE INTO schema_backfills(name) VALUES ('folder_totals');
+"""
+
+
+# v22: substring search. A trigram FTS5 index over title/path serves infix queries (parts of document
+# numbers, words inside names) that the prefix-only catalog_items_fts cannot, instead of a LIKE scan.
+# Filled by the catalog_trgm backfill; an empty catalog needs none, so fresh installs start with it done.
+MIGRATION_V22 = """
+CREATE VIRTUAL TABLE IF NOT EXISTS catalog_items_trgm USING fts5(
+  title,
+  path,
+  content='catalog_items',
+  content_rowid='id',
+  tokenize='trigram'
+);
+
+INSERT OR IGNORE INTO schema_backfills(name, done, finished_at)
+SELECT 'catalog_trgm', 1, datetime('now') WHERE NOT EXISTS (SELECT 1 FROM catalog_items);
+INSERT OR IGNORE INTO schema_backfills(name) VALUES ('catalog_trgm');
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_trgm_ai AFTER INSERT ON catalog_items
+WHEN NOT EXISTS (SELECT 1 FROM schema_backfills WHERE name='catalog_trgm' AND done=0 AND new.id > cursor)
+BEGIN
+  INSERT INTO catalog_items_trgm(rowid, title, path) VALUES (new.id, new.title, new.path);
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_trgm_ad AFTER DELETE ON catalog_items
+WHEN NOT EXISTS (SELECT 1 FROM schema_backfills WHERE name='catalog_trgm' AND done=0 AND old.id > cursor)
+BEGIN
+  INSERT INTO catalog_items_trgm(catalog_items_trgm, rowid, title, path) VALUES('delete', old.id, old.title, old.path);
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_trgm_au AFTER UPDATE OF title, path ON catalog_items
+WHEN NOT EXISTS (SELECT 1 FROM schema_backfills WHERE name='catalog_trgm' AND done=0 AND old.id > cursor)
+BEGIN
+  INSERT INTO catalog_items_trgm(catalog_items_trgm, rowid, title, path) VALUES('delete', old.id, old.title, old.path);
+  INSERT INTO catalog_items_trgm(rowid, title, path) VALUES (new.id, new.title, new.path);
+END;
+"""
+
+
+# v23: read access to the terms of catalog_items_fts (the vocabulary of the fuzzy search tier,
+# see adaspeas.common.fuzzy). fts5vocab reads the FTS index itself: no extra data to keep in sync.
+MIGRATION_V23 = """
+CREATE VIRTUAL TABLE IF NOT EXISTS catalog_items_vocab USING fts5vocab('catalog_items_fts', 'row');
+"""
+
+
+# v24: document content index. catalog_content holds the extracted text of each live file (state
+# pending -> done | skipped | failed) and feeds catalog_content_fts. Triggers re-queue a file when its
+# content identity (hash, else size@modified) changes and drop the row when the file goes away; rev
+# lets the worker detect a re-queue that happened while it was extracting. Existing files are queued
+# by the content_queue backfill.
+MIGRATION_V24 = """
+CREATE TABLE IF NOT EXISTS catalog_content (
+  item_id INTEGER PRIMARY KEY REFERENCES catalog_items(id) ON DELETE CASCADE,
+  state TEXT NOT NULL DEFAULT 'pending' CHECK(state IN ('pending','done','skipped','failed')),
+  rev INTEGER NOT NULL DEFAULT 0,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  body TEXT NOT NULL DEFAULT '',
+  error TEXT,
+  updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+CREATE INDEX IF NOT EXISTS idx_catalog_content_pending ON catalog_content(item_id) WHERE state='pending';
+
+CREATE VIRTUAL TABLE IF NOT EXISTS catalog_content_fts USING fts5(
+  body,
+  content='catalog_content',
+  content_rowid='item_id'
+);
+
+CREATE TRIGGER IF NOT EXISTS catalog_content_fts_ai AFTER INSERT ON catalog_content BEGIN
+  INSERT INTO catalog_content_fts(rowid, body) VALUES (new.item_id, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS catalog_content_fts_ad AFTER DELETE ON catalog_content BEGIN
+  INSERT INTO catalog_content_fts(catalog_content_fts, rowid, body) VALUES('delete', old.item_id, old.body);
+END;
+CREATE TRIGGER IF NOT EXISTS catalog_content_fts_au AFTER UPDATE OF body ON catalog_content BEGIN
+  INSERT INTO catalog_content_fts(catalog_content_fts, rowid, body) VALUES('delete', old.item_id, old.body);
+  INSERT INTO catalog_content_fts(rowid, body) VALUES (new.item_id, new.body);
+END;
+
+CREATE TRIGGER IF NOT EXISTS catalog_items_content_ai AFTER INSERT ON catalog_items
+WHEN new.kind='file' AND new.is_deleted=0
+BEGIN
+  INSERT INTO catalog_content(item_id) VALUES (new.id)
+  ON CONFLICT(item_id) DO UPDATE SET state='pending', rev=rev + 1, attempts=0, updated_at=datetime('now');
+END;
+CREATE TRIGGER IF NOT EXISTS catalog_items_content_au
+AFTER UPDATE OF kind, is_deleted, size_bytes, modified_at, content_md5, content_sha256 ON catalog_items
+WHEN new.kind='file' AND new.is_deleted=0 AND (
+  old.kind IS NOT 'file' OR old.is_deleted=1
+  OR COALESCE(new.content_sha256, new.content_md5, COALESCE(new.size_bytes, '') || '@' || COALESCE(new.modified_at, ''))
+     IS NOT COALESCE(old.content_sha256, old.content_md5, COALESCE(old.size_bytes, '') || '@' || COALESCE(old.modified_at, ''))
+)
+BEGIN
+  INSERT INTO catalog_content(item_id) VALUES (new.id)
+  ON CONFLICT(item_id) DO UPDATE SET state='pending', rev=rev + 1, attempts=0, updated_at=datetime('now');
+END;
+CREATE TRIGGER IF NOT EXISTS catalog_items_content_gone AFTER UPDATE OF kind, is_deleted ON catalog_items
+WHEN new.kind IS NOT 'file' OR new.is_deleted=1
+BEGIN
+  DELETE FROM catalog_content WHERE item_id=new.id;
+END;
 
+INSERT OR IGNORE INTO schema_backfills(name) VALUES ('content_queue');
+"""
 
 
-TARGET_SCHEMA_VERSION = 10
+TARGET_SCHEMA_VERSION = 24
 MIGRATIONS: dict[int, str] = {
     2: MIGRATION_V2,
     3: MIGRATION_V3,
@@ -211,6 +710,20 @@ MIGRATIONS: dict[int, str] = {
     8: MIGRATION_V8,
     9: MIGRATION_V9,
     10: MIGRATION_V10,
+    11: MIGRATION_V11,
+    12: MIGRATION_V12,
+    13: MIGRATION_V13,
+    14: MIGRATION_V14,
+    15: MIGRATION_V15,
+    16: MIGRATION_V16,
+    17: MIGRATION_V17,
+    18: MIGRATION_V18,
+    19: MIGRATION_V19,
+    20: MIGRATION_V20,
+    21: MIGRATION_V21,
+    22: MIGRATION_V22,
+    23: MIGRATION_V23,
+    24: MIGRATION_V24,
 }
 
 
@@ -222,6 +735,223 @@ async def connect(sqlite_path: str) -> aiosqlite.Connection:
     return db
 
 
+async def _connect_reader(sqlite_path: str) -> aiosqlite.Connection:
+    # mode=ro + query_only: a pooled reader can never take the WAL write lock.
+    db = await aiosqlite.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    await db.execute("PRAGMA query_only=ON;")
+    return db
+
+
+SQLITE_COMMIT_BATCH = Histogram(
+    "sqlite_commit_batch_size",
+    "Commit requests served by one SQLite COMMIT (group commit)",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+
+class DbPool:
+    """One writer connection plus a pool of read-only WAL connections.
+
+    Each aiosqlite connection runs its statements on its own thread, so with a single connection
+    every read queues behind pending writes. DbPool keeps the aiosqlite.Connection surface
+    (execute/commit/... go to the writer), while helpers decorated with @_reads borrow a reader.
+    Readers see only committed data; every write helper here commits before returning.
+
+    Group commit: with commit_window_ms > 0, commit() does not issue its own COMMIT. Requests that
+    arrive within the window (or until commit_max_batch callers wait) share one COMMIT of the
+    writer's transaction, and every caller returns only after that COMMIT succeeded (or raises its error).
+
+    Write units: the writer is shared by several tasks, so a COMMIT (grouped or not) issued for one task
+    would also commit another task's half-written statements. A multi-statement write runs inside
+    write_unit(): it holds the writer from its first statement to its end, inside a SAVEPOINT that is
+    rolled back if the unit fails. Other tasks' statements and COMMITs wait for the unit to finish.
+    """
+
+    def __init__(
+        self,
+        writer: aiosqlite.Connection,
+        readers: list[aiosqlite.Connection],
+        *,
+        commit_window_ms: int = 0,
+        commit_max_batch: int = 64,
+    ):
+        self.writer = writer
+        self._readers = list(readers)
+        self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        for conn in self._readers:
+            self._idle.put_nowait(conn)
+        self._commit_window = max(0, int(commit_window_ms)) / 1000.0
+        self._commit_max_batch = max(1, int(commit_max_batch))
+        self._commit_waiters: list[asyncio.Future] = []
+        self._commit_full = asyncio.Event()
+        self._committer: asyncio.Task | None = None
+        self._unit_lock = asyncio.Lock()
+        self._unit_task: asyncio.Task | None = None
+
+    def __getattr__(self, name: str):
+        return getattr(self.writer, name)
+
+    @property
+    def read_pool_size(self) -> int:
+        return len(self._readers)
+
+    @contextlib.asynccontextmanager
+    async def reader(self):
+        if not self._readers:
+            yield self.writer
+            return
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    def _in_unit(self) -> bool:
+        return self._unit_task is not None and self._unit_task is asyncio.current_task()
+
+    async def _outside_units(self) -> None:
+        """Wait until no other task's write unit holds the writer."""
+        while self._unit_task is not None and not self._in_unit():
+            async with self._unit_lock:
+                pass
+
+    @contextlib.asynccontextmanager
+    async def write_unit(self):
+        if self._in_unit():
+            yield
+            return
+        async with self._unit_lock:
+            self._unit_task = asyncio.current_task()
+            try:
+                # Outside a transaction the SAVEPOINT opens one and its RELEASE commits; inside one it nests.
+                await self.writer.execute("SAVEPOINT write_unit")
+                try:
+                    yield
+                except BaseException:
+                    await self.writer.execute("ROLLBACK TO write_unit")
+                    await self.writer.execute("RELEASE write_unit")
+                    raise
+                await self.writer.execute("RELEASE write_unit")
+            finally:
+                self._unit_task = None
+
+    async def execute(self, sql: str, parameters=None):
+        await self._outside_units()
+        return await self.writer.execute(sql, parameters)
+
+    async def executemany(self, sql: str, parameters):
+        await self._outside_units()
+        return await self.writer.executemany(sql, parameters)
+
+    async def executescript(self, sql_script: str):
+        await self._outside_units()
+        return await self.writer.executescript(sql_script)
+
+    async def commit(self) -> None:
+        if self._in_unit():
+            # The unit's own end makes its statements durable (or rolls them back).
+            return
+        if self._commit_window <= 0:
+            await self._outside_units()
+            await self.writer.commit()
+            SQLITE_COMMIT_BATCH.observe(1)
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._commit_waiters.append(fut)
+        if len(self._commit_waiters) >= self._commit_max_batch:
+            self._commit_full.set()
+        if self._committer is None or self._committer.done():
+            self._committer = asyncio.create_task(self._commit_loop(), name="sqlite_group_commit")
+        # The shared COMMIT proceeds even if this caller is cancelled.
+        await asyncio.shield(fut)
+
+    async def _commit_loop(self) -> None:
+        while self._commit_waiters:
+            try:
+                await asyncio.wait_for(self._commit_full.wait(), timeout=self._commit_window)
+            except asyncio.TimeoutError:
+                pass
+            self._commit_full.clear()
+            batch, self._commit_waiters = self._commit_waiters, []
+            try:
+                async with self._unit_lock:
+                    await self.writer.commit()
+            except Exception as e:
+                for fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                for fut in batch:
+                    if not fut.done():
+                        fut.set_result(None)
+            SQLITE_COMMIT_BATCH.observe(len(batch))
+
+    async def close(self) -> None:
+        if self._committer is not None and not self._committer.done():
+            # Flush pending group commits before closing the writer.
+            self._commit_full.set()
+            try:
+                await self._committer
+            except Exception:
+                pass
+        for conn in self._readers:
+            try:
+                await conn.close()
+            except Exception:
+                pass
+        await self.writer.close()
+
+
+async def connect_pool(
+    sqlite_path: str,
+    *,
+    read_pool_size: int = 4,
+    commit_window_ms: int = 0,
+    commit_max_batch: int = 64,
+) -> DbPool:
+    """Writer connection (see connect) plus read_pool_size read-only connections (0 = writer only).
+
+    commit_window_ms > 0 enables group commit (see DbPool).
+    """
+    writer = await connect(sqlite_path)
+    readers: list[aiosqlite.Connection] = []
+    try:
+        for _ in range(max(0, int(read_pool_size))):
+            readers.append(await _connect_reader(sqlite_path))
+    except Exception:
+        for conn in readers:
+            await conn.close()
+        await writer.close()
+        raise
+    return DbPool(writer, readers, commit_window_ms=commit_window_ms, commit_max_batch=commit_max_batch)
+
+
+@contextlib.asynccontextmanager
+async def _write_unit(db):
+    """Make a multi-statement write atomic on a shared DbPool writer (see DbPool); commit after the block.
+
+    A plain connection serves one task at a time and needs nothing.
+    """
+    if isinstance(db, DbPool):
+        async with db.write_unit():
+            yield
+    else:
+        yield
+
+
+def _reads(fn):
+    """Run a read-only helper on a pooled reader when called with a DbPool."""
+
+    @functools.wraps(fn)
+    async def wrapper(db, *args, **kwargs):
+        if isinstance(db, DbPool):
+            async with db.reader() as conn:
+                return await fn(conn, *args, **kwargs)
+        return await fn(db, *args, **kwargs)
+
+    return wrapper
+
+
 async def _get_schema_version(db: aiosqlite.Connection) -> int:
     cur = await db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='schema_version'")
     if not await cur.fetchone():
@@ -308,6 +1038,7 @@ async def _executescript_idempotent(db: aiosqlite.Connection, script: str) -> No
     await _executescript_tolerant(db, script)
 
 
+@_reads
 async def count_rows(db: aiosqlite.Connection, table: str) -> int:
     """Best-effort row count for diagnostics."""
     if not re.fullmatch(r"[A-Za-z0-9_]+", table or ""):
@@ -317,6 +1048,7 @@ async def count_rows(db: aiosqlite.Connection, table: str) -> int:
     return int(row[0] or 0)
 
 
+@_reads
 async def group_count(db: aiosqlite.Connection, table: str, column: str) -> dict[str, int]:
     """Best-effort grouped counts for diagnostics."""
     if not re.fullmatch(r"[A-Za-z0-9_]+", table or "") or not re.fullmatch(r"[A-Za-z0-9_]+", column or ""):
@@ -329,6 +1061,7 @@ async def group_count(db: aiosqlite.Connection, table: str, column: str) -> dict
 
 
 async def ensure_schema(db: aiosqlite.Connection) -> None:
+    """Apply pending migrations (fast DDL); data backfills they register run later in the worker."""
     # Base schema
     await db.executescript(SCHEMA_V1)
 
@@ -370,30 +1103,24 @@ async def upsert_user(db: aiosqlite.Connection, tg_user_id: int) -> int:
 USER_STATUSES = {"guest", "pending", "active", "expired", "blocked"}
 
 
+# Column order of records.User (without id).
+_USER_COLUMNS = "tg_user_id, created_at, COALESCE(status, 'guest'), user_note, expires_at, warned_24h_at, updated_at"
+
+
 def _now_sqlite_utc() -> str:
     # Keep the same sortable format SQLite uses for datetime('now').
     from datetime import datetime, timezone
     return datetime.now(timezone.utc).replace(microsecond=0).strftime("%Y-%m-%d %H:%M:%S")
 
 
-async def fetch_user_by_tg_user_id(db: aiosqlite.Connection, tg_user_id: int) -> dict | None:
+@_reads
+async def fetch_user_by_tg_user_id(db: aiosqlite.Connection, tg_user_id: int) -> User | None:
     cur = await db.execute(
-        "SELECT id, tg_user_id, created_at, status, user_note, expires_at, warned_24h_at, updated_at FROM users WHERE tg_user_id=?",
+        f"SELECT {_USER_COLUMNS}, id FROM users WHERE tg_user_id=?",
         (tg_user_id,),
     )
     row = await cur.fetchone()
-    if not row:
-        return None
-    return {
-        "id": int(row[0]),
-        "tg_user_id": int(row[1]),
-        "created_at": row[2],
-        "status": row[3] or "guest",
-        "user_note": row[4],
-        "expires_at": row[5],
-        "warned_24h_at": row[6],
-        "updated_at": row[7],
-    }
+    return from_row(User, row) if row else None
 
 
 async def set_user_note(db: aiosqlite.Connection, tg_user_id: int, note: str) -> None:
@@ -453,35 +1180,22 @@ async def extend_user(db: aiosqlite.Connection, tg_user_id: int, add_days: int)
     await set_user_status(db, tg_user_id, "active", expires_at=expires_at)
 
 
-async def list_users_page(db: aiosqlite.Connection, *, limit: int = 200, offset: int = 0) -> tuple[list[dict], bool]:
+@_reads
+async def list_users_page(db: aiosqlite.Connection, *, limit: int = 200, offset: int = 0) -> tuple[list[User], bool]:
     """Return users page ordered by updated_at DESC. has_more is best-effort."""
     limit = max(1, int(limit))
     offset = max(0, int(offset))
     limit_plus = limit + 1
     cur = await db.execute(
-        "SELECT tg_user_id, created_at, status, user_note, expires_at, warned_24h_at, updated_at FROM users ORDER BY updated_at DESC LIMIT ? OFFSET ?",
+        f"SELECT {_USER_COLUMNS} FROM users ORDER BY updated_at DESC LIMIT ? OFFSET ?",
         (int(limit_plus), int(offset)),
     )
     rows = await cur.fetchall()
     has_more = len(rows) > limit
-    rows = rows[:limit]
-    out: list[dict] = []
-    for r in rows:
-        out.append(
-            {
-                "tg_user_id": int(r[0]),
-                "created_at": r[1],
-                "status": r[2] or "guest",
-                "user_note": r[3],
-                "expires_at": r[4],
-                "warned_24h_at": r[5],
-                "updated_at": r[6],
-            }
-        )
-    return out, has_more
+    return from_rows(User, rows[:limit]), has_more
 
 
-async def list_users(db: aiosqlite.Connection, limit: int = 200, offset: int = 0) -> list[dict]:
+async def list_users(db: aiosqlite.Connection, limit: int = 200, offset: int = 0) -> list[User]:
     """Backward-compatible wrapper."""
     users, _more = await list_users_page(db, limit=limit, offset=offset)
     return users
@@ -515,6 +1229,7 @@ async def create_admin_session(
     return token
 
 
+@_reads
 async def fetch_admin_session(db: aiosqlite.Connection, token: str) -> dict | None:
     cur = await db.execute(
         "SELECT token, created_at, tg_user_id, query FROM admin_sessions WHERE token=?",
@@ -526,13 +1241,14 @@ async def fetch_admin_session(db: aiosqlite.Connection, token: str) -> dict | No
     return {"token": str(row[0]), "created_at": row[1], "tg_user_id": int(row[2]), "query": row[3]}
 
 
+@_reads
 async def search_users(
     db: aiosqlite.Connection,
     *,
     query: str,
     limit: int = 20,
     offset: int = 0,
-) -> tuple[list[dict], bool]:
+) -> tuple[list[User], bool]:
     q = (query or "").strip()
     if not q:
         return [], False
@@ -545,8 +1261,8 @@ async def search_users(
     if q.isdigit():
         like = q + "%"
         cur = await db.execute(
-            """
-            SELECT tg_user_id, created_at, status, user_note, expires_at, warned_24h_at, updated_at
+            f"""
+            SELECT {_USER_COLUMNS}
             FROM users
             WHERE tg_user_id = ?
                OR CAST(tg_user_id AS TEXT) LIKE ?
@@ -558,8 +1274,8 @@ async def search_users(
     else:
         like = f"%{_like_escape(q)}%"
         cur = await db.execute(
-            """
-            SELECT tg_user_id, created_at, status, user_note, expires_at, warned_24h_at, updated_at
+            f"""
+            SELECT {_USER_COLUMNS}
             FROM users
             WHERE status LIKE ? ESCAPE '\'
                OR (user_note IS NOT NULL AND user_note LIKE ? ESCAPE '\')
@@ -571,21 +1287,7 @@ async def search_users(
 
     rows = await cur.fetchall()
     has_more = len(rows) > limit
-    rows = rows[:limit]
-    out: list[dict] = []
-    for r in rows:
-        out.append(
-            {
-                "tg_user_id": int(r[0]),
-                "created_at": r[1],
-                "status": r[2] or "guest",
-                "user_note": r[3],
-                "expires_at": r[4],
-                "warned_24h_at": r[5],
-                "updated_at": r[6],
-            }
-        )
-    return out, has_more
+    return from_rows(User, rows[:limit]), has_more
 
 
 async def expire_users(db: aiosqlite.Connection) -> int:
@@ -597,7 +1299,8 @@ async def expire_users(db: aiosqlite.Connection) -> int:
     return int(cur.rowcount or 0)
 
 
-async def fetch_users_expiring_within(db: aiosqlite.Connection, warn_before_sec: int) -> list[dict]:
+@_reads
+async def fetch_users_expiring_within(db: aiosqlite.Connection, warn_before_sec: int) -> list[User]:
     warn_before_sec = int(warn_before_sec)
     if warn_before_sec <= 0:
         warn_before_sec = 86400
@@ -606,7 +1309,7 @@ async def fetch_users_expiring_within(db: aiosqlite.Connection, warn_before_sec:
     boundary_expr = f"datetime('now', '+{minutes} minutes')"
     cur = await db.execute(
         f"""
-        SELECT tg_user_id, status, user_note, expires_at
+        SELECT {_USER_COLUMNS}
         FROM users
         WHERE status='active'
           AND expires_at IS NOT NULL
@@ -616,11 +1319,7 @@ async def fetch_users_expiring_within(db: aiosqlite.Connection, warn_before_sec:
         LIMIT 200
         """
     )
-    rows = await cur.fetchall()
-    out=[]
-    for r in rows:
-        out.append({"tg_user_id": int(r[0]), "status": r[1], "user_note": r[2], "expires_at": r[3]})
-    return out
+    return from_rows(User, await cur.fetchall())
 
 
 async def mark_user_warned_24h(db: aiosqlite.Connection, tg_user_id: int) -> None:
@@ -683,10 +1382,10 @@ async def bump_attempt(db: aiosqlite.Connection, job_id: int, last_error: str) -
     return int(row[0])
 
 
-async def fetch_job(db: aiosqlite.Connection, job_id: int) -> dict:
+async def fetch_job(db: aiosqlite.Connection, job_id: int) -> Job:
     cur = await db.execute(
         """
-        SELECT id, tg_chat_id, tg_user_id, catalog_item_id, state, attempt, last_error, job_type
+        SELECT id, tg_chat_id, tg_user_id, catalog_item_id, state, attempt, last_error, COALESCE(job_type, 'download')
         FROM jobs WHERE id=?
         """,
         (job_id,),
@@ -694,22 +1393,21 @@ async def fetch_job(db: aiosqlite.Connection, job_id: int) -> dict:
     row = await cur.fetchone()
     if not row:
         raise KeyError(f"job {job_id} not found")
-    return {
-        "id": int(row[0]),
-        "tg_chat_id": int(row[1]),
-        "tg_user_id": int(row[2]),
-        "catalog_item_id": int(row[3]),
-        "state": row[4],
-        "attempt": int(row[5]),
-        "last_error": row[6],
-        "job_type": row[7] or 'download',
-    }
+    return from_row(Job, row)
+
 
+# Column order of records.CatalogItem.
+_CATALOG_ITEM_COLUMNS = (
+    "id, path, kind, title, yandex_id, size_bytes, tg_file_id, tg_file_unique_id, parent_path, seen_at, "
+    "COALESCE(is_deleted, 0), content_md5, content_sha256"
+)
 
-async def fetch_catalog_item(db: aiosqlite.Connection, item_id: int) -> dict:
+
+@_reads
+async def fetch_catalog_item(db: aiosqlite.Connection, item_id: int) -> CatalogItem:
     cur = await db.execute(
-        """
-        SELECT id, path, kind, title, yandex_id, size_bytes, tg_file_id, tg_file_unique_id, parent_path, seen_at, is_deleted
+        f"""
+        SELECT {_CATALOG_ITEM_COLUMNS}
         FROM catalog_items WHERE id=?
         """,
         (item_id,),
@@ -717,19 +1415,7 @@ async def fetch_catalog_item(db: aiosqlite.Connection, item_id: int) -> dict:
     row = await cur.fetchone()
     if not row:
         raise KeyError(f"catalog_item {item_id} not found")
-    return {
-        "id": int(row[0]),
-        "path": row[1],
-        "kind": row[2],
-        "title": row[3],
-        "yandex_id": row[4],
-        "size_bytes": row[5],
-        "tg_file_id": row[6],
-        "tg_file_unique_id": row[7],
-        "parent_path": row[8],
-        "seen_at": row[9],
-        "is_deleted": int(row[10] or 0),
-    }
+    return from_row(CatalogItem, row)
 
 
 async def set_catalog_item_tg_file(
@@ -749,6 +1435,88 @@ async def set_catalog_item_tg_file(
     await db.commit()
 
 
+# Known content differs (hash or size both present and different): the cached Telegram file is stale.
+_CONTENT_CHANGED_SQL = """(
+    (excluded.content_sha256 IS NOT NULL AND catalog_items.content_sha256 IS NOT NULL AND excluded.content_sha256 != catalog_items.content_sha256)
+    OR (excluded.content_md5 IS NOT NULL AND catalog_items.content_md5 IS NOT NULL AND excluded.content_md5 != catalog_items.content_md5)
+    OR (excluded.size_bytes IS NOT NULL AND catalog_items.size_bytes IS NOT NULL AND excluded.size_bytes != catalog_items.size_bytes)
+  )"""
+
+# sync_generation never goes backwards: upserts outside of sync (generation NULL -> 0) keep the stamp.
+_UPSERT_CATALOG_ITEM_SQL = f"""
+INSERT INTO catalog_items(path, kind, title, yandex_id, size_bytes, parent_path, updated_at, seen_at, is_deleted, sync_generation, content_md5, content_sha256, modified_at)
+VALUES (?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'), 0, COALESCE(?, 0), ?, ?, ?)
+ON CONFLICT(path) DO UPDATE SET
+  kind=excluded.kind,
+  title=excluded.title,
+  yandex_id=excluded.yandex_id,
+  size_bytes=excluded.size_bytes,
+  parent_path=excluded.parent_path,
+  updated_at=datetime('now'),
+  seen_at=datetime('now'),
+  is_deleted=0,
+  sync_generation=MAX(catalog_items.sync_generation, excluded.sync_generation),
+  tg_file_id=CASE WHEN {_CONTENT_CHANGED_SQL} THEN NULL ELSE catalog_items.tg_file_id END,
+  tg_file_unique_id=CASE WHEN {_CONTENT_CHANGED_SQL} THEN NULL ELSE catalog_items.tg_file_unique_id END,
+  content_md5=COALESCE(excluded.content_md5, catalog_items.content_md5),
+  content_sha256=COALESCE(excluded.content_sha256, catalog_items.content_sha256),
+  modified_at=COALESCE(excluded.modified_at, catalog_items.modified_at)
+"""
+
+
+# --- Content-addressed Telegram upload cache ---
+
+def content_key(item: CatalogItem) -> str | None:
+    """Content hash key of a catalog item ('sha256:<hex>' preferred, 'md5:<hex>'), or None if unknown."""
+    sha = (item.content_sha256 or "").strip().lower()
+    if sha:
+        return "sha256:" + sha
+    md5 = (item.content_md5 or "").strip().lower()
+    if md5:
+        return "md5:" + md5
+    return None
+
+
+async def fetch_tg_file_by_content(db: aiosqlite.Connection, key: str) -> tuple[str, str | None] | None:
+    cur = await db.execute(
+        "SELECT tg_file_id, tg_file_unique_id FROM tg_file_cache WHERE content_hash=?",
+        (key,),
+    )
+    row = await cur.fetchone()
+    if not row:
+        return None
+    return str(row[0]), row[1]
+
+
+async def set_tg_file_by_content(
+    db: aiosqlite.Connection,
+    key: str,
+    tg_file_id: str,
+    tg_file_unique_id: str | None = None,
+) -> None:
+    await db.execute(
+        """
+        INSERT INTO tg_file_cache(content_hash, tg_file_id, tg_file_unique_id, updated_at)
+        VALUES (?, ?, ?, datetime('now'))
+        ON CONFLICT(content_hash) DO UPDATE SET
+          tg_file_id=excluded.tg_file_id,
+          tg_file_unique_id=excluded.tg_file_unique_id,
+          updated_at=datetime('now')
+        """,
+        (key, tg_file_id, tg_file_unique_id),
+    )
+    await db.commit()
+
+
+async def drop_tg_file_by_content(db: aiosqlite.Connection, key: str, tg_file_id: str) -> None:
+    """Forget a cached upload, but only if it still points at the file_id that failed."""
+    await db.execute(
+        "DELETE FROM tg_file_cache WHERE content_hash=? AND tg_file_id=?",
+        (key, tg_file_id),
+    )
+    await db.commit()
+
+
 async def upsert_catalog_item(
     db: aiosqlite.Connection,
     path: str,
@@ -757,23 +1525,15 @@ async def upsert_catalog_item(
     yandex_id: str | None = None,
     size_bytes: int | None = None,
     parent_path: str | None = None,
+    sync_generation: int | None = None,
+    content_md5: str | None = None,
+    content_sha256: str | None = None,
+    modified_at: str | None = None,
 ) -> int:
     """Insert/update catalog item by unique path. Returns item id."""
     await db.execute(
-        """
-        INSERT INTO catalog_items(path, kind, title, yandex_id, size_bytes, parent_path, updated_at, seen_at, is_deleted)
-        VALUES (?, ?, ?, ?, ?, ?, datetime('now'), datetime('now'), 0)
-        ON CONFLICT(path) DO UPDATE SET
-          kind=excluded.kind,
-          title=excluded.title,
-          yandex_id=excluded.yandex_id,
-          size_bytes=excluded.size_bytes,
-          parent_path=excluded.parent_path,
-          updated_at=datetime('now'),
-          seen_at=datetime('now'),
-          is_deleted=0
-        """,
-        (path, kind, title, yandex_id, size_bytes, parent_path),
+        _UPSERT_CATALOG_ITEM_SQL,
+        (path, kind, title, yandex_id, size_bytes, parent_path, sync_generation, content_md5, content_sha256, modified_at),
     )
     await db.commit()
     cur = await db.execute("SELECT id FROM catalog_items WHERE path=?", (path,))
@@ -781,92 +1541,766 @@ async def upsert_catalog_item(
     return int(row[0])
 
 
-async def fetch_catalog_item_by_path(db: aiosqlite.Connection, path: str) -> dict | None:
+@_reads
+async def fetch_catalog_item_by_path(db: aiosqlite.Connection, path: str) -> CatalogItem | None:
     cur = await db.execute(
-        """
-        SELECT id, path, kind, title, yandex_id, size_bytes, tg_file_id, tg_file_unique_id, parent_path, seen_at, is_deleted
+        f"""
+        SELECT {_CATALOG_ITEM_COLUMNS}
         FROM catalog_items WHERE path=?
         """,
         (path,),
     )
     row = await cur.fetchone()
-    if not row:
-        return None
-    return {
-        "id": int(row[0]),
-        "path": row[1],
-        "kind": row[2],
-        "title": row[3],
-        "yandex_id": row[4],
-        "size_bytes": row[5],
-        "tg_file_id": row[6],
-        "tg_file_unique_id": row[7],
-        "parent_path": row[8],
-        "seen_at": row[9],
-        "is_deleted": int(row[10] or 0),
-    }
+    return from_row(CatalogItem, row) if row else None
+
+
+async def _children_filter(db: aiosqlite.Connection, parent_path: str | None) -> tuple[str, tuple]:
+    """WHERE clause selecting a folder's children: by parent_id, or by parent_path for orphans.
+
+    Without a folder row (or for parent_path=None, the roots) the children are exactly the rows
+    with parent_id NULL, which the partial index idx_catalog_orphans covers.
+    """
+    if parent_path is not None:
+        cur = await db.execute("SELECT id FROM catalog_items WHERE path=?", (parent_path,))
+        row = await cur.fetchone()
+        if row is not None:
+            return "parent_id=?", (int(row[0]),)
+    return "parent_id IS NULL AND parent_path IS ?", (parent_path,)
 
 
+@_reads
 async def fetch_children(
     db: aiosqlite.Connection,
     parent_path: str | None,
     *,
     limit: int = 60,
     offset: int = 0,
-) -> list[dict]:
+) -> list[CatalogEntry]:
     """Fetch immediate children for a folder path."""
+    where, params = await _children_filter(db, parent_path)
     cur = await db.execute(
-        """
-        SELECT id, kind, title, size_bytes
+        f"""
+        SELECT id, kind, title, size_bytes, path
         FROM catalog_items
-        WHERE parent_path IS ?
+        WHERE {where}
           AND is_deleted=0
-        ORDER BY kind DESC, title ASC
+        ORDER BY kind DESC, title ASC, id ASC
         LIMIT ? OFFSET ?
         """,
-        (parent_path, int(limit), int(offset)),
+        (*params, int(limit), int(offset)),
     )
-    rows = await cur.fetchall()
-    return [
-        {"id": int(r[0]), "kind": r[1], "title": r[2], "size_bytes": r[3]}
-        for r in rows
-    ]
+    return from_rows(CatalogEntry, await cur.fetchall())
 
 
-async def count_children(db: aiosqlite.Connection, parent_path: str | None) -> int:
-    cur = await db.execute(
-        """
-        SELECT COUNT(*)
-        FROM catalog_items
-        WHERE parent_path IS ?
-          AND is_deleted=0
-        """,
-        (parent_path,),
-    )
+async def _catalog_anchor(db: aiosqlite.Connection, item_id: int) -> tuple[str, str, int] | None:
+    cur = await db.execute("SELECT kind, title, id FROM catalog_items WHERE id=?", (int(item_id),))
     row = await cur.fetchone()
-    return int(row[0] or 0)
-
+    return (str(row[0]), str(row[1]), int(row[2])) if row else None
 
 
-# --- Catalog search (IDEA-007) ---
-
-def _fts_query_from_user(q: str) -> str:
-    tokens = re.findall(r"[0-9A-Za-zА-Яа-яЁё]+", (q or "").strip())
-    tokens = [t for t in tokens if t][:8]
-    if not tokens:
-        return ""
-    return " AND ".join([f"{t}*" for t in tokens])
-
+async def _seek_by_kind(
+    db: aiosqlite.Connection,
+    *,
+    where: str,
+    params: tuple,
+    anchor: tuple[str, str, int] | None,
+    backward: bool,
+    limit: int,
+) -> list[CatalogEntry]:
+    """Rows in (kind DESC, title, id) order strictly after (or before) anchor, at most limit.
+
+    kind has two values, so the order is walked as per-kind segments, each one an index range
+    `kind=? AND (title, id) > (?, ?)`: the cost is O(limit) whatever the page depth.
+    """
+    kinds = ["file", "folder"] if backward else ["folder", "file"]
+    if anchor is not None:
+        kinds = kinds[kinds.index(anchor[0]):]
+    cmp, direction = ("<", "DESC") if backward else (">", "ASC")
+    out: list[CatalogEntry] = []
+    for kind in kinds:
+        if len(out) >= limit:
+            break
+        sql = f"""
+            SELECT id, kind, title, size_bytes, path
+            FROM catalog_items
+            WHERE {where} AND kind=?
+        """
+        args: tuple = (*params, kind)
+        if anchor is not None and anchor[0] == kind:
+            sql += f" AND (title, id) {cmp} (?, ?)"
+            args += (anchor[1], anchor[2])
+        sql += f" ORDER BY title {direction}, id {direction} LIMIT ?"
+        cur = await db.execute(sql, (*args, limit - len(out)))
+        out.extend(from_rows(CatalogEntry, await cur.fetchall()))
+    if backward:
+        out.reverse()
+    return out
 
-def _like_escape(q: str) -> str:
-    return (q or "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
+@_reads
+async def fetch_children_page(
+    db: aiosqlite.Connection,
+    parent_path: str | None,
+    *,
+    limit: int = 60,
+    after_id: int | None = None,
+    before_id: int | None = None,
+) -> tuple[list[CatalogEntry], bool]:
+    """Keyset page of a folder's children in (kind DESC, title, id) order.
+
+    after_id / before_id: the last / first item of the adjacent page (item ids make compact cursors).
+    Returns (items, more): more tells whether another page exists in the paging direction.
+    An unknown cursor id restarts from the first page.
+    """
+    where, params = await _children_filter(db, parent_path)
+    limit = max(1, int(limit))
+    backward = before_id is not None
+    anchor = await _catalog_anchor(db, before_id if backward else after_id) if (after_id or before_id) else None
+    if anchor is None:
+        backward = False
+    items = await _seek_by_kind(
+        db,
+        where=f"{where} AND is_deleted=0",
+        params=params,
+        anchor=anchor,
+        backward=backward,
+        limit=limit + 1,
+    )
+    more = len(items) > limit
+    return (items[1:] if backward else items[:limit]) if more else items, more
 
-def _scope_like(scope_path: str) -> str:
-    p = (scope_path or "/").rstrip("/") or "/"
-    if p == "/":
-        return "/%"
-    return p + "/%"
+
+@_reads
+async def fetch_catalog_tree_rows(db: aiosqlite.Connection, *, limit: int) -> list[tuple]:
+    """Every live catalog row for the bot's in-memory tree, at most limit rows.
+
+    Rows are (id, kind, title, size_bytes, path, parent_id, folder_size); folder_size is the
+    materialized subtree size (schema v15) for folders, else NULL.
+    """
+    cur = await db.execute(
+        """
+        SELECT c.id, c.kind, c.title, c.size_bytes, c.path, c.parent_id,
+               COALESCE(s.total_size_bytes, s.size_bytes)
+        FROM catalog_items c
+        LEFT JOIN catalog_folder_stats s ON s.folder_path = c.path AND c.kind = 'folder'
+        WHERE c.is_deleted=0
+        LIMIT ?
+        """,
+        (max(0, int(limit)),),
+    )
+    return list(await cur.fetchall())
+
+
+@_reads
+async def fetch_folder_view(
+    db: aiosqlite.Connection,
+    path: str,
+    *,
+    root_path: str,
+    limit: int = 60,
+    offset: int = 0,
+    after_id: int | None = None,
+    before_id: int | None = None,
+) -> FolderView | None:
+    """A folder page for the bot UI, read-only: None when the folder row does not exist.
+
+    One statement resolves the folder, its parent and root ids, the materialized stats (schema v15),
+    catalog_last_sync_at and the cursor row; the page itself is a keyset seek on parent_id with
+    fetch_children_page semantics (offset > 0: legacy offset paging).
+    """
+    cursor_id = before_id if before_id is not None else after_id
+    cur = await db.execute(
+        """
+        SELECT c.id, c.kind, c.title, c.size_bytes, c.path,
+               c.parent_id,
+               (SELECT id FROM catalog_items WHERE path=?),
+               COALESCE(s.child_count, 0),
+               COALESCE(s.total_size_bytes, s.size_bytes),
+               (SELECT value FROM meta WHERE key='catalog_last_sync_at'),
+               a.kind, a.title, a.id
+        FROM catalog_items c
+        LEFT JOIN catalog_folder_stats s ON s.folder_path = c.path
+        LEFT JOIN catalog_items a ON a.id = ?
+        WHERE c.path=? AND c.kind='folder'
+        """,
+        (root_path, int(cursor_id) if cursor_id else None, path),
+    )
+    row = await cur.fetchone()
+    if row is None:
+        return None
+    folder = from_row(CatalogEntry, row[:5])
+    limit = max(1, int(limit))
+    if offset > 0:
+        cur = await db.execute(
+            """
+            SELECT id, kind, title, size_bytes, path
+            FROM catalog_items
+            WHERE parent_id=? AND is_deleted=0
+            ORDER BY kind DESC, title ASC, id ASC
+            LIMIT ? OFFSET ?
+            """,
+            (folder.id, limit + 1, int(offset)),
+        )
+        items = from_rows(CatalogEntry, await cur.fetchall())
+        children, more = items[:limit], len(items) > limit
+    else:
+        anchor = (str(row[10]), str(row[11]), int(row[12])) if row[12] is not None else None
+        backward = before_id is not None and anchor is not None
+        items = await _seek_by_kind(
+            db,
+            where="parent_id=? AND is_deleted=0",
+            params=(folder.id,),
+            anchor=anchor,
+            backward=backward,
+            limit=limit + 1,
+        )
+        more = len(items) > limit
+        children = (items[1:] if backward else items[:limit]) if more else items
+    return FolderView(
+        folder=folder,
+        parent_id=row[5],
+        root_id=row[6],
+        total=int(row[7]),
+        size_bytes=row[8],
+        last_sync_at=str(row[9]) if row[9] is not None else None,
+        children=children,
+        more=more,
+    )
+
+
+@_reads
+async def count_children(db: aiosqlite.Connection, parent_path: str | None) -> int:
+    where, params = await _children_filter(db, parent_path)
+    cur = await db.execute(
+        f"""
+        SELECT COUNT(*)
+        FROM catalog_items
+        WHERE {where}
+          AND is_deleted=0
+        """,
+        params,
+    )
+    row = await cur.fetchone()
+    return int(row[0] or 0)
+
+
+
+
+# --- Materialized folder stats (schema v15) ---
+
+@_reads
+async def fetch_folder_stats(db: aiosqlite.Connection, folder_path: str) -> FolderStats | None:
+    cur = await db.execute(
+        """
+        SELECT folder_path, child_count, file_count, size_bytes, last_modified, total_size_bytes, total_last_modified
+        FROM catalog_folder_stats WHERE folder_path=?
+        """,
+        (folder_path,),
+    )
+    row = await cur.fetchone()
+    return from_row(FolderStats, row) if row else None
+
+
+def _folder_depth(path: str) -> int:
+    return 0 if path in ("", "/") else path.rstrip("/").count("/")
+
+
+def _parent_folder(path: str) -> str | None:
+    if path in ("", "/"):
+        return None
+    parent = path.rstrip("/").rsplit("/", 1)[0]
+    return parent or "/"
+
+
+async def _refresh_folder_total(db: aiosqlite.Connection, folder_path: str) -> None:
+    # total = direct files + totals of live child folders (already refreshed, deepest first).
+    await db.execute(
+        """
+        INSERT INTO catalog_folder_stats(folder_path, total_size_bytes, total_last_modified)
+        SELECT ?,
+               COALESCE((SELECT size_bytes FROM catalog_folder_stats WHERE folder_path=?), 0)
+                 + COALESCE(SUM(COALESCE(s.total_size_bytes, s.size_bytes)), 0),
+               NULLIF(MAX(COALESCE((SELECT last_modified FROM catalog_folder_stats WHERE folder_path=?), ''),
+                          COALESCE(MAX(COALESCE(s.total_last_modified, s.last_modified)), '')), '')
+        FROM catalog_items c
+        JOIN catalog_folder_stats s ON s.folder_path = c.path
+        WHERE c.parent_id=(SELECT id FROM catalog_items WHERE path=?) AND c.kind='folder' AND c.is_deleted=0
+        ON CONFLICT(folder_path) DO UPDATE SET
+          total_size_bytes=excluded.total_size_bytes,
+          total_last_modified=excluded.total_last_modified
+        """,
+        (folder_path, folder_path, folder_path, folder_path),
+    )
+
+
+async def refresh_folder_totals(db: aiosqlite.Connection, folder_paths: list[str] | None = None) -> int:
+    """Recompute recursive totals (size, last modified) of folders.
+
+    folder_paths=None: whole catalog in one bottom-up pass (end of a sync run).
+    Otherwise: the given folders and all their ancestors, deepest first (live updates).
+    Returns the number of folders refreshed.
+    """
+    if folder_paths is None:
+        async with _write_unit(db):
+            cur = await db.execute("SELECT folder_path, size_bytes, last_modified FROM catalog_folder_stats")
+            direct = {str(r[0]): (int(r[1] or 0), r[2] or "") for r in await cur.fetchall()}
+            cur = await db.execute("SELECT path FROM catalog_items WHERE kind='folder' AND is_deleted=0")
+            live = {str(r[0]) for r in await cur.fetchall()}
+            totals: dict[str, list] = {}
+            for folder, (size, modified) in direct.items():
+                if folder not in live:
+                    continue
+                # Add the folder's direct files to itself and every live ancestor.
+                node: str | None = folder
+                while node is not None and node in live:
+                    acc = totals.setdefault(node, [0, ""])
+                    acc[0] += size
+                    if modified > acc[1]:
+                        acc[1] = modified
+                    node = _parent_folder(node)
+            await db.executemany(
+                """
+                INSERT INTO catalog_folder_stats(folder_path, total_size_bytes, total_last_modified) VALUES (?, ?, ?)
+                ON CONFLICT(folder_path) DO UPDATE SET
+                  total_size_bytes=excluded.total_size_bytes,
+                  total_last_modified=excluded.total_last_modified
+                """,
+                [(folder, acc[0], acc[1] or None) for folder, acc in totals.items()],
+            )
+        await db.commit()
+        return len(totals)
+
+    pending: set[str] = set()
+    for folder in folder_paths:
+        node: str | None = folder
+        while node is not None and node not in pending:
+            pending.add(node)
+            node = _parent_folder(node)
+    async with _write_unit(db):
+        for folder in sorted(pending, key=lambda p: (-_folder_depth(p), p)):
+            await _refresh_folder_total(db, folder)
+    await db.commit()
+    return len(pending)
+
+
+# --- Online backfills (schema v21) ---
+#
+# A backfill is (start, step, total_sql): start() resets derived data when a backfill is (re)requested,
+# step(db, cursor, batch_size) -> (cursor, processed, finished) does one bounded chunk, total_sql
+# estimates the work for progress. Progress lives in schema_backfills, so a restart resumes.
+
+async def _next_id_range(db: aiosqlite.Connection, table: str, cursor: int, batch_size: int) -> tuple[int, int]:
+    """(last id, row count) of the next batch_size rows of table after id cursor."""
+    cur = await db.execute(
+        f"SELECT MAX(id), COUNT(*) FROM (SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?)",
+        (int(cursor), int(batch_size)),
+    )
+    hi, n = await cur.fetchone()
+    return int(hi or cursor), int(n)
+
+
+def _fts_backfill(table: str):
+    """(start, step, total_sql) rebuilding an external-content FTS table over catalog_items(title, path)."""
+
+    async def start(db: aiosqlite.Connection) -> None:
+        await db.execute(f"INSERT INTO {table}({table}) VALUES('delete-all')")
+
+    async def step(db: aiosqlite.Connection, cursor: int, batch_size: int) -> tuple[int, int, bool]:
+        hi, n = await _next_id_range(db, "catalog_items", cursor, batch_size)
+        if n:
+            await db.execute(
+                f"INSERT INTO {table}(rowid, title, path) SELECT id, title, path FROM catalog_items WHERE id > ? AND id <= ?",
+                (int(cursor), int(hi)),
+            )
+        return hi, n, n < int(batch_size)
+
+    return start, step, "SELECT COUNT(*) FROM catalog_items"
+
+
+async def _parent_id_step(db: aiosqlite.Connection, cursor: int, batch_size: int) -> tuple[int, int, bool]:
+    # Rows linked meanwhile by the v17 triggers already have parent_id and are left alone.
+    hi, n = await _next_id_range(db, "catalog_items", cursor, batch_size)
+    if n:
+        await db.execute(
+            """
+            UPDATE catalog_items
+            SET parent_id = (SELECT p.id FROM catalog_items p WHERE p.path = catalog_items.parent_path)
+            WHERE id > ? AND id <= ? AND parent_path IS NOT NULL AND parent_id IS NULL
+            """,
+            (int(cursor), hi),
+        )
+    return hi, n, n < int(batch_size)
+
+
+async def _catalog_tree_step(db: aiosqlite.Connection, cursor: int, batch_size: int) -> tuple[int, int, bool]:
+    # Closure rows of a batch of descendants, rewritten by walking each one up its parent_id chain.
+    hi, n = await _next_id_range(db, "catalog_items", cursor, batch_size)
+    if n:
+        await db.execute("DELETE FROM catalog_tree WHERE descendant_id > ? AND descendant_id <= ?", (int(cursor), hi))
+        await db.execute(
+            """
+            INSERT OR REPLACE INTO catalog_tree(ancestor_id, descendant_id, depth)
+            WITH RECURSIVE up(ancestor_id, descendant_id, depth) AS (
+              SELECT id, id, 0 FROM catalog_items WHERE id > ? AND id <= ?
+              UNION ALL
+              SELECT c.parent_id, up.descendant_id, up.depth + 1
+              FROM up JOIN catalog_items c ON c.id = up.ancestor_id
+              WHERE c.parent_id IS NOT NULL
+            )
+            SELECT ancestor_id, descendant_id, depth FROM up
+            """,
+            (int(cursor), hi),
+        )
+    return hi, n, n < int(batch_size)
+
+
+async def _folder_stats_step(db: aiosqlite.Connection, cursor: int, batch_size: int) -> tuple[int, int, bool]:
+    # Adds a batch of children to their folders' direct stats; the v15 triggers count rows above the cursor
+    # only once it has passed them, so every row is counted exactly once.
+    hi, n = await _next_id_range(db, "catalog_items", cursor, batch_size)
+    if n:
+        await db.execute(
+            """
+            INSERT INTO catalog_folder_stats(folder_path, child_count, file_count, size_bytes, last_modified)
+            SELECT parent_path,
+                   COUNT(*),
+                   SUM(kind='file'),
+                   SUM(CASE WHEN kind='file' THEN COALESCE(size_bytes, 0) ELSE 0 END),
+                   MAX(modified_at)
+            FROM catalog_items
+            WHERE id > ? AND id <= ? AND is_deleted=0 AND parent_path IS NOT NULL
+            GROUP BY parent_path
+            ON CONFLICT(folder_path) DO UPDATE SET
+              child_count=child_count + excluded.child_count,
+              file_count=file_count + excluded.file_count,
+              size_bytes=size_bytes + excluded.size_bytes,
+              last_modified=CASE WHEN excluded.last_modified > COALESCE(last_modified, '') THEN excluded.last_modified ELSE last_modified END
+            """,
+            (int(cursor), hi),
+        )
+    return hi, n, n < int(batch_size)
+
+
+# Path depth in SQL ('/' is 0, '/a' is 1, ...); children are always one level below their folder.
+_FOLDER_DEPTH_SQL = "CASE WHEN path='/' THEN 0 ELSE length(rtrim(path, '/')) - length(replace(rtrim(path, '/'), '/', '')) END"
+_DEPTH_SHIFT = 40
+
+
+async def _folder_totals_step(db: aiosqlite.Connection, cursor: int, batch_size: int) -> tuple[int, int, bool]:
+    # Bottom-up by depth, batch_size folders per step: a folder's total only needs its child folders,
+    # which sit one level deeper and are already done. cursor = (depth + 1) << 40 | last folder id;
+    # 0 means not started (begin at the deepest level).
+    if cursor == 0:
+        cur = await db.execute(
+            f"SELECT MAX({_FOLDER_DEPTH_SQL}) FROM catalog_items WHERE kind='folder' AND is_deleted=0"
+        )
+        deepest = (await cur.fetchone())[0]
+        if deepest is None:
+            return 0, 0, True
+        depth, last_id = int(deepest), 0
+    else:
+        depth, last_id = (cursor >> _DEPTH_SHIFT) - 1, cursor & ((1 << _DEPTH_SHIFT) - 1)
+    cur = await db.execute(
+        f"""
+        SELECT id, path FROM catalog_items
+        WHERE kind='folder' AND is_deleted=0 AND id > ? AND {_FOLDER_DEPTH_SQL} = ?
+        ORDER BY id LIMIT ?
+        """,
+        (last_id, depth, int(batch_size)),
+    )
+    rows = await cur.fetchall()
+    for _id, path in rows:
+        await _refresh_folder_total(db, str(path))
+    if len(rows) == int(batch_size):
+        return ((depth + 1) << _DEPTH_SHIFT) | int(rows[-1][0]), len(rows), False
+    if depth == 0:
+        return 0, len(rows), True
+    return depth << _DEPTH_SHIFT, len(rows), False
+
+
+async def _audit_rollups_step(db: aiosqlite.Connection, cursor: int, batch_size: int) -> tuple[int, int, bool]:
+    # Adds a batch of raw audit rows to the v19 rollups; the trigger counts rows above the cursor
+    # only once it has passed them.
+    hi, n = await _next_id_range(db, "download_audit", cursor, batch_size)
+    if n:
+        await db.execute(
+            """
+            INSERT INTO download_audit_hourly(hour, catalog_item_id, result, downloads, bytes)
+            SELECT strftime('%Y-%m-%d %H:00:00', created_at), catalog_item_id, result, COUNT(*), COALESCE(SUM(bytes), 0)
+            FROM download_audit
+            WHERE id > ? AND id <= ?
+            GROUP BY 1, 2, 3
+            ON CONFLICT(hour, catalog_item_id, result) DO UPDATE SET
+              downloads = downloads + excluded.downloads,
+              bytes = bytes + excluded.bytes
+            """,
+            (int(cursor), hi),
+        )
+        await db.execute(
+            """
+            INSERT INTO download_audit_daily_users(day, tg_user_id, succeeded, failed, bytes)
+            SELECT date(created_at), tg_user_id,
+                   SUM(result = 'succeeded'), SUM(result = 'failed'), COALESCE(SUM(bytes), 0)
+            FROM download_audit
+            WHERE id > ? AND id <= ?
+            GROUP BY 1, 2
+            ON CONFLICT(day, tg_user_id) DO UPDATE SET
+              succeeded = succeeded + excluded.succeeded,
+              failed = failed + excluded.failed,
+              bytes = bytes + excluded.bytes
+            """,
+            (int(cursor), hi),
+        )
+    return hi, n, n < int(batch_size)
+
+
+async def _content_queue_step(db: aiosqlite.Connection, cursor: int, batch_size: int) -> tuple[int, int, bool]:
+    hi, n = await _next_id_range(db, "catalog_items", cursor, batch_size)
+    if n:
+        await db.execute(
+            """
+            INSERT INTO catalog_content(item_id)
+            SELECT id FROM catalog_items WHERE id > ? AND id <= ? AND kind='file' AND is_deleted=0
+            ON CONFLICT(item_id) DO NOTHING
+            """,
+            (int(cursor), hi),
+        )
+    return hi, n, n < int(batch_size)
+
+
+# In the order they run: a backfill may read what an earlier one fills
+# (the closure walks parent_id, folder totals add up the direct folder stats).
+BACKFILLS = {
+    "catalog_parent_id": (None, _parent_id_step, "SELECT COUNT(*) FROM catalog_items"),
+    "catalog_tree": (None, _catalog_tree_step, "SELECT COUNT(*) FROM catalog_items"),
+    "folder_stats": (None, _folder_stats_step, "SELECT COUNT(*) FROM catalog_items"),
+    "folder_totals": (None, _folder_totals_step, "SELECT COUNT(*) FROM catalog_items WHERE kind='folder' AND is_deleted=0"),
+    "audit_rollups": (None, _audit_rollups_step, "SELECT COUNT(*) FROM download_audit"),
+    "catalog_fts": _fts_backfill("catalog_items_fts"),
+    "catalog_trgm": _fts_backfill("catalog_items_trgm"),
+    "content_queue": (None, _content_queue_step, "SELECT COUNT(*) FROM catalog_items"),
+}
+
+
+async def request_backfill(db: aiosqlite.Connection, name: str) -> None:
+    """(Re)start a backfill from the beginning, e.g. a full FTS rebuild. Cheap: the work runs in the worker."""
+    async with _write_unit(db):
+        start, _step, total_sql = BACKFILLS[name]
+        if start is not None:
+            await start(db)
+        cur = await db.execute(total_sql)
+        total = int((await cur.fetchone())[0] or 0)
+        await db.execute(
+            """
+            INSERT INTO schema_backfills(name, cursor, processed, total, done) VALUES (?, 0, 0, ?, 0)
+            ON CONFLICT(name) DO UPDATE SET
+              cursor=0, processed=0, total=excluded.total, done=0,
+              started_at=datetime('now'), updated_at=datetime('now'), finished_at=NULL
+            """,
+            (name, total),
+        )
+    await db.commit()
+
+
+async def pending_backfills(db: aiosqlite.Connection) -> list[str]:
+    """Names of unfinished backfills, in BACKFILLS order."""
+    cur = await db.execute("SELECT name FROM schema_backfills WHERE done=0")
+    pending = {str(r[0]) for r in await cur.fetchall()}
+    return [name for name in BACKFILLS if name in pending]
+
+
+async def run_backfill_batch(db: aiosqlite.Connection, name: str, *, batch_size: int = 2000) -> bool:
+    """Run one chunk of a pending backfill in its own transaction; True while work remains."""
+    async with _write_unit(db):
+        cur = await db.execute("SELECT cursor, total, done FROM schema_backfills WHERE name=?", (name,))
+        row = await cur.fetchone()
+        if row is None or int(row[2]):
+            return False
+        _start, step, total_sql = BACKFILLS[name]
+        if row[1] is None:
+            cur = await db.execute(total_sql)
+            await db.execute("UPDATE schema_backfills SET total=? WHERE name=?", (int((await cur.fetchone())[0] or 0), name))
+        cursor, n, finished = await step(db, int(row[0]), max(1, int(batch_size)))
+        await db.execute(
+            """
+            UPDATE schema_backfills
+            SET cursor=?, processed=processed + ?, done=?, updated_at=datetime('now'),
+                finished_at=CASE WHEN ? THEN datetime('now') END
+            WHERE name=?
+            """,
+            (int(cursor), int(n), int(finished), int(finished), name),
+        )
+    await db.commit()
+    return not finished
+
+
+@_reads
+async def fetch_backfill_progress(db: aiosqlite.Connection) -> dict[str, str]:
+    """{name: "done" | "processed/total"} for /ready and /diag."""
+    try:
+        cur = await db.execute("SELECT name, processed, total, done FROM schema_backfills ORDER BY name")
+    except sqlite3.OperationalError:
+        return {}
+    return {
+        str(r[0]): "done" if int(r[3]) else f"{int(r[1])}/{int(r[2]) if r[2] is not None else '?'}"
+        for r in await cur.fetchall()
+    }
+
+# --- Document content index (schema v24) ---
+
+async def fetch_content_pending(db: aiosqlite.Connection, *, limit: int = 20) -> list[ContentTask]:
+    """Files queued for text extraction, oldest item id first (idx_catalog_content_pending)."""
+    cur = await db.execute(
+        """
+        SELECT cc.item_id, c.path, COALESCE(c.yandex_id, c.path), c.size_bytes, cc.rev, cc.attempts
+        FROM catalog_content cc
+        JOIN catalog_items c ON c.id = cc.item_id
+        WHERE cc.state='pending'
+        ORDER BY cc.item_id
+        LIMIT ?
+        """,
+        (max(1, int(limit)),),
+    )
+    return from_rows(ContentTask, await cur.fetchall())
+
+
+async def store_content(
+    db: aiosqlite.Connection,
+    task: ContentTask,
+    *,
+    state: str,
+    body: str = "",
+    error: str | None = None,
+    max_attempts: int = 3,
+) -> bool:
+    """Record the outcome for task; False if the file was re-queued meanwhile (rev changed).
+
+    A failure keeps the row pending until max_attempts, then it stays 'failed' until the file changes.
+    """
+    if state == "failed" and task.attempts + 1 < max(1, int(max_attempts)):
+        state = "pending"
+    cur = await db.execute(
+        """
+        UPDATE catalog_content
+        SET state=?, body=?, error=?, attempts=attempts + ?, updated_at=datetime('now')
+        WHERE item_id=? AND rev=?
+        """,
+        (state, body if state == "done" else "", error, int(error is not None), int(task.item_id), int(task.rev)),
+    )
+    await db.commit()
+    return bool(cur.rowcount)
+
+
+async def count_content_pending(db: aiosqlite.Connection) -> int:
+    cur = await db.execute("SELECT COUNT(*) FROM catalog_content WHERE state='pending'")
+    return int((await cur.fetchone())[0] or 0)
+
+
+@_reads
+async def count_content_states(db: aiosqlite.Connection) -> dict[str, int]:
+    cur = await db.execute("SELECT state, COUNT(*) FROM catalog_content GROUP BY state")
+    return {str(r[0]): int(r[1]) for r in await cur.fetchall()}
+
+
+# --- Catalog search (IDEA-007) ---
+
+def _fts_query_from_user(q: str) -> str:
+    tokens = re.findall(r"[0-9A-Za-zА-Яа-яЁё]+", (q or "").strip())
+    tokens = [t for t in tokens if t][:8]
+    if not tokens:
+        return ""
+    return " AND ".join([f"{t}*" for t in tokens])
+
+
+def _trigram_query_from_user(q: str) -> str:
+    # Every whitespace-separated chunk of 3+ characters is a substring phrase; shorter chunks have no
+    # trigram to look up and are left to the other terms.
+    parts = [p for p in (q or "").split() if len(p) >= 3][:8]
+    return " AND ".join('"' + p.replace('"', '""') + '"' for p in parts)
+
+
+async def _search_index(db: aiosqlite.Connection, q: str, scope: str, scope_args: tuple) -> tuple[str, str] | None:
+    """(FTS table, MATCH expression) serving query q; None leaves it to the LIKE scan.
+
+    "catalog_items_fts" stands for word-prefix hits in titles/paths and in extracted document text
+    together (see _WORD_HITS). When neither finds anything in scope, substrings are looked up in the
+    trigram index (schema v22, once its backfill is done). scope uses alias "c.".
+    CROSS JOIN keeps the MATCH driving the probe; otherwise the planner may walk live rows by is_deleted.
+    """
+    fts_q = _fts_query_from_user(q)
+    if fts_q:
+        for table in ("catalog_items_fts", "catalog_content_fts"):
+            cur = await db.execute(
+                f"""
+                SELECT 1 FROM {table}
+                CROSS JOIN catalog_items c ON c.id = {table}.rowid
+                WHERE {table} MATCH ? AND c.is_deleted=0 AND {scope}
+                LIMIT 1
+                """,
+                (fts_q, *scope_args),
+            )
+            if await cur.fetchone() is not None:
+                return "catalog_items_fts", fts_q
+    trgm_q = _trigram_query_from_user(q)
+    if trgm_q:
+        cur = await db.execute("SELECT done FROM schema_backfills WHERE name='catalog_trgm'")
+        row = await cur.fetchone()
+        if row is not None and int(row[0]):
+            return "catalog_items_trgm", trgm_q
+    return ("catalog_items_fts", fts_q) if fts_q else None
+
+
+# Word-prefix hits as (id, tier, rank): title/path matches (tier 0) first, then files that match only by
+# their extracted text (tier 1, schema v24); bm25 ranks within a tier. Parameters: the MATCH three times.
+_WORD_HITS = """
+hits(id, tier, rank) AS (
+  SELECT rowid, 0, bm25(catalog_items_fts) FROM catalog_items_fts WHERE catalog_items_fts MATCH ?
+  UNION ALL
+  SELECT rowid, 1, bm25(catalog_content_fts) FROM catalog_content_fts
+  WHERE catalog_content_fts MATCH ?
+    AND rowid NOT IN (SELECT rowid FROM catalog_items_fts WHERE catalog_items_fts MATCH ?)
+)
+"""
+
+
+def _like_escape(q: str) -> str:
+    return (q or "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def _subtree_filter(
+    db: aiosqlite.Connection,
+    scope_path: str,
+    *,
+    alias: str = "",
+    include_self: bool = False,
+    driving: bool = False,
+) -> tuple[str, tuple]:
+    """Predicate "row lies under folder scope_path" for a WHERE clause (alias: "c." etc.).
+
+    Resolved through the closure table (schema v18). driving=True lets the subtree drive the query
+    (`id IN` a primary-key range of catalog_tree); otherwise it is one key probe per candidate row
+    (FTS hits, generation-index candidates). Without a folder row (nothing synced yet) it falls
+    back to the path prefix.
+    """
+    p = (scope_path or "/").rstrip("/") or "/"
+    cur = await db.execute("SELECT id FROM catalog_items WHERE path=?", (p,))
+    row = await cur.fetchone()
+    if row is None:
+        like = "/%" if p == "/" else _like_escape(p) + "/%"
+        if include_self:
+            return f"({alias}path=? OR {alias}path LIKE ? ESCAPE '\\')", (p, like)
+        return f"{alias}path LIKE ? ESCAPE '\\'", (like,)
+    min_depth = 0 if include_self else 1
+    if driving:
+        return (
+            f"{alias}id IN (SELECT descendant_id FROM catalog_tree WHERE ancestor_id=? AND depth>={min_depth})",
+            (int(row[0]),),
+        )
+    return (
+        f"EXISTS (SELECT 1 FROM catalog_tree t WHERE t.ancestor_id=? AND t.descendant_id={alias}id"
+        f" AND t.depth>={min_depth})",
+        (int(row[0]),),
+    )
 
 
 async def cleanup_search_sessions(db: aiosqlite.Connection, ttl_sec: int) -> None:
@@ -897,6 +2331,7 @@ async def create_search_session(
     return token
 
 
+@_reads
 async def fetch_search_session(db: aiosqlite.Connection, token: str) -> dict | None:
     cur = await db.execute(
         "SELECT token, created_at, tg_user_id, scope_path, query FROM search_sessions WHERE token=?",
@@ -914,6 +2349,7 @@ async def fetch_search_session(db: aiosqlite.Connection, token: str) -> dict | N
     }
 
 
+@_reads
 async def search_catalog_items(
     db: aiosqlite.Connection,
     *,
@@ -921,61 +2357,194 @@ async def search_catalog_items(
     scope_path: str,
     limit: int = 25,
     offset: int = 0,
-) -> tuple[list[dict], bool]:
+) -> tuple[list[CatalogEntry], bool]:
     q = (query or "").strip()
     if not q:
         return [], False
 
-    scope_like = _scope_like(scope_path)
     limit = max(1, int(limit))
     offset = max(0, int(offset))
     limit_plus = limit + 1
 
-    fts_q = _fts_query_from_user(q)
-    if fts_q:
-        try:
-            cur = await db.execute(
+    try:
+        scope, scope_args = await _subtree_filter(db, scope_path, alias="c.")
+        index = await _search_index(db, q, scope, scope_args)
+        if index is not None:
+            table, match = index
+            if table == "catalog_items_trgm":
+                sql = f"""
+                    SELECT c.id, c.kind, c.title, c.size_bytes, c.path
+                    FROM {table}
+                    CROSS JOIN catalog_items c ON c.id = {table}.rowid
+                    WHERE {table} MATCH ?
+                      AND c.is_deleted=0
+                      AND {scope}
+                    ORDER BY {table}.rowid
+                    LIMIT ? OFFSET ?
                 """
-                SELECT c.id, c.kind, c.title, c.size_bytes, c.path
-                FROM catalog_items_fts f
-                JOIN catalog_items c ON c.id = f.rowid
-                WHERE f MATCH ?
-                  AND c.is_deleted=0
-                  AND c.path LIKE ?
-                ORDER BY bm25(f), c.kind DESC, c.title ASC
-                LIMIT ? OFFSET ?
-                """,
-                (fts_q, scope_like, int(limit_plus), int(offset)),
-            )
-            rows = await cur.fetchall()
-            items = [
-                {"id": int(r[0]), "kind": r[1], "title": r[2], "size_bytes": r[3], "path": r[4]}
-                for r in rows
-            ]
+                args: tuple = (match,)
+            else:
+                sql = f"""
+                    WITH {_WORD_HITS}
+                    SELECT c.id, c.kind, c.title, c.size_bytes, c.path
+                    FROM hits
+                    CROSS JOIN catalog_items c ON c.id = hits.id
+                    WHERE c.is_deleted=0
+                      AND {scope}
+                    ORDER BY hits.tier, hits.rank, c.kind DESC, c.title ASC, c.id ASC
+                    LIMIT ? OFFSET ?
+                """
+                args = (match, match, match)
+            cur = await db.execute(sql, (*args, *scope_args, int(limit_plus), int(offset)))
+            items = from_rows(CatalogEntry, await cur.fetchall())
             has_more = len(items) > limit
             return items[:limit], has_more
-        except Exception:
-            pass
+    except sqlite3.OperationalError as e:
+        # e.g. an FTS syntax error on odd input: degrade to LIKE, but never silently.
+        log.warning("search_index_error", query=q, err=str(e))
 
     like = f"%{_like_escape(q)}%"
+    scope, scope_args = await _subtree_filter(db, scope_path)
     cur = await db.execute(
-        """
+        f"""
         SELECT id, kind, title, size_bytes, path
         FROM catalog_items
         WHERE is_deleted=0
-          AND path LIKE ?
+          AND {scope}
           AND (title LIKE ? ESCAPE '\\' OR path LIKE ? ESCAPE '\\')
-        ORDER BY kind DESC, title ASC
+        ORDER BY kind DESC, title ASC, id ASC
         LIMIT ? OFFSET ?
         """,
-        (scope_like, like, like, int(limit_plus), int(offset)),
+        (*scope_args, like, like, int(limit_plus), int(offset)),
     )
-    rows = await cur.fetchall()
-    items = [{"id": int(r[0]), "kind": r[1], "title": r[2], "size_bytes": r[3], "path": r[4]} for r in rows]
+    items = from_rows(CatalogEntry, await cur.fetchall())
     has_more = len(items) > limit
     return items[:limit], has_more
 
 
+@_reads
+async def search_catalog_items_page(
+    db: aiosqlite.Connection,
+    *,
+    query: str,
+    scope_path: str,
+    limit: int = 25,
+    after_id: int | None = None,
+    before_id: int | None = None,
+) -> tuple[list[CatalogEntry], bool]:
+    """Keyset-paginated search; cursors are item ids of the adjacent page (see fetch_children_page).
+
+    Word-prefix FTS hits are ordered by (tier, bm25, id) -- title/path matches, then files matching
+    only by document text; the cursor's rank is recomputed for that single row. Trigram substring hits (see _search_index) are in id order. The LIKE fallback uses the
+    folder order (kind DESC, title, id).
+    """
+    q = (query or "").strip()
+    if not q:
+        return [], False
+
+    limit = max(1, int(limit))
+    backward = before_id is not None
+    cursor_id = before_id if backward else after_id
+
+    try:
+        seek = ""
+        scope, scope_args = await _subtree_filter(db, scope_path, alias="c.")
+        index = await _search_index(db, q, scope, scope_args)
+        if index is not None:
+            table, match = index
+            cmp = "<" if backward else ">"
+            direction = "DESC" if backward else "ASC"
+            if table == "catalog_items_trgm":
+                # Trigram hits stay in rowid order: FTS5 streams them that way and the page stops early,
+                # where ranking would score every hit of a common substring.
+                args: tuple = (match, *scope_args)
+                if cursor_id:
+                    seek = f" AND {table}.rowid {cmp} ?"
+                    args += (int(cursor_id),)
+                sql = f"""
+                    SELECT c.id, c.kind, c.title, c.size_bytes, c.path
+                    FROM {table}
+                    CROSS JOIN catalog_items c ON c.id = {table}.rowid
+                    WHERE {table} MATCH ?
+                      AND c.is_deleted=0
+                      AND {scope}{seek}
+                    ORDER BY {table}.rowid {direction}
+                    LIMIT ?
+                """
+            else:
+                args = (match, match, match, *scope_args)
+                if cursor_id:
+                    # The cursor's (tier, rank) is recomputed for that single row.
+                    cur = await db.execute(
+                        f"WITH {_WORD_HITS} SELECT tier, rank FROM hits WHERE id=?",
+                        (match, match, match, int(cursor_id)),
+                    )
+                    row = await cur.fetchone()
+                    if row is not None:
+                        seek = f" AND (hits.tier, hits.rank, c.id) {cmp} (?, ?, ?)"
+                        args += (int(row[0]), float(row[1]), int(cursor_id))
+                    else:
+                        backward, cmp, direction = False, ">", "ASC"
+                sql = f"""
+                    WITH {_WORD_HITS}
+                    SELECT c.id, c.kind, c.title, c.size_bytes, c.path
+                    FROM hits
+                    CROSS JOIN catalog_items c ON c.id = hits.id
+                    WHERE c.is_deleted=0
+                      AND {scope}{seek}
+                    ORDER BY hits.tier {direction}, hits.rank {direction}, c.id {direction}
+                    LIMIT ?
+                """
+            cur = await db.execute(sql, (*args, limit + 1))
+            items = from_rows(CatalogEntry, await cur.fetchall())
+            if backward:
+                items.reverse()
+            more = len(items) > limit
+            return (items[1:] if backward else items[:limit]) if more else items, more
+    except sqlite3.OperationalError as e:
+        log.warning("search_index_error", query=q, err=str(e))
+
+    like = f"%{_like_escape(q)}%"
+    anchor = await _catalog_anchor(db, cursor_id) if cursor_id else None
+    scope, scope_args = await _subtree_filter(db, scope_path)
+    items = await _seek_by_kind(
+        db,
+        where=f"is_deleted=0 AND {scope} AND (title LIKE ? ESCAPE '\\' OR path LIKE ? ESCAPE '\\')",
+        params=(*scope_args, like, like),
+        anchor=anchor,
+        backward=backward and anchor is not None,
+        limit=limit + 1,
+    )
+    backward = backward and anchor is not None
+    more = len(items) > limit
+    return (items[1:] if backward else items[:limit]) if more else items, more
+
+
+@_reads
+async def fetch_catalog_vocabulary(db: aiosqlite.Connection, *, min_len: int = 3) -> list[tuple[str, int]]:
+    """(term, number of items containing it) for every word-like term of catalog_items_fts."""
+    cur = await db.execute(
+        "SELECT term, doc FROM catalog_items_vocab WHERE length(term) >= ? AND term NOT GLOB '*[0-9]*'",
+        (int(min_len),),
+    )
+    return [(str(r[0]), int(r[1])) for r in await cur.fetchall()]
+
+
+@_reads
+async def fetch_catalog_entries(db: aiosqlite.Connection, ids: list[int]) -> list[CatalogEntry]:
+    """Live catalog rows for ids, in the given order (a page of a cached search result)."""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return []
+    marks = ",".join("?" * len(ids))
+    cur = await db.execute(
+        f"SELECT id, kind, title, size_bytes, path FROM catalog_items WHERE id IN ({marks}) AND is_deleted=0",
+        ids,
+    )
+    by_id = {r[0]: r for r in await cur.fetchall()}
+    return from_rows(CatalogEntry, [by_id[i] for i in ids if i in by_id])
+
+
 async def db_now(db: aiosqlite.Connection) -> str:
     """Return SQLite's datetime('now') string for lexicographically comparable timestamps."""
     cur = await db.execute("SELECT datetime('now')")
@@ -985,30 +2554,38 @@ async def db_now(db: aiosqlite.Connection) -> str:
 
 async def mark_deleted_not_seen(db: aiosqlite.Connection, root_path: str, seen_threshold: str) -> int:
     """Mark as deleted everything under root that wasn't seen since seen_threshold."""
-    root = (root_path or "/").rstrip("/") or "/"
-    if root == "/":
-        like = "/%"
-        args = (seen_threshold, like, root)
-        q = """
+    scope, scope_args = await _subtree_filter(db, root_path)
+    cur = await db.execute(
+        f"""
         UPDATE catalog_items
         SET is_deleted=1, updated_at=datetime('now')
         WHERE (seen_at IS NULL OR seen_at < ?)
-          AND path LIKE ?
-          AND path != ?
+          AND {scope}
           AND is_deleted=0
-        """
-    else:
-        like = root.rstrip("/") + "/%"
-        args = (seen_threshold, root, like, root)
-        q = """
+        """,
+        (seen_threshold, *scope_args),
+    )
+    await db.commit()
+    return int(cur.rowcount or 0)
+
+
+async def mark_deleted_before_generation(db: aiosqlite.Connection, root_path: str, generation: int) -> int:
+    """Soft-delete everything under root not stamped by sync generation `generation`.
+
+    Driven by idx_catalog_deleted_generation: only live rows with an older generation are visited,
+    the subtree check is a closure-table probe on those candidates.
+    """
+    scope, scope_args = await _subtree_filter(db, root_path)
+    cur = await db.execute(
+        f"""
         UPDATE catalog_items
         SET is_deleted=1, updated_at=datetime('now')
-        WHERE (seen_at IS NULL OR seen_at < ?)
-          AND (path = ? OR path LIKE ?)
-          AND path != ?
-          AND is_deleted=0
-        """
-    cur = await db.execute(q, args)
+        WHERE is_deleted=0
+          AND sync_generation < ?
+          AND {scope}
+        """,
+        (int(generation), *scope_args),
+    )
     await db.commit()
     return int(cur.rowcount or 0)
 
@@ -1026,6 +2603,210 @@ async def has_active_sync_job(db: aiosqlite.Connection) -> bool:
     return bool(row)
 
 
+async def requeue_running_sync_jobs(db: aiosqlite.Connection) -> list[int]:
+    """Return sync jobs left 'running' by a dead worker to 'queued'. Call only at worker startup."""
+    async with _write_unit(db):
+        cur = await db.execute(
+            "SELECT id FROM jobs WHERE job_type='sync_catalog' AND state='running' ORDER BY id"
+        )
+        ids = [int(r[0]) for r in await cur.fetchall()]
+        if ids:
+            await db.executemany(
+                "UPDATE jobs SET state='queued', updated_at=datetime('now') WHERE id=?",
+                [(i,) for i in ids],
+            )
+    await db.commit()
+    return ids
+
+
+# --- Resumable catalog sync: persisted traversal frontier ---
+
+async def sync_frontier_counts(db: aiosqlite.Connection, root_path: str) -> tuple[int, int]:
+    """Return (pending, visited) folder counts of the sync run for root_path."""
+    cur = await db.execute(
+        "SELECT done, COUNT(*) FROM sync_frontier WHERE root_path=? GROUP BY done",
+        (root_path,),
+    )
+    pending = visited = 0
+    for r in await cur.fetchall():
+        if int(r[0] or 0):
+            visited = int(r[1])
+        else:
+            pending = int(r[1])
+    return pending, visited
+
+
+async def sync_frontier_reset(db: aiosqlite.Connection, root_path: str) -> None:
+    """Start a new sync run: drop the previous visited set and seed the frontier with root.
+
+    meta catalog_sync_run_items counts the items upserted by the run across its slices.
+    """
+    async with _write_unit(db):
+        await db.execute("DELETE FROM sync_frontier WHERE root_path=?", (root_path,))
+        await db.execute(
+            "INSERT OR IGNORE INTO sync_frontier(root_path, path) VALUES (?, ?)",
+            (root_path, root_path),
+        )
+        await db.execute(
+            "INSERT INTO meta(key, value) VALUES ('catalog_sync_run_items', '0') "
+            "ON CONFLICT(key) DO UPDATE SET value=excluded.value"
+        )
+    await db.commit()
+
+
+async def sync_frontier_next(db: aiosqlite.Connection, root_path: str) -> str | None:
+    """Oldest pending folder of the run (BFS order), or None when the run is complete."""
+    cur = await db.execute(
+        "SELECT path FROM sync_frontier WHERE root_path=? AND done=0 ORDER BY id LIMIT 1",
+        (root_path,),
+    )
+    row = await cur.fetchone()
+    return str(row[0]) if row else None
+
+
+async def sync_frontier_clear(db: aiosqlite.Connection, root_path: str) -> None:
+    await db.execute("DELETE FROM sync_frontier WHERE root_path=?", (root_path,))
+    await db.commit()
+
+
+async def apply_sync_folder(
+    db: aiosqlite.Connection,
+    *,
+    root_path: str,
+    folder_path: str,
+    items: list[dict],
+    generation: int,
+) -> int:
+    """Upsert one listed folder and checkpoint it in a single transaction.
+
+    items: dicts with path/kind/title/yandex_id/size_bytes[/content_md5/content_sha256/modified_at] (children of folder_path),
+    stamped with the run's sync generation.
+    Child folders are pushed to the frontier unless already visited in this run.
+    Returns the number of upserted items.
+    """
+    async with _write_unit(db):
+        n = 0
+        for it in items:
+            await db.execute(
+                _UPSERT_CATALOG_ITEM_SQL,
+                (
+                    it["path"],
+                    it["kind"],
+                    it["title"],
+                    it.get("yandex_id"),
+                    it.get("size_bytes"),
+                    folder_path,
+                    int(generation),
+                    it.get("content_md5"),
+                    it.get("content_sha256"),
+                    it.get("modified_at"),
+                ),
+            )
+            if it["kind"] == "folder":
+                await db.execute(
+                    "INSERT OR IGNORE INTO sync_frontier(root_path, path) VALUES (?, ?)",
+                    (root_path, it["path"]),
+                )
+            n += 1
+        await db.execute(
+            "UPDATE sync_frontier SET done=1 WHERE root_path=? AND path=?",
+            (root_path, folder_path),
+        )
+        await db.execute(
+            "INSERT INTO meta(key, value) VALUES ('catalog_sync_run_items', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value=CAST(value AS INTEGER) + CAST(excluded.value AS INTEGER)",
+            (str(n),),
+        )
+    await db.commit()
+    return n
+
+
+# --- Live updates (local storage watcher) ---
+
+async def _mark_deleted_subtree(db: aiosqlite.Connection, path: str) -> int:
+    # Unary + keeps the planner on the closure range instead of the (is_deleted, ...) indexes.
+    scope, scope_args = await _subtree_filter(db, path, include_self=True, driving=True)
+    cur = await db.execute(
+        f"""
+        UPDATE catalog_items
+        SET is_deleted=1, updated_at=datetime('now')
+        WHERE {scope} AND +is_deleted=0
+        """,
+        scope_args,
+    )
+    return int(cur.rowcount or 0)
+
+
+async def apply_local_folder(
+    db: aiosqlite.Connection,
+    *,
+    folder_path: str,
+    items: list[dict] | None,
+    generation: int,
+) -> tuple[int, int]:
+    """Reconcile the direct children of one folder with a fresh listing, in one transaction.
+
+    items: listing rows (path/kind/title/size_bytes/modified_at), or None if the folder itself is gone
+    (then the folder and its subtree are soft-deleted).
+    Only rows that differ are written, so an unchanged sibling does not touch the change feed.
+    Returns (upserted, deleted).
+    """
+    if items is None:
+        if folder_path in ("", "/"):
+            return 0, 0
+        async with _write_unit(db):
+            deleted = await _mark_deleted_subtree(db, folder_path)
+        await db.commit()
+        return 0, deleted
+
+    async with _write_unit(db):
+        where, params = await _children_filter(db, folder_path)
+        cur = await db.execute(
+            f"SELECT path, kind, size_bytes, modified_at, is_deleted FROM catalog_items WHERE {where}",
+            params,
+        )
+        existing = {str(r[0]): (str(r[1]), r[2], r[3], int(r[4] or 0)) for r in await cur.fetchall()}
+
+        upserted = 0
+        listed: set[str] = set()
+        for it in items:
+            listed.add(it["path"])
+            prev = existing.get(it["path"])
+            if prev is not None and prev == (it["kind"], it.get("size_bytes"), it.get("modified_at"), 0):
+                continue
+            await db.execute(
+                _UPSERT_CATALOG_ITEM_SQL,
+                (
+                    it["path"],
+                    it["kind"],
+                    it["title"],
+                    it.get("yandex_id") or it["path"],
+                    it.get("size_bytes"),
+                    folder_path,
+                    int(generation),
+                    it.get("content_md5"),
+                    it.get("content_sha256"),
+                    it.get("modified_at"),
+                ),
+            )
+            upserted += 1
+
+        deleted = 0
+        for path, (kind, _size, _modified, is_deleted) in existing.items():
+            if is_deleted or path in listed:
+                continue
+            if kind == "folder":
+                deleted += await _mark_deleted_subtree(db, path)
+            else:
+                cur = await db.execute(
+                    "UPDATE catalog_items SET is_deleted=1, updated_at=datetime('now') WHERE path=? AND is_deleted=0",
+                    (path,),
+                )
+                deleted += int(cur.rowcount or 0)
+    await db.commit()
+    return upserted, deleted
+
+
 async def get_meta(db: aiosqlite.Connection, key: str) -> str | None:
     cur = await db.execute('SELECT value FROM meta WHERE key=?', (key,))
     row = await cur.fetchone()
@@ -1040,6 +2821,53 @@ async def set_meta(db: aiosqlite.Connection, key: str, value: str) -> None:
     await db.commit()
 
 
+# --- Catalog change feed / version ---
+
+async def get_catalog_version(db: aiosqlite.Connection) -> int:
+    return int(await get_meta(db, "catalog_version") or 0)
+
+
+async def commit_catalog_version(db: aiosqlite.Connection, *, keep_versions: int = 1000) -> tuple[int, dict[str, int]]:
+    """Publish pending catalog changes as a new version.
+
+    Returns (version, counts by change kind). If nothing changed since the last version,
+    the version is not bumped and counts is empty. Change rows older than keep_versions are pruned.
+    """
+    async with _write_unit(db):
+        current = await get_catalog_version(db)
+        cur = await db.execute(
+            "SELECT change, COUNT(*) FROM catalog_changes WHERE version=? GROUP BY change",
+            (current + 1,),
+        )
+        counts = {str(r[0]): int(r[1]) for r in await cur.fetchall()}
+        if not counts:
+            return current, {}
+        new_version = current + 1
+        await db.execute(
+            "INSERT INTO meta(key, value) VALUES ('catalog_version', ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (str(new_version),),
+        )
+        await db.execute("DELETE FROM catalog_changes WHERE version <= ?", (new_version - max(1, int(keep_versions)),))
+    await db.commit()
+    return new_version, counts
+
+
+async def fetch_catalog_changes(db: aiosqlite.Connection, since_version: int, *, limit: int = 10000) -> list[tuple[int, int, str]]:
+    """Published changes after since_version as (version, item_id, change), oldest first."""
+    current = await get_catalog_version(db)
+    cur = await db.execute(
+        """
+        SELECT version, item_id, change
+        FROM catalog_changes
+        WHERE version > ? AND version <= ?
+        ORDER BY version, item_id
+        LIMIT ?
+        """,
+        (int(since_version), current, int(limit)),
+    )
+    return [(int(r[0]), int(r[1]), str(r[2])) for r in await cur.fetchall()]
+
+
 # --- Operations transparency (Milestone 3): download audit + admin stats ---
 
 async def insert_download_audit(
@@ -1077,12 +2905,13 @@ async def insert_download_audit(
     await db.commit()
 
 
+@_reads
 async def fetch_recent_download_audit(
     db: aiosqlite.Connection,
     *,
     limit: int = 20,
     offset: int = 0,
-) -> list[dict]:
+) -> list[AuditRow]:
     cur = await db.execute(
         """
         SELECT
@@ -1105,26 +2934,7 @@ async def fetch_recent_download_audit(
         """,
         (int(limit), int(offset)),
     )
-    rows = await cur.fetchall()
-    out: list[dict] = []
-    for r in rows:
-        out.append(
-            {
-                "created_at": r[0],
-                "job_id": int(r[1]),
-                "tg_chat_id": int(r[2]),
-                "tg_user_id": int(r[3]),
-                "catalog_item_id": int(r[4]),
-                "result": r[5],
-                "mode": r[6],
-                "bytes": r[7],
-                "error": r[8],
-                "path": r[9],
-                "title": r[10],
-                "size_bytes": r[11],
-            }
-        )
-    return out
+    return from_rows(AuditRow, await cur.fetchall())
 
 
 def _sqlite_since_expr_minutes(minutes: int) -> str:
@@ -1135,17 +2945,36 @@ def _sqlite_since_expr_minutes(minutes: int) -> str:
     return f"datetime('now', '-{minutes} minutes')"
 
 
+def _rollup_window_cte(since_minutes: int) -> str:
+    """CTE w(since, edge): the window start and the first full hour at or after it.
+
+    Rollup queries read whole hours [edge, now] from download_audit_hourly and only the partial
+    head [since, edge) from raw audit (at most one hour of rows, via idx_download_audit_created).
+    """
+    since_expr = _sqlite_since_expr_minutes(since_minutes)
+    return f"""
+        WITH w(since, edge) AS (
+          SELECT s, CASE WHEN s = strftime('%Y-%m-%d %H:00:00', s) THEN s
+                         ELSE strftime('%Y-%m-%d %H:00:00', s, '+1 hour') END
+          FROM (SELECT {since_expr} AS s)
+        )
+    """
+
+
+@_reads
 async def count_download_audit_since(
     db: aiosqlite.Connection,
     *,
     since_minutes: int,
 ) -> dict[str, int]:
-    since_expr = _sqlite_since_expr_minutes(since_minutes)
     cur = await db.execute(
-        f"""
-        SELECT result, COUNT(*)
-        FROM download_audit
-        WHERE created_at >= {since_expr}
+        _rollup_window_cte(since_minutes)
+        + """
+        SELECT result, SUM(n) FROM (
+          SELECT h.result, h.downloads AS n FROM download_audit_hourly h, w WHERE h.hour >= w.edge
+          UNION ALL
+          SELECT a.result, 1 FROM download_audit a, w WHERE a.created_at >= w.since AND a.created_at < w.edge
+        )
         GROUP BY result
         """
     )
@@ -1156,26 +2985,33 @@ async def count_download_audit_since(
     return out
 
 
+@_reads
 async def top_downloads_since(
     db: aiosqlite.Connection,
     *,
     since_minutes: int,
     limit: int = 10,
 ) -> list[dict]:
-    since_expr = _sqlite_since_expr_minutes(since_minutes)
     cur = await db.execute(
-        f"""
+        _rollup_window_cte(since_minutes)
+        + """
         SELECT
-          a.catalog_item_id,
-          COUNT(*) AS cnt,
+          t.catalog_item_id,
+          SUM(t.n) AS cnt,
           c.path,
           c.title
-        FROM download_audit a
-        JOIN catalog_items c ON c.id = a.catalog_item_id
-        WHERE a.created_at >= {since_expr}
-          AND a.result = 'succeeded'
-        GROUP BY a.catalog_item_id
-        ORDER BY cnt DESC, a.catalog_item_id ASC
+        FROM (
+          SELECT h.catalog_item_id, h.downloads AS n
+          FROM download_audit_hourly h, w
+          WHERE h.hour >= w.edge AND h.result = 'succeeded'
+          UNION ALL
+          SELECT a.catalog_item_id, 1
+          FROM download_audit a, w
+          WHERE a.created_at >= w.since AND a.created_at < w.edge AND a.result = 'succeeded'
+        ) t
+        JOIN catalog_items c ON c.id = t.catalog_item_id
+        GROUP BY t.catalog_item_id
+        ORDER BY cnt DESC, t.catalog_item_id ASC
         LIMIT ?
         """,
         (int(limit),),
@@ -1194,6 +3030,180 @@ async def top_downloads_since(
     return out
 
 
+# --- Retention: archive old jobs / audit into a separate SQLite file ---
+
+# Schema of the archive file (ATTACHed as "archive"). Audit rows keep a snapshot of the item's
+# path/title so they stay readable after the catalog row changes or disappears.
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archive.jobs (
+  id INTEGER PRIMARY KEY,
+  created_at TEXT NOT NULL,
+  updated_at TEXT NOT NULL,
+  tg_chat_id INTEGER NOT NULL,
+  tg_user_id INTEGER NOT NULL,
+  catalog_item_id INTEGER NOT NULL,
+  state TEXT NOT NULL,
+  attempt INTEGER NOT NULL,
+  last_error TEXT,
+  request_id TEXT NOT NULL,
+  job_type TEXT NOT NULL,
+  archived_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+CREATE TABLE IF NOT EXISTS archive.download_audit (
+  id INTEGER PRIMARY KEY,
+  created_at TEXT NOT NULL,
+  job_id INTEGER NOT NULL,
+  tg_chat_id INTEGER NOT NULL,
+  tg_user_id INTEGER NOT NULL,
+  catalog_item_id INTEGER NOT NULL,
+  result TEXT NOT NULL,
+  mode TEXT,
+  bytes INTEGER,
+  error TEXT,
+  path TEXT,
+  title TEXT,
+  size_bytes INTEGER,
+  archived_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+CREATE INDEX IF NOT EXISTS archive.idx_archive_audit_created ON download_audit(created_at);
+"""
+
+_TERMINAL_JOB_STATES = ("succeeded", "failed", "cancelled")
+
+
+async def attach_archive(db: aiosqlite.Connection, archive_path: str) -> None:
+    """ATTACH the archive file as schema "archive" (created on first use).
+
+    ATTACH is not allowed inside a transaction: use a dedicated connection (the retention task
+    opens its own), not the shared group-commit writer.
+    """
+    cur = await db.execute("PRAGMA database_list")
+    if any(str(r[1]) == "archive" for r in await cur.fetchall()):
+        return
+    await db.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+    await _executescript_idempotent(db, ARCHIVE_SCHEMA)
+    await db.commit()
+
+
+async def _move_rows(db: aiosqlite.Connection, ids: list[int], insert_sql: str, delete_sql: str) -> int:
+    if not ids:
+        return 0
+    marks = ",".join("?" * len(ids))
+    async with _write_unit(db):
+        # INSERT OR IGNORE: a batch interrupted between the two files is simply redone.
+        await db.execute(insert_sql.format(ids=marks), ids)
+        await db.execute(delete_sql.format(ids=marks), ids)
+    await db.commit()
+    return len(ids)
+
+
+async def archive_download_audit_batch(db: aiosqlite.Connection, *, older_than_days: int, batch_size: int = 500) -> int:
+    """Move up to batch_size audit rows older than the window into archive; returns the count.
+
+    /stats is unaffected: rollups (schema v19) are not derived back from raw audit. Nothing moves
+    while the audit_rollups backfill is still adding old rows to them.
+    """
+    cur = await db.execute(
+        """
+        SELECT id FROM main.download_audit
+        WHERE created_at < datetime('now', ?)
+          AND NOT EXISTS (SELECT 1 FROM main.schema_backfills WHERE name='audit_rollups' AND done=0)
+        ORDER BY created_at LIMIT ?
+        """,
+        (f"-{int(older_than_days)} days", max(1, int(batch_size))),
+    )
+    ids = [int(r[0]) for r in await cur.fetchall()]
+    return await _move_rows(
+        db,
+        ids,
+        """
+        INSERT OR IGNORE INTO archive.download_audit(
+          id, created_at, job_id, tg_chat_id, tg_user_id, catalog_item_id, result, mode, bytes, error,
+          path, title, size_bytes)
+        SELECT a.id, a.created_at, a.job_id, a.tg_chat_id, a.tg_user_id, a.catalog_item_id, a.result, a.mode,
+               a.bytes, a.error, c.path, c.title, c.size_bytes
+        FROM main.download_audit a
+        LEFT JOIN main.catalog_items c ON c.id = a.catalog_item_id
+        WHERE a.id IN ({ids})
+        """,
+        "DELETE FROM main.download_audit WHERE id IN ({ids})",
+    )
+
+
+async def archive_jobs_batch(db: aiosqlite.Connection, *, older_than_days: int, batch_size: int = 500) -> int:
+    """Move up to batch_size terminal jobs not updated within the window into archive.
+
+    Jobs still referenced by live audit rows stay (deleting them would cascade to the audit).
+    """
+    cur = await db.execute(
+        f"""
+        SELECT j.id FROM main.jobs j
+        WHERE j.state IN ({",".join("?" * len(_TERMINAL_JOB_STATES))})
+          AND j.updated_at < datetime('now', ?)
+          AND NOT EXISTS (SELECT 1 FROM main.download_audit a WHERE a.job_id = j.id)
+        LIMIT ?
+        """,
+        (*_TERMINAL_JOB_STATES, f"-{int(older_than_days)} days", max(1, int(batch_size))),
+    )
+    ids = [int(r[0]) for r in await cur.fetchall()]
+    return await _move_rows(
+        db,
+        ids,
+        """
+        INSERT OR IGNORE INTO archive.jobs(
+          id, created_at, updated_at, tg_chat_id, tg_user_id, catalog_item_id, state, attempt, last_error,
+          request_id, job_type)
+        SELECT id, created_at, updated_at, tg_chat_id, tg_user_id, catalog_item_id, state, attempt, last_error,
+               request_id, COALESCE(job_type, 'download')
+        FROM main.jobs
+        WHERE id IN ({ids})
+        """,
+        "DELETE FROM main.jobs WHERE id IN ({ids})",
+    )
+
+
+async def fetch_archived_download_audit(archive_path: str, *, limit: int = 20, offset: int = 0) -> list[AuditRow]:
+    """Newest-first audit rows from the archive file (read-only; [] if nothing was archived yet)."""
+    try:
+        adb = await aiosqlite.connect(f"file:{archive_path}?mode=ro", uri=True)
+    except sqlite3.OperationalError:
+        return []
+    try:
+        cur = await adb.execute(
+            """
+            SELECT created_at, job_id, tg_chat_id, tg_user_id, catalog_item_id, result, mode, bytes, error,
+                   COALESCE(path, ''), COALESCE(title, ''), size_bytes
+            FROM download_audit
+            ORDER BY created_at DESC
+            LIMIT ? OFFSET ?
+            """,
+            (int(limit), int(offset)),
+        )
+        return from_rows(AuditRow, await cur.fetchall())
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        await adb.close()
+
+
+@_reads
+async def count_active_downloaders(db: aiosqlite.Connection, *, days: int) -> int:
+    """Distinct users with a successful download over the last `days` calendar days (today included)."""
+    cur = await db.execute(
+        """
+        SELECT COUNT(DISTINCT tg_user_id)
+        FROM download_audit_daily_users
+        WHERE day >= date('now', ?) AND succeeded > 0
+        """,
+        (f"-{max(1, int(days)) - 1} days",),
+    )
+    row = await cur.fetchone()
+    return int(row[0] or 0)
+
+
+@_reads
 async def count_users_by_status(db: aiosqlite.Connection) -> dict[str, int]:
     cur = await db.execute(
         """
@@ -0,0 +1,145 @@
+"""Typo-tolerant lookup over the catalog vocabulary (SymSpell-style symmetric deletes).
+
+The vocabulary is the set of title/path terms already kept by the FTS index (see
+db.fetch_catalog_vocabulary), so nothing here scans catalog_items. For every term the index stores
+the hashes of its deletion variants (up to max_distance(term) characters removed) packed with the
+term id into one sorted array('q'); a query token generates its own deletes and finds candidates by
+binary search, which are then verified with an edit distance.
+
+A FuzzyIndex is immutable once built; rebuild it when the catalog version changes.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable
+
+_TOKEN_RE = re.compile(r"[0-9A-Za-zА-Яа-яЁё]+")
+
+_ID_BITS = 24
+_HASH_MASK = (1 << 39) - 1
+_MAX_TERMS = 1 << _ID_BITS
+# Longer tokens get no more deletes than this many characters produce.
+_MAX_TERM_LEN = 20
+MIN_TOKEN_LEN = 3
+
+
+def normalize_token(token: str) -> str:
+    """Fold a token the way the FTS unicode61 tokenizer does (case, diacritics incl. ё -> е)."""
+    decomposed = unicodedata.normalize("NFD", token.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def max_distance(token: str) -> int:
+    return 1 if len(token) < 7 else 2
+
+
+def _deletes(token: str, distance: int) -> set[str]:
+    out = {token}
+    frontier = {token}
+    for _ in range(distance):
+        nxt = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def _key(variant: str) -> int:
+    return hash(variant) & _HASH_MASK
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent transpositions count as 1); limit + 1 if above limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            row_min = min(row_min, v)
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= limit else limit + 1
+
+
+class FuzzyIndex:
+    def __init__(self, vocabulary: Iterable[tuple[str, int]]) -> None:
+        terms: dict[str, int] = {}
+        for term, count in vocabulary:
+            t = normalize_token(str(term))
+            if len(t) < MIN_TOKEN_LEN or not t.isalpha():
+                continue
+            terms[t] = terms.get(t, 0) + int(count or 0)
+            if len(terms) >= _MAX_TERMS:
+                break
+        self.terms: list[str] = sorted(terms)
+        self.counts = array("q", (terms[t] for t in self.terms))
+        packed = array("q")
+        for tid, t in enumerate(self.terms):
+            t = t[:_MAX_TERM_LEN]
+            packed.extend((_key(v) << _ID_BITS) | tid for v in _deletes(t, max_distance(t)))
+        self._packed = array("q", sorted(packed))
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _known_prefix(self, token: str) -> bool:
+        # FTS matches tokens as prefixes: a token that starts some term needs no correction.
+        i = bisect_left(self.terms, token)
+        return i < len(self.terms) and self.terms[i].startswith(token)
+
+    def lookup(self, token: str) -> str | None:
+        """Closest vocabulary term within max_distance(token); ties go to the more frequent term."""
+        token = normalize_token(token)
+        limit = max_distance(token)
+        best: tuple[int, int, str] | None = None
+        seen: set[int] = set()
+        for v in _deletes(token[:_MAX_TERM_LEN], limit):
+            key = _key(v) << _ID_BITS
+            lo = bisect_left(self._packed, key)
+            hi = bisect_right(self._packed, key | ((1 << _ID_BITS) - 1), lo)
+            for packed in self._packed[lo:hi]:
+                tid = packed & ((1 << _ID_BITS) - 1)
+                if tid in seen:
+                    continue
+                seen.add(tid)
+                term = self.terms[tid]
+                d = edit_distance(token, term, limit)
+                if d > limit:
+                    continue
+                cand = (d, -self.counts[tid], term)
+                if best is None or cand < best:
+                    best = cand
+        return best[2] if best else None
+
+    def correct(self, query: str) -> str | None:
+        """Query with misspelled words replaced, or None when nothing could be (or needed to be) fixed."""
+        out: list[str] = []
+        changed = False
+        for raw in _TOKEN_RE.findall(query or "")[:8]:
+            token = normalize_token(raw)
+            if len(token) < MIN_TOKEN_LEN or not token.isalpha() or self._known_prefix(token):
+                out.append(token)
+                continue
+            fixed = self.lookup(token)
+            if fixed is None:
+                return None
+            out.append(fixed)
+            changed = True
+        return " ".join(out) if changed else None
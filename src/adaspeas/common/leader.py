@@ -0,0 +1,101 @@
+"""Redis leader election: background jobs that must run on exactly one replica.
+
+A LeaderLease holds the key adaspeas:leader:<name> (value: the replica id) with a TTL and renews it
+every ttl/3. Renewal and release are compare-and-set (Lua), so a replica never extends or drops a
+lease another replica has taken over. When the holder dies, the key expires and the next replica to
+try becomes leader within ttl_sec.
+
+is_leader is also bounded locally: it turns false once ttl_sec has passed since the last successful
+acquire/renew, so a replica that cannot reach Redis (or whose loop stalls) stops acting as leader
+by the time another one may have taken over.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import time
+
+import redis.asyncio as redis
+import structlog
+
+log = structlog.get_logger()
+
+LEADER_KEY_PREFIX = "adaspeas:leader:"
+
+_RENEW = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end
+return 0
+"""
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end
+return 0
+"""
+
+
+def default_replica_id() -> str:
+    """hostname:pid -- the container id under Docker, unique per running replica."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaderLease:
+    def __init__(self, r: redis.Redis, name: str, *, replica_id: str, ttl_sec: float = 30.0) -> None:
+        self.key = LEADER_KEY_PREFIX + name
+        self.replica_id = replica_id
+        self.ttl_sec = max(1.0, float(ttl_sec))
+        self._r = r
+        self._valid_until = 0.0
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._valid_until
+
+    @property
+    def role(self) -> str:
+        return "leader" if self.is_leader else "follower"
+
+    async def try_acquire(self) -> bool:
+        """Renew the lease if held, else take it if free. Returns is_leader."""
+        ttl_ms = int(self.ttl_sec * 1000)
+        started = time.monotonic()
+        ok = False
+        if self._valid_until:
+            ok = bool(await self._r.eval(_RENEW, 1, self.key, self.replica_id, ttl_ms))
+        if not ok:
+            ok = bool(await self._r.set(self.key, self.replica_id, nx=True, px=ttl_ms))
+        # Counted from before the round trip: the Redis-side TTL started no earlier than that.
+        self._valid_until = started + self.ttl_sec if ok else 0.0
+        return ok
+
+    async def release(self) -> None:
+        if self._valid_until:
+            self._valid_until = 0.0
+            await self._r.eval(_RELEASE, 1, self.key, self.replica_id)
+
+    async def holder(self) -> str | None:
+        return await self._r.get(self.key)
+
+    async def run(self, state: dict | None = None, *, state_key: str = "role") -> None:
+        """Keep trying/renewing every ttl/3 until cancelled; mirrors the role into state[state_key]."""
+        was_leader = False
+        try:
+            while True:
+                try:
+                    await self.try_acquire()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._valid_until = 0.0
+                    log.warning("leader_lease_error", key=self.key, err=str(e))
+                if self.is_leader != was_leader:
+                    was_leader = self.is_leader
+                    log.info("leader_role_changed", key=self.key, replica=self.replica_id, role=self.role)
+                if state is not None:
+                    state[state_key] = self.role
+                await asyncio.sleep(self.ttl_sec / 3)
+        finally:
+            try:
+                await self.release()
+            except Exception:
+                pass
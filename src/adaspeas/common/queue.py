@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import time
+from typing import AsyncIterator
+
 import redis.asyncio as redis
 
 QUEUE_KEY = "adaspeas:jobs"
+# Catalog invalidation bus: worker publishes the new catalog version after each sync slice.
+CATALOG_VERSION_CHANNEL = "adaspeas:catalog_version"
 
 
 async def get_redis(url: str) -> redis.Redis:
@@ -20,3 +25,40 @@ async def dequeue(r: redis.Redis, timeout_s: int = 5) -> int | None:
         return None
     _, value = res
     return int(value)
+
+
+async def publish_catalog_version(r: redis.Redis, version: int) -> None:
+    await r.publish(CATALOG_VERSION_CHANNEL, str(int(version)))
+
+
+async def listen_catalog_versions(r: redis.Redis, *, reconcile_sec: float = 30.0) -> AsyncIterator[int | None]:
+    """Yield catalog versions published on the invalidation channel (until cancelled).
+
+    None is yielded once the subscription is active and then every reconcile_sec: the caller re-reads the
+    stored version then, since a publish can be lost or land before the subscription.
+    """
+    pubsub = r.pubsub()
+    await pubsub.subscribe(CATALOG_VERSION_CHANNEL)
+    try:
+        yield None
+        deadline = time.monotonic() + reconcile_sec
+        while True:
+            msg = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=max(0.0, deadline - time.monotonic())
+            )
+            if msg is not None and msg.get("type") == "message":
+                try:
+                    version = int(msg.get("data"))
+                except (TypeError, ValueError):
+                    version = None
+                if version is not None:
+                    yield version
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + reconcile_sec
+                yield None
+    finally:
+        try:
+            await pubsub.unsubscribe(CATALOG_VERSION_CHANNEL)
+            await pubsub.aclose()
+        except Exception:
+            pass
@@ -0,0 +1,156 @@
+"""Row records returned by adaspeas.common.db fetch helpers.
+
+Each record is a NamedTuple built directly from the sqlite row tuple (no per-row dict, no key
+strings, no per-field conversion): one compact allocation per row. Column order in the SELECTs
+must match field order; NULL defaults are applied in SQL (COALESCE).
+
+Attribute access is the interface (item.path). Mapping-style item["path"] / item.get("path")
+keeps working for older call sites.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, NamedTuple, TypeVar
+
+R = TypeVar("R", bound=tuple)
+
+_new = tuple.__new__
+
+
+def from_row(cls: type[R], row: tuple) -> R:
+    """Wrap one sqlite row (SELECT column order == field order) without copying per field."""
+    return _new(cls, row)
+
+
+def from_rows(cls: type[R], rows: Iterable[tuple]) -> list[R]:
+    return [_new(cls, r) for r in rows]
+
+
+def _getitem(self, key):
+    if isinstance(key, str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+    return tuple.__getitem__(self, key)
+
+
+def _get(self, key: str, default=None):
+    return getattr(self, key, default)
+
+
+class CatalogEntry(NamedTuple):
+    """Listing row: folder children and search hits."""
+
+    id: int
+    kind: str
+    title: str
+    size_bytes: int | None
+    path: str
+
+    __getitem__ = _getitem
+    get = _get
+
+
+class CatalogItem(NamedTuple):
+    id: int
+    path: str
+    kind: str
+    title: str
+    yandex_id: str | None
+    size_bytes: int | None
+    tg_file_id: str | None
+    tg_file_unique_id: str | None
+    parent_path: str | None
+    seen_at: str | None
+    is_deleted: int
+    content_md5: str | None
+    content_sha256: str | None
+
+    __getitem__ = _getitem
+    get = _get
+
+
+class Job(NamedTuple):
+    id: int
+    tg_chat_id: int
+    tg_user_id: int
+    catalog_item_id: int
+    state: str
+    attempt: int
+    last_error: str | None
+    job_type: str
+
+    __getitem__ = _getitem
+    get = _get
+
+
+class User(NamedTuple):
+    tg_user_id: int
+    created_at: str | None = None
+    status: str = "guest"
+    user_note: str | None = None
+    expires_at: str | None = None
+    warned_24h_at: str | None = None
+    updated_at: str | None = None
+    id: int | None = None
+
+    __getitem__ = _getitem
+    get = _get
+
+
+class AuditRow(NamedTuple):
+    created_at: str
+    job_id: int
+    tg_chat_id: int
+    tg_user_id: int
+    catalog_item_id: int
+    result: str
+    mode: str | None
+    bytes: int | None
+    error: str | None
+    path: str
+    title: str
+    size_bytes: int | None
+
+    __getitem__ = _getitem
+    get = _get
+
+
+class FolderStats(NamedTuple):
+    """Materialized folder stats: direct children counts/size, recursive totals (None until refreshed)."""
+
+    folder_path: str
+    child_count: int
+    file_count: int
+    size_bytes: int
+    last_modified: str | None
+    total_size_bytes: int | None
+    total_last_modified: str | None
+
+    __getitem__ = _getitem
+    get = _get
+
+
+class ContentTask(NamedTuple):
+    """A file waiting for text extraction (catalog_content state='pending')."""
+
+    item_id: int
+    path: str
+    storage_path: str
+    size_bytes: int | None
+    rev: int
+    attempts: int
+
+
+class FolderView(NamedTuple):
+    """One catalog folder page for the bot UI (db.fetch_folder_view)."""
+
+    folder: CatalogEntry
+    parent_id: int | None
+    root_id: int | None
+    total: int
+    size_bytes: int | None
+    last_sync_at: str | None
+    children: list[CatalogEntry]
+    more: bool
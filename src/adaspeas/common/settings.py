@@ -9,6 +9,21 @@ class Settings(BaseSettings):
     # Telegram
     bot_token: str
     admin_user_ids: str = ""
+    # Update intake: polling | webhook. Webhook mode serves POST webhook_path on the bot's aiohttp app
+    # (port 8080, behind Caddy) and registers webhook_base_url + webhook_path with Telegram; without
+    # webhook_base_url or webhook_secret the bot falls back to polling. webhook_secret is checked against the
+    # X-Telegram-Bot-Api-Secret-Token header; webhook_max_concurrency bounds updates handled at once (1..100).
+    bot_mode: str = "polling"
+    webhook_base_url: str = ""
+    webhook_path: str = "/tg/webhook"
+    webhook_secret: str = ""
+    webhook_max_concurrency: int = 32
+    # Several bot replicas (webhook mode) share SQLite and Redis; schedulers run only on the replica
+    # holding the Redis lease adaspeas:leader:bot. bot_replica_id defaults to hostname:pid.
+    # bot_replicas mirrors BOT_REPLICAS from compose; in polling mode with >1 only the lease holder polls.
+    bot_replicas: int = 1
+    bot_replica_id: str = ""
+    leader_lease_ttl_sec: int = 30
 
     # Access control (Milestone 2)
     access_control_enabled: int = 0  # 1 = enforce user status/expiry, 0 = allow everyone
@@ -26,21 +41,68 @@ class Settings(BaseSettings):
     yandex_oauth_token: str = ""
     yandex_base_path: str = "/Zkvpr"
     local_storage_root: str = "/data/storage"
+    # Live catalog updates for storage_mode=local: the worker watches local_storage_root and applies
+    # debounced per-folder changes. Keep a (rarer) periodic sync as a safety net for changes made
+    # while the worker was down.
+    local_watch_enabled: int = 1
+    local_watch_backend: str = "auto"  # auto | inotify | poll
+    local_watch_debounce_ms: int = 500
+    local_watch_poll_interval_sec: int = 30
 
     # DB
     sqlite_path: str = "/data/app.db"
+    # Read-only WAL connections in the bot (navigation/search reads); 0 = single connection.
+    sqlite_read_pool_size: int = 4
+    # Group commit: writes committed within this window share one COMMIT (0 = commit each call).
+    sqlite_commit_window_ms: int = 2
+    sqlite_commit_max_batch: int = 64
+    # Retention (worker): terminal jobs / download audit older than these windows move to a separate
+    # archive SQLite file in small batches (0 disables). /stats rollups are kept; /audit archive reads it.
+    archive_sqlite_path: str = "/data/archive.db"
+    jobs_retention_days: int = 30
+    audit_retention_days: int = 180
+    retention_batch_size: int = 500
+    retention_interval_sec: int = 3600
+    # Online backfills (worker): rows per chunk and the pause between chunks (lets jobs take the write lock).
+    backfill_batch_size: int = 2000
+    backfill_pause_ms: int = 50
 
     # Catalog UI / sync
     # Page size for inline catalog navigation.
     catalog_page_size: int = 25
     # Periodic background sync in worker (0 disables; recommended in prod: 3600).
     catalog_sync_interval_sec: int = 0
-    # Safety cap for nodes visited per sync (prevents endless trees / huge repos).
+    # Nodes upserted per sync slice (one job). Bigger trees continue in follow-up jobs
+    # from the persisted frontier, so memory stays flat and a restart does not lose progress.
     catalog_sync_max_nodes: int = 5000
 
+    # Bot: the catalog version from the Redis bus is also re-read from SQLite this often (a lost publish
+    # otherwise leaves the caches on the old version).
+    catalog_version_reconcile_sec: int = 30
+
     # Search (IDEA-007)
     search_page_size: int = 20
     search_session_ttl_sec: int = 3600
+    # Ranked result ids per (query, scope, catalog_version), kept in bot memory: later pages skip the FTS query.
+    search_cache_size: int = 256
+    search_cache_ttl_sec: int = 600
+    search_cache_max_ids: int = 1000
+    # Catalog tree snapshot in bot memory: folder navigation is served without SQLite; reloaded when the
+    # catalog version changes. A catalog with more live items than this stays on SQLite (0 disables).
+    catalog_tree_max_items: int = 200_000
+    # Rendered folder pages (text + keyboard) per (folder, page, admin/non-admin, catalog_version). 0 disables.
+    dir_cache_size: int = 512
+    dir_cache_ttl_sec: int = 300
+    # Document content index (worker): new/changed files are downloaded once, their text (PDF/DOCX/TXT)
+    # extracted in a process pool and searched via catalog_content_fts. Off by default: it reads every file.
+    content_index_enabled: int = 0
+    content_index_workers: int = 2
+    content_index_max_bytes: int = 50 * 1024 * 1024
+    content_index_max_chars: int = 200_000
+    # One file's extraction may take this long; then the attempt fails and the pool is restarted.
+    content_index_timeout_sec: int = 120
+    content_index_batch_size: int = 20
+    content_index_interval_sec: int = 60
 
     # Network retries/backoff (IDEA-004)
     net_retry_attempts: int = 3
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
 import asyncio
+import os
+import threading
+import time
 from pathlib import Path
 from typing import AsyncIterator, Protocol
 
@@ -9,7 +12,7 @@ class StorageClient(Protocol):
     async def stream_download(self, path: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
         ...
 
-    async def list_dir(self, path: str) -> list[dict]:
+    async def list_dir(self, path: str, *, limit: int = 200, offset: int = 0) -> list[dict]:
         ...
 
     async def close(self) -> None:
@@ -17,44 +20,76 @@ class StorageClient(Protocol):
 
 
 class LocalDiskClient:
+    # Paging through a big folder re-requests the same directory with growing offsets;
+    # the sorted listing is kept briefly so each page is a slice, not a rescan.
+    _LISTING_TTL_SEC = 30.0
+
     def __init__(self, root: str):
         self._root = Path(root)
+        self._listing_lock = threading.Lock()
+        self._listing: tuple[tuple[str, int], float, list[dict]] | None = None
 
-
-    async def list_dir(self, path: str) -> list[dict]:
+    def _resolve(self, path: str) -> Path:
         rel = path.lstrip("/")
-        base = (self._root / rel).resolve()
-        if self._root.resolve() not in base.parents and base != self._root.resolve():
+        full = (self._root / rel).resolve()
+        # Basic guard against path traversal.
+        if self._root.resolve() not in full.parents and full != self._root.resolve():
             raise RuntimeError("Local storage: invalid path")
-        if not base.exists() or not base.is_dir():
-            raise FileNotFoundError(str(base))
+        return full
 
-        import os
+    @staticmethod
+    def _scan(base: Path, path: str) -> list[dict]:
+        # os.scandir: type checks use the cached d_type from readdir, one stat per entry for size/mtime.
+        prefix = path.rstrip("/")
         out: list[dict] = []
-        for name in sorted(os.listdir(base))[:500]:
-            full = (base / name)
-            if full.is_dir():
-                out.append({"name": name, "type": "dir", "path": (path.rstrip("/") + "/" + name) if path != "/" else "/" + name})
-            elif full.is_file():
+        with os.scandir(base) as it:
+            for entry in it:
                 try:
-                    st = full.stat()
-                    out.append({
-                        "name": name,
-                        "type": "file",
-                        "path": (path.rstrip("/") + "/" + name) if path != "/" else "/" + name,
-                        "size": int(st.st_size),
-                        "modified": None,
-                    })
-                except Exception:
-                    out.append({"name": name, "type": "file", "path": (path.rstrip("/") + "/" + name) if path != "/" else "/" + name})
+                    is_dir = entry.is_dir()
+                    if not is_dir and not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    # Vanished or unreadable while listing.
+                    continue
+                modified = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(st.st_mtime))
+                if is_dir:
+                    out.append({"name": entry.name, "type": "dir", "path": prefix + "/" + entry.name, "modified": modified})
+                else:
+                    out.append(
+                        {
+                            "name": entry.name,
+                            "type": "file",
+                            "path": prefix + "/" + entry.name,
+                            "size": int(st.st_size),
+                            "modified": modified,
+                        }
+                    )
+        out.sort(key=lambda d: d["name"])
         return out
 
+    def _list_page(self, base: Path, path: str, limit: int, offset: int) -> list[dict]:
+        if not base.is_dir():
+            raise FileNotFoundError(str(base))
+        # Directory mtime changes when entries are added/removed; TTL bounds staleness of file sizes.
+        key = (str(base), base.stat().st_mtime_ns)
+        now = time.monotonic()
+        with self._listing_lock:
+            cached = self._listing
+            if cached is not None and cached[0] == key and cached[1] > now:
+                items = cached[2]
+            else:
+                items = self._scan(base, path)
+                self._listing = (key, now + self._LISTING_TTL_SEC, items)
+        return items[offset: offset + limit]
+
+    async def list_dir(self, path: str, *, limit: int = 200, offset: int = 0) -> list[dict]:
+        """List one folder level, sorted by name, with limit/offset pagination (like YandexDiskClient)."""
+        base = self._resolve(path)
+        return await asyncio.to_thread(self._list_page, base, path, max(1, int(limit)), max(0, int(offset)))
+
     async def stream_download(self, path: str, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
-        rel = path.lstrip("/")
-        full = (self._root / rel).resolve()
-        # Basic guard against path traversal.
-        if self._root.resolve() not in full.parents and full != self._root.resolve():
-            raise RuntimeError("Local storage: invalid path")
+        full = self._resolve(path)
         if not full.exists() or not full.is_file():
             raise FileNotFoundError(str(full))
 
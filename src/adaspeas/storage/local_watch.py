@@ -0,0 +1,299 @@
+"""Live change feed for storage_mode=local.
+
+LocalTreeWatcher turns filesystem activity under local_storage_root into debounced batches
+{folder_path: listing | None}: the fresh listing of every folder whose direct children changed
+(None when the folder itself is gone). Paths are catalog paths ("/", "/a/b").
+
+Backends:
+- inotify (Linux, via ctypes; no extra dependency): one watch per directory, zero cost when idle;
+- poll: periodic scandir walk compared with per-folder fingerprints (used when inotify is
+  unavailable, e.g. non-Linux, or fs.inotify.max_user_watches is exhausted).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import struct
+from pathlib import Path
+from typing import AsyncIterator
+
+import structlog
+
+from adaspeas.storage import LocalDiskClient
+
+log = structlog.get_logger()
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def _join(folder: str, name: str) -> str:
+    return (folder.rstrip("/") + "/" + name) if folder != "/" else "/" + name
+
+
+class _Inotify:
+    """Minimal ctypes binding: init1 / add_watch and a non-blocking event reader."""
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        try:
+            self._add = libc.inotify_add_watch
+            init1 = libc.inotify_init1
+        except AttributeError as e:
+            raise OSError("inotify is not available on this platform") from e
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        fd = init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.fd = int(fd)
+
+    def add_watch(self, path: Path) -> int:
+        wd = self._add(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        return int(wd)
+
+    def read_events(self) -> list[tuple[int, int, str]]:
+        """Drain pending events as (wd, mask, name)."""
+        out: list[tuple[int, int, str]] = []
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return out
+            if not buf:
+                return out
+            off = 0
+            while off + _EVENT_HEADER.size <= len(buf):
+                wd, mask, _cookie, ln = _EVENT_HEADER.unpack_from(buf, off)
+                off += _EVENT_HEADER.size
+                name = buf[off: off + ln].split(b"\0", 1)[0]
+                off += ln
+                out.append((int(wd), int(mask), os.fsdecode(name)))
+
+    def close(self) -> None:
+        # Closing the fd drops every watch.
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class LocalTreeWatcher:
+    """Debounced per-folder change batches for a local storage root.
+
+    backend: "auto" (inotify, poll on failure) | "inotify" | "poll".
+    debounce_sec: quiet period that closes a batch; max_delay_sec caps it under constant churn.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        *,
+        backend: str = "auto",
+        debounce_sec: float = 0.5,
+        max_delay_sec: float = 5.0,
+        poll_interval_sec: float = 30.0,
+    ) -> None:
+        self._root = Path(root).resolve()
+        self._backend_pref = (backend or "auto").strip().lower()
+        self._debounce = max(0.0, float(debounce_sec))
+        self._max_delay = max(self._debounce, float(max_delay_sec))
+        self._poll_interval = max(1.0, float(poll_interval_sec))
+        self.backend = "off"
+
+        self._ino: _Inotify | None = None
+        self._wd_path: dict[int, str] = {}
+        self._path_wd: dict[str, int] = {}
+        self._dirty: set[str] = set()
+        self._new_trees: set[str] = set()
+        self._wake = asyncio.Event()
+
+        # poll backend: folder -> fingerprint of its listing
+        self._fingerprints: dict[str, int] = {}
+
+    def _fs(self, folder: str) -> Path:
+        return self._root / folder.lstrip("/")
+
+    def _list(self, folder: str) -> list[dict] | None:
+        try:
+            return LocalDiskClient._scan(self._fs(folder), folder)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    # --- inotify backend ---
+
+    def _watch_tree(self, folder: str) -> list[str]:
+        """Add watches for folder and every directory below it; return the folders visited."""
+        assert self._ino is not None
+        seen: list[str] = []
+        stack = [folder]
+        while stack:
+            cur = stack.pop()
+            try:
+                wd = self._ino.add_watch(self._fs(cur))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            old = self._wd_path.get(wd)
+            if old is not None and old != cur:
+                # Same inode seen under a new path: the directory was moved.
+                self._path_wd.pop(old, None)
+            self._wd_path[wd] = cur
+            self._path_wd[cur] = wd
+            seen.append(cur)
+            try:
+                with os.scandir(self._fs(cur)) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(_join(cur, entry.name))
+            except OSError:
+                pass
+        return seen
+
+    def _on_inotify_readable(self) -> None:
+        assert self._ino is not None
+        for wd, mask, name in self._ino.read_events():
+            if mask & IN_Q_OVERFLOW:
+                # Kernel queue overflowed: events were lost, reconcile the whole tree.
+                log.warning("local_watch_overflow")
+                self._new_trees.add("/")
+                continue
+            folder = self._wd_path.get(wd)
+            if folder is None:
+                continue
+            if mask & IN_IGNORED:
+                self._wd_path.pop(wd, None)
+                if self._path_wd.get(folder) == wd:
+                    self._path_wd.pop(folder, None)
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # The parent gets IN_DELETE / IN_MOVED_FROM for the same change.
+                continue
+            self._dirty.add(folder)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._new_trees.add(_join(folder, name))
+        if self._dirty or self._new_trees:
+            self._wake.set()
+
+    def _collect_inotify(self, dirty: set[str], new_trees: set[str]) -> dict[str, list[dict] | None]:
+        """Runs in a thread: register watches for new subtrees and list every dirty folder."""
+        for tree in sorted(new_trees):
+            dirty.update(self._watch_tree(tree))
+        return {folder: self._list(folder) for folder in dirty}
+
+    async def _start_inotify(self) -> None:
+        self._ino = _Inotify()
+        try:
+            await asyncio.to_thread(self._watch_tree, "/")
+        except OSError:
+            # ENOSPC: fs.inotify.max_user_watches is too small for this tree.
+            self._ino.close()
+            self._ino = None
+            self._wd_path.clear()
+            self._path_wd.clear()
+            raise
+        asyncio.get_running_loop().add_reader(self._ino.fd, self._on_inotify_readable)
+
+    # --- poll backend ---
+
+    def _collect_poll(self) -> dict[str, list[dict] | None]:
+        """Runs in a thread: walk the tree, return listings of folders whose fingerprint changed."""
+        out: dict[str, list[dict] | None] = {}
+        seen: set[str] = set()
+        stack = ["/"]
+        while stack:
+            folder = stack.pop()
+            listing = self._list(folder)
+            if listing is None:
+                continue
+            seen.add(folder)
+            fp = hash(tuple((d["name"], d["type"], d.get("size"), d.get("modified")) for d in listing))
+            if self._fingerprints.get(folder) != fp:
+                self._fingerprints[folder] = fp
+                out[folder] = listing
+            stack.extend(d["path"] for d in listing if d["type"] == "dir")
+        for gone in set(self._fingerprints) - seen:
+            self._fingerprints.pop(gone, None)
+            out[gone] = None
+        return out
+
+    # --- lifecycle ---
+
+    async def start(self) -> str:
+        """Prepare the backend (initial watches / fingerprints). Returns the backend name."""
+        if self._backend_pref in ("auto", "inotify"):
+            try:
+                await self._start_inotify()
+            except OSError as e:
+                if self._backend_pref == "inotify":
+                    raise
+                log.warning("local_watch_inotify_unavailable", err=str(e))
+            else:
+                self.backend = "inotify"
+                return self.backend
+        # Seed fingerprints so the first poll reports only real changes.
+        await asyncio.to_thread(self._collect_poll)
+        self.backend = "poll"
+        return self.backend
+
+    def close(self) -> None:
+        if self._ino is not None:
+            try:
+                asyncio.get_running_loop().remove_reader(self._ino.fd)
+            except Exception:
+                pass
+            self._ino.close()
+            self._ino = None
+        self.backend = "off"
+
+    async def batches(self) -> AsyncIterator[dict[str, list[dict] | None]]:
+        """Yield debounced change batches forever (start() must be awaited first)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.backend == "inotify":
+                await self._wake.wait()
+                first = loop.time()
+                # Debounce: wait for a quiet period, but never longer than max_delay.
+                while True:
+                    self._wake.clear()
+                    remaining = self._max_delay - (loop.time() - first)
+                    if remaining <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=min(self._debounce, remaining))
+                    except asyncio.TimeoutError:
+                        break
+                self._wake.clear()
+                # Swap the pending sets on the loop thread; the reader callback keeps filling new ones.
+                dirty, self._dirty = self._dirty, set()
+                new_trees, self._new_trees = self._new_trees, set()
+                batch = await asyncio.to_thread(self._collect_inotify, dirty, new_trees)
+            else:
+                await asyncio.sleep(self._poll_interval)
+                batch = await asyncio.to_thread(self._collect_poll)
+            if batch:
+                yield batch
@@ -0,0 +1,83 @@
+"""Plain-text extraction for the content index (pure Python: pypdf, zipfile + ElementTree).
+
+extract_text() runs in a worker process pool (see worker.main.content_index_loop): it is a
+module-level function of a file path, returns text capped at max_chars and raises on damaged files.
+"""
+
+from __future__ import annotations
+
+import codecs
+import re
+import zipfile
+from xml.etree import ElementTree
+
+TEXT_SUFFIXES = {".txt", ".md", ".csv"}
+SUPPORTED_SUFFIXES = TEXT_SUFFIXES | {".pdf", ".docx"}
+
+_WS_RE = re.compile(r"[ \t\r\f\v]+")
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def suffix_of(path: str) -> str:
+    name = (path or "").rsplit("/", 1)[-1]
+    return "." + name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+def _tidy(text: str, max_chars: int) -> str:
+    lines = (_WS_RE.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)[:max_chars]
+
+
+def _extract_plain(path: str, max_chars: int) -> str:
+    with open(path, "rb") as f:
+        raw = f.read(max_chars * 4)
+    try:
+        # Incremental decoder: a character cut by the read limit is dropped, not an error.
+        return codecs.getincrementaldecoder("utf-8-sig")().decode(raw)
+    except UnicodeDecodeError:
+        return raw.decode("cp1251", errors="replace")
+
+
+def _extract_docx(path: str, max_chars: int) -> str:
+    parts: list[str] = []
+    size = 0
+    with zipfile.ZipFile(path) as z, z.open("word/document.xml") as f:
+        for _event, el in ElementTree.iterparse(f):
+            if el.tag == _W_NS + "t" and el.text:
+                parts.append(el.text)
+                size += len(el.text)
+            elif el.tag in (_W_NS + "p", _W_NS + "br", _W_NS + "tab"):
+                parts.append("\n" if el.tag == _W_NS + "p" else " ")
+                if el.tag == _W_NS + "p":
+                    el.clear()
+            if size >= max_chars:
+                break
+    return "".join(parts)
+
+
+def _extract_pdf(path: str, max_chars: int) -> str:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    parts: list[str] = []
+    size = 0
+    for page in reader.pages:
+        text = page.extract_text() or ""
+        parts.append(text)
+        size += len(text)
+        if size >= max_chars:
+            break
+    return "\n".join(parts)
+
+
+def extract_text(path: str, suffix: str, max_chars: int) -> str:
+    """Text of a local file by its suffix (see SUPPORTED_SUFFIXES), whitespace-normalized."""
+    if suffix in TEXT_SUFFIXES:
+        text = _extract_plain(path, max_chars)
+    elif suffix == ".docx":
+        text = _extract_docx(path, max_chars)
+    elif suffix == ".pdf":
+        text = _extract_pdf(path, max_chars)
+    else:
+        raise ValueError(f"unsupported file type: {suffix or '?'}")
+    return _tidy(text, max_chars)
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import asyncio
-from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timezone
 import tempfile
+import time
 import uuid
 
 from aiohttp import web
@@ -12,7 +14,7 @@ from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError, Telegra
 from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.client.telegram import TelegramAPIServer
 from aiogram.types import FSInputFile
-from prometheus_client import Counter, Gauge, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
 import structlog
 
 from tenacity import AsyncRetrying, stop_after_attempt, wait_random_exponential, retry_if_exception_type
@@ -21,8 +23,11 @@ import httpx
 from adaspeas.common.logging import setup_logging
 from adaspeas.common.settings import Settings
 from adaspeas.common import db as db_mod
-from adaspeas.common.queue import get_redis, enqueue, dequeue
+from adaspeas.common.queue import get_redis, enqueue, dequeue, publish_catalog_version
+from adaspeas.common.records import ContentTask
 from adaspeas.storage import StorageClient, make_storage_client
+from adaspeas.storage.local_watch import LocalTreeWatcher
+from adaspeas.worker import extract as extract_mod
 
 log = structlog.get_logger()
 
@@ -59,6 +64,19 @@ JOBS_SUCCEEDED = Counter("jobs_succeeded_total", "Jobs succeeded")
 JOBS_FAILED = Counter("jobs_failed_total", "Jobs failed")
 JOBS_RETRIED = Counter("jobs_retried_total", "Jobs retried")
 JOB_ENQUEUE_TOTAL = Counter("jobs_enqueued_total", "Jobs enqueued total")
+SYNC_NODES = Counter("catalog_sync_nodes_total", "Catalog items upserted by sync")
+SYNC_SLICES = Counter("catalog_sync_slices_total", "Catalog sync slices (jobs) processed")
+SYNC_FRONTIER_PENDING = Gauge("catalog_sync_frontier_pending", "Folders waiting in the persisted sync frontier")
+SYNC_VISITED = Gauge("catalog_sync_visited", "Folders visited in the current sync run")
+CATALOG_VERSION = Gauge("catalog_version", "Last published catalog version")
+LOCAL_WATCH_BATCHES = Counter("catalog_watch_batches_total", "Debounced local storage change batches applied")
+LOCAL_WATCH_ROWS = Counter("catalog_watch_rows_total", "Catalog rows changed by the local storage watcher", ["change"])
+RETENTION_ARCHIVED = Counter("retention_archived_rows_total", "Rows moved to the archive SQLite file", ["table"])
+UPLOADS_DEDUPLICATED = Counter("uploads_deduplicated_total", "Downloads served by a cached upload of identical content")
+CONTENT_FILES = Counter("content_index_files_total", "Files processed by the content index", ["result"])
+CONTENT_BYTES = Counter("content_index_bytes_total", "Bytes downloaded for text extraction")
+CONTENT_EXTRACT_SECONDS = Histogram("content_index_extract_seconds", "Text extraction time per file")
+CONTENT_PENDING = Gauge("content_index_pending", "Files waiting for text extraction")
 
 
 async def notify_admins(bot: Bot, settings: Settings, text: str) -> None:
@@ -108,6 +126,10 @@ async def make_app(state: dict) -> web.Application:
                 "last_job_ok_at": state.get("last_job_ok_at"),
                 "last_job_error": state.get("last_job_error"),
                 "last_job_error_at": state.get("last_job_error_at"),
+                "local_watch": state.get("local_watch"),
+                "retention": state.get("retention"),
+                "backfills": state.get("backfills"),
+                "content_index": state.get("content_index"),
             }
         )
 
@@ -126,7 +148,13 @@ async def _init_db_with_retry(settings: Settings, state: dict):
     state["db"] = "starting"
     while True:
         try:
-            db = await db_mod.connect(settings.sqlite_path)
+            # Writer only (no read pool): worker reads must see its own open sync transaction.
+            db = await db_mod.connect_pool(
+                settings.sqlite_path,
+                read_pool_size=0,
+                commit_window_ms=int(getattr(settings, 'sqlite_commit_window_ms', 0) or 0),
+                commit_max_batch=int(getattr(settings, 'sqlite_commit_max_batch', 64) or 64),
+            )
             await db_mod.ensure_schema(db)
             state["db"] = "ok"
             state["last_init_error"] = None
@@ -170,9 +198,16 @@ async def _telegram_handshake_best_effort(bot: Bot, state: dict) -> None:
         state["last_init_error"] = f"telegram: {e}"
 
 
-async def sync_catalog(settings: Settings, storage: StorageClient, db, root_path: str, *, max_nodes: int = 5000) -> tuple[int, int]:
+# Storage listings are paginated (Yandex API and LocalDiskClient): page through every folder.
+_LIST_PAGE_SIZE = 200
+
+
+async def sync_catalog(settings: Settings, storage: StorageClient, db, root_path: str, *, max_nodes: int = 5000) -> tuple[int, int, int]:
     # Walk storage tree and upsert items into SQLite.
     # Designed for background execution in worker; bot UI reads only SQLite.
+    # The BFS frontier and visited set are persisted (sync_frontier), so one call is a slice of
+    # roughly max_nodes items; the run resumes from the checkpoint in the next call (or after restart).
+    # Returns (upserted, deleted, pending_folders); pending_folders == 0 means the run completed.
     root = (root_path or '/').rstrip('/') or '/'
 
     def clamp_child(p: str) -> bool:
@@ -181,29 +216,43 @@ async def sync_catalog(settings: Settings, storage: StorageClient, db, root_path
         rp = root.rstrip('/')
         return p == rp or p.startswith(rp + '/')
 
-    sync_started = await db_mod.db_now(db)
+    pending, _visited = await db_mod.sync_frontier_counts(db, root)
+    generation = int(await db_mod.get_meta(db, 'catalog_sync_generation') or 0)
+    if pending == 0:
+        # New run: bump the generation (soft-delete marker) and seed the frontier.
+        generation += 1
+        await db_mod.set_meta(db, 'catalog_sync_generation', str(generation))
+        # Ensure root exists
+        await db_mod.upsert_catalog_item(
+            db,
+            path=root,
+            kind='folder',
+            title='Каталог',
+            yandex_id=root,
+            parent_path=None,
+            sync_generation=generation,
+        )
+        await db_mod.sync_frontier_reset(db, root)
+    else:
+        log.info('sync_resumed', root=root, pending=pending, generation=generation)
 
-    queue = deque([root])
-    seen: set[str] = set()
     upserted = 0
+    while upserted < max_nodes:
+        cur_path = await db_mod.sync_frontier_next(db, root)
+        if cur_path is None:
+            break
 
-    # Ensure root exists
-    await db_mod.upsert_catalog_item(
-        db,
-        path=root,
-        kind='folder',
-        title='Каталог',
-        yandex_id=root,
-        parent_path=None,
-    )
-
-    while queue and upserted < max_nodes:
-        cur_path = (queue.popleft() or '/').rstrip('/') or '/'
-        if cur_path in seen:
-            continue
-        seen.add(cur_path)
-
-        items = await _call_with_retry(lambda: storage.list_dir(cur_path), attempts=int(getattr(settings, 'net_retry_attempts', 3) or 3), max_wait_sec=int(getattr(settings, 'net_retry_max_sec', 30) or 30))
+        items: list[dict] = []
+        while True:
+            page = await _call_with_retry(
+                lambda off=len(items): storage.list_dir(cur_path, limit=_LIST_PAGE_SIZE, offset=off),
+                attempts=int(getattr(settings, 'net_retry_attempts', 3) or 3),
+                max_wait_sec=int(getattr(settings, 'net_retry_max_sec', 30) or 30),
+            )
+            items.extend(page)
+            if len(page) < _LIST_PAGE_SIZE:
+                break
+        rows: list[dict] = []
         for it in items:
             typ = str(it.get('type') or '').strip().lower()
             kind = 'folder' if typ == 'dir' else 'file'
@@ -219,29 +268,51 @@ async def sync_catalog(settings: Settings, storage: StorageClient, db, root_path
 
             yandex_id = it.get('resource_id') or child_path
             size = it.get('size')
-
-            await db_mod.upsert_catalog_item(
-                db,
-                path=child_path,
-                kind=kind,
-                title=title,
-                yandex_id=str(yandex_id),
-                size_bytes=int(size) if isinstance(size, int) else None,
-                parent_path=cur_path,
+            rows.append(
+                {
+                    'path': child_path,
+                    'kind': kind,
+                    'title': title,
+                    'yandex_id': str(yandex_id),
+                    'size_bytes': int(size) if isinstance(size, int) else None,
+                    # Yandex reports content hashes for files; they key the shared upload cache.
+                    'content_md5': (str(it.get('md5')) if it.get('md5') else None),
+                    'content_sha256': (str(it.get('sha256')) if it.get('sha256') else None),
+                    'modified_at': (str(it.get('modified')) if it.get('modified') else None),
+                }
             )
-            upserted += 1
 
-            if kind == 'folder':
-                queue.append(child_path)
+        # Whole folder is one checkpoint: children, new frontier entries and "visited" commit together.
+        n = await db_mod.apply_sync_folder(db, root_path=root, folder_path=cur_path, items=rows, generation=generation)
+        upserted += n
+        SYNC_NODES.inc(n)
 
-            if upserted >= max_nodes:
-                break
+    pending, visited = await db_mod.sync_frontier_counts(db, root)
+    SYNC_FRONTIER_PENDING.set(pending)
+    SYNC_VISITED.set(visited)
+    SYNC_SLICES.inc()
 
     deleted = 0
-    if sync_started:
-        deleted = await db_mod.mark_deleted_not_seen(db, root, sync_started)
+    if pending == 0:
+        deleted = await db_mod.mark_deleted_before_generation(db, root, generation)
+        await db_mod.sync_frontier_clear(db, root)
+        await db_mod.refresh_folder_totals(db)
 
-    return upserted, deleted
+    return upserted, deleted, pending
+
+
+async def publish_catalog_changes(db, r) -> dict[str, int]:
+    """Turn pending catalog changes into a new version and announce it on the invalidation bus."""
+    version, changes = await db_mod.commit_catalog_version(db)
+    CATALOG_VERSION.set(version)
+    if changes:
+        try:
+            await publish_catalog_version(r, version)
+        except Exception as e:
+            # Subscribers re-read the version from SQLite periodically; a lost message only delays invalidation.
+            log.warning('catalog_version_publish_failed', version=version, err=str(e))
+        log.info('catalog_version_published', version=version, **changes)
+    return changes
 
 
 async def periodic_sync_scheduler(settings: Settings, db, r) -> None:
@@ -277,7 +348,7 @@ async def periodic_sync_scheduler(settings: Settings, db, r) -> None:
                     parent_path=None,
                 )
             else:
-                root_id = int(root_item['id'])
+                root_id = int(root_item.id)
 
             job_id = await db_mod.insert_job(
                 db,
@@ -299,14 +370,245 @@ async def periodic_sync_scheduler(settings: Settings, db, r) -> None:
         await asyncio.sleep(interval)
 
 
+async def local_watch_loop(settings: Settings, db, get_redis_client, state: dict) -> None:
+    """Apply local storage changes to the catalog as they happen (storage_mode=local).
+
+    get_redis_client returns the current Redis client (it is replaced on reconnect).
+    """
+    watcher = LocalTreeWatcher(
+        getattr(settings, 'local_storage_root', '/data/storage'),
+        backend=str(getattr(settings, 'local_watch_backend', 'auto') or 'auto'),
+        debounce_sec=int(getattr(settings, 'local_watch_debounce_ms', 500) or 0) / 1000.0,
+        poll_interval_sec=int(getattr(settings, 'local_watch_poll_interval_sec', 30) or 30),
+    )
+    try:
+        state["local_watch"] = await watcher.start()
+        log.info('local_watch_started', backend=watcher.backend)
+        async for batch in watcher.batches():
+            try:
+                generation = int(await db_mod.get_meta(db, 'catalog_sync_generation') or 0)
+                upserted = deleted = 0
+                # Parents first, so a new folder row exists before its children arrive.
+                for folder in sorted(batch, key=lambda p: (p.count('/'), p)):
+                    listing = batch[folder]
+                    items = None
+                    if listing is not None:
+                        items = [
+                            {
+                                'path': it['path'],
+                                'kind': 'folder' if it.get('type') == 'dir' else 'file',
+                                'title': it.get('name') or it['path'].rsplit('/', 1)[-1],
+                                'size_bytes': it.get('size'),
+                                'modified_at': it.get('modified'),
+                            }
+                            for it in listing
+                        ]
+                    u, d = await db_mod.apply_local_folder(db, folder_path=folder, items=items, generation=generation)
+                    upserted += u
+                    deleted += d
+                if upserted or deleted:
+                    await db_mod.refresh_folder_totals(db, list(batch))
+                LOCAL_WATCH_BATCHES.inc()
+                LOCAL_WATCH_ROWS.labels(change='upserted').inc(upserted)
+                LOCAL_WATCH_ROWS.labels(change='deleted').inc(deleted)
+                if upserted or deleted:
+                    await publish_catalog_changes(db, get_redis_client())
+                log.info('local_watch_applied', folders=len(batch), upserted=upserted, deleted=deleted)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning('local_watch_apply_error', err=str(e))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        state["local_watch"] = "error"
+        log.warning('local_watch_failed', err=str(e))
+    finally:
+        watcher.close()
+
+
+async def backfill_loop(settings: Settings, db, state: dict, *, idle_sec: float = 30.0) -> None:
+    """Drive pending schema backfills (see db_mod.BACKFILLS) chunk by chunk; progress goes to /ready."""
+    batch = max(1, int(getattr(settings, 'backfill_batch_size', 2000) or 2000))
+    pause = max(0, int(getattr(settings, 'backfill_pause_ms', 50) or 0)) / 1000.0
+    while True:
+        try:
+            for name in await db_mod.pending_backfills(db):
+                log.info('backfill_started', name=name)
+                while await db_mod.run_backfill_batch(db, name, batch_size=batch):
+                    state["backfills"] = await db_mod.fetch_backfill_progress(db)
+                    # Yield the write lock to jobs between chunks.
+                    await asyncio.sleep(pause)
+                log.info('backfill_finished', name=name)
+            state["backfills"] = await db_mod.fetch_backfill_progress(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning('backfill_error', err=str(e))
+        await asyncio.sleep(idle_sec)
+
+
+async def index_content_file(settings: Settings, storage: StorageClient, db, pool, task: ContentTask) -> str:
+    """Download one queued file, extract its text in the process pool and store it; returns the state."""
+    suffix = extract_mod.suffix_of(task.path)
+    max_bytes = int(getattr(settings, 'content_index_max_bytes', 0) or 0)
+    max_chars = max(1, int(getattr(settings, 'content_index_max_chars', 200_000) or 200_000))
+    timeout = max(1, int(getattr(settings, 'content_index_timeout_sec', 120) or 120))
+    body, error = "", None
+    if suffix not in extract_mod.SUPPORTED_SUFFIXES:
+        result = "skipped"
+    elif max_bytes > 0 and int(task.size_bytes or 0) > max_bytes:
+        result, error = "skipped", "too_large"
+    else:
+        result = "done"
+        try:
+            with tempfile.NamedTemporaryFile(prefix="adaspeas_text_", suffix=suffix, delete=True) as tmp:
+                size = 0
+                async for chunk in storage.stream_download(task.storage_path):
+                    size += len(chunk)
+                    if max_bytes > 0 and size > max_bytes:
+                        result, error = "skipped", "too_large"
+                        break
+                    tmp.write(chunk)
+                tmp.flush()
+                CONTENT_BYTES.inc(size)
+                if result == "done":
+                    t0 = time.perf_counter()
+                    body = await asyncio.wait_for(
+                        asyncio.get_running_loop().run_in_executor(
+                            pool, extract_mod.extract_text, tmp.name, suffix, max_chars
+                        ),
+                        timeout,
+                    )
+                    CONTENT_EXTRACT_SECONDS.observe(time.perf_counter() - t0)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            result, error = "failed", f"{type(e).__name__}: {e}"[:500]
+            if isinstance(e, asyncio.TimeoutError):
+                error = f"timeout: extraction took over {timeout}s"
+            if isinstance(e, (BrokenProcessPool, asyncio.TimeoutError)):
+                # The loop restarts the pool (a timed-out extractor keeps running in its process).
+                await db_mod.store_content(db, task, state=result, error=error)
+                raise
+    await db_mod.store_content(db, task, state=result, body=body, error=error)
+    CONTENT_FILES.labels(result=result).inc()
+    return result
+
+
+def _kill_pool(pool: ProcessPoolExecutor) -> None:
+    """Shut the pool down without waiting; its processes are terminated, a hung extraction included."""
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for proc in processes:
+        if proc.is_alive():
+            proc.terminate()
+
+
+async def content_index_loop(settings: Settings, storage: StorageClient, db, state: dict) -> None:
+    """Extract the text of new/changed files (the catalog_content queue filled by triggers on sync writes)."""
+    workers = max(1, int(getattr(settings, 'content_index_workers', 2) or 2))
+    batch = max(1, int(getattr(settings, 'content_index_batch_size', 20) or 20))
+    interval = max(1, int(getattr(settings, 'content_index_interval_sec', 60) or 60))
+    pool = ProcessPoolExecutor(max_workers=workers)
+    # Downloads overlap with extraction; at most `workers` files are in flight.
+    sem = asyncio.Semaphore(workers)
+
+    async def one(task: ContentTask) -> str:
+        async with sem:
+            return await index_content_file(settings, storage, db, pool, task)
+
+    try:
+        while True:
+            try:
+                tasks = await db_mod.fetch_content_pending(db, limit=batch)
+                if tasks:
+                    results = await asyncio.gather(*(one(t) for t in tasks), return_exceptions=True)
+                    if any(isinstance(res, (BrokenProcessPool, asyncio.TimeoutError)) for res in results):
+                        # An extractor process died (e.g. out of memory) or hung; the file counted a failed attempt.
+                        log.warning('content_index_pool_restarted')
+                        _kill_pool(pool)
+                        pool = ProcessPoolExecutor(max_workers=workers)
+                    CONTENT_PENDING.set(await db_mod.count_content_pending(db))
+                    continue
+                counts = await db_mod.count_content_states(db)
+                CONTENT_PENDING.set(counts.get("pending", 0))
+                state["content_index"] = counts
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning('content_index_error', err=str(e))
+            await asyncio.sleep(interval)
+    finally:
+        _kill_pool(pool)
+
+
+async def retention_pass(settings: Settings, db) -> dict[str, int]:
+    """Archive everything past the retention windows, one short write transaction per batch."""
+    batch = max(1, int(getattr(settings, 'retention_batch_size', 500) or 500))
+    windows = {
+        'download_audit': (int(getattr(settings, 'audit_retention_days', 0) or 0), db_mod.archive_download_audit_batch),
+        'jobs': (int(getattr(settings, 'jobs_retention_days', 0) or 0), db_mod.archive_jobs_batch),
+    }
+    moved: dict[str, int] = {}
+    # Audit first: jobs still referenced by audit rows are kept.
+    for table, (days, archive_batch) in windows.items():
+        if days <= 0:
+            continue
+        total = 0
+        while True:
+            n = await archive_batch(db, older_than_days=days, batch_size=batch)
+            total += n
+            RETENTION_ARCHIVED.labels(table=table).inc(n)
+            if n < batch:
+                break
+            # Let other writers take the WAL lock between batches.
+            await asyncio.sleep(0.05)
+        moved[table] = total
+    return moved
+
+
+async def retention_loop(settings: Settings, state: dict) -> None:
+    """Periodic retention on a dedicated connection (ATTACH needs one outside shared transactions)."""
+    interval = max(60, int(getattr(settings, 'retention_interval_sec', 3600) or 3600))
+    await asyncio.sleep(30)
+    db = None
+    try:
+        while True:
+            try:
+                if db is None:
+                    db = await db_mod.connect(settings.sqlite_path)
+                    await db_mod.attach_archive(db, settings.archive_sqlite_path)
+                state["retention"] = "running"
+                moved = await retention_pass(settings, db)
+                state["retention"] = "idle"
+                if any(moved.values()):
+                    log.info('retention_archived', **moved)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                state["retention"] = "error"
+                log.warning('retention_error', err=str(e))
+                if db is not None:
+                    try:
+                        await db.close()
+                    except Exception:
+                        pass
+                    db = None
+            await asyncio.sleep(interval)
+    finally:
+        if db is not None:
+            await db.close()
+
+
 async def process_one(settings: Settings, bot: Bot, storage: StorageClient, db, r, job_id: int, state: dict | None = None) -> str:
     job = await db_mod.fetch_job(db, job_id)
 
     # Skip if already terminal
-    if job["state"] in {"succeeded", "failed", "cancelled"}:
+    if job.state in {"succeeded", "failed", "cancelled"}:
         return "skipped"
 
-    job_type = (job.get('job_type') or 'download').strip().lower()
+    job_type = (job.job_type or 'download').strip().lower()
 
     await db_mod.set_job_state(db, job_id, "running")
     JOBS_RUNNING.inc()
@@ -323,26 +625,53 @@ async def process_one(settings: Settings, bot: Bot, storage: StorageClient, db,
         if job_type == 'sync_catalog':
             # Root path is stored in catalog_items.path for the root folder job.
             try:
-                root_item = await db_mod.fetch_catalog_item(db, job["catalog_item_id"])
-                root_path = str(root_item.get('path') or settings.yandex_base_path or '/')
+                root_item = await db_mod.fetch_catalog_item(db, job.catalog_item_id)
+                root_path = str(root_item.path or settings.yandex_base_path or '/')
             except Exception:
                 root_path = str(settings.yandex_base_path or '/')
 
             max_nodes = int(getattr(settings, 'catalog_sync_max_nodes', 5000) or 5000)
-            n, deleted = await sync_catalog(settings, storage, db, root_path, max_nodes=max_nodes)
+            n, deleted, pending = await sync_catalog(settings, storage, db, root_path, max_nodes=max_nodes)
+            changes = await publish_catalog_changes(db, r)
+            if pending > 0:
+                # Not finished: chain the next slice before this job turns terminal,
+                # so has_active_sync_job() never sees a gap.
+                next_id = await db_mod.insert_job(
+                    db,
+                    tg_chat_id=int(job.tg_chat_id),
+                    tg_user_id=int(job.tg_user_id),
+                    catalog_item_id=int(job.catalog_item_id),
+                    request_id=str(uuid.uuid4()),
+                    job_type='sync_catalog',
+                )
+                await enqueue(r, next_id)
+                JOB_ENQUEUE_TOTAL.inc()
+                await db_mod.set_job_state(db, job_id, "succeeded")
+                JOBS_SUCCEEDED.inc()
+                log.info('sync_slice_done', job_id=job_id, next_job_id=next_id, items=n, pending=pending)
+                result = "succeeded"
+                if state is not None:
+                    state["last_job_ok_at"] = _iso(datetime.now(timezone.utc).replace(microsecond=0))
+                    state["last_job_error"] = None
+                    state["last_job_error_at"] = None
+                return result
+
             ts = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+            # n is this slice only; the run may have been a chain of slice jobs.
+            total = int(await db_mod.get_meta(db, 'catalog_sync_run_items') or n)
             await db_mod.set_meta(db, 'catalog_last_sync_at', ts)
             await db_mod.set_meta(db, 'catalog_last_sync_deleted', str(deleted))
             # Optional: notify the requester (admin). Never fail the job because of Telegram send.
-            if int(job.get("tg_chat_id") or 0) > 0:
+            if int(job.tg_chat_id or 0) > 0:
                 try:
                     await _call_with_retry(
                         lambda: bot.send_message(
-                            chat_id=job["tg_chat_id"],
+                            chat_id=job.tg_chat_id,
                             text=(
                                 f"Синхронизация каталога завершена.\n"
-                                f"Обработано: {n}.\n"
+                                f"Обработано: {total}.\n"
                                 f"Удалено (soft-delete): {deleted}.\n"
+                                f"Изменения (последний срез): +{changes.get('added', 0)} ~{changes.get('updated', 0)} -{changes.get('removed', 0)}.\n"
                                 f"Обновлено: {ts}"
                             ),
                         ),
@@ -354,7 +683,7 @@ async def process_one(settings: Settings, bot: Bot, storage: StorageClient, db,
 
             await db_mod.set_job_state(db, job_id, "succeeded")
             JOBS_SUCCEEDED.inc()
-            log.info('job_succeeded', job_id=job_id, mode='sync_catalog', items=n, deleted=deleted)
+            log.info('job_succeeded', job_id=job_id, mode='sync_catalog', items=total, deleted=deleted)
             result = "succeeded"
             if state is not None:
                 ok_at = _iso(datetime.now(timezone.utc).replace(microsecond=0))
@@ -364,19 +693,28 @@ async def process_one(settings: Settings, bot: Bot, storage: StorageClient, db,
             return result
 
         # Default: download job
-        item = await db_mod.fetch_catalog_item(db, job["catalog_item_id"])
-        if item["kind"] != "file":
+        item = await db_mod.fetch_catalog_item(db, job.catalog_item_id)
+        if item.kind != "file":
             raise RuntimeError("catalog item is not a file")
 
         # Download to a temporary file (spool). Deleted immediately after send.
         # Fast-path: if Telegram file_id is cached, send without re-downloading.
-        if item.get("tg_file_id"):
+        # The cache is per item and, when the content hash is known, shared by all copies of the content.
+        ckey = db_mod.content_key(item)
+        cached_file_id = item.tg_file_id
+        cached_mode = "tg_file_id"
+        if not cached_file_id and ckey:
+            hit = await db_mod.fetch_tg_file_by_content(db, ckey)
+            if hit:
+                cached_file_id = hit[0]
+                cached_mode = "content_hash"
+        if cached_file_id:
             try:
                 msg = await _call_with_retry(
                     lambda: bot.send_document(
-                        chat_id=job["tg_chat_id"],
-                        document=item["tg_file_id"],
-                        caption=item["title"],
+                        chat_id=job.tg_chat_id,
+                        document=cached_file_id,
+                        caption=item.title,
                     ),
                     attempts=attempts,
                     max_wait_sec=max_wait_sec,
@@ -385,23 +723,32 @@ async def process_one(settings: Settings, bot: Bot, storage: StorageClient, db,
                 if getattr(msg, "document", None):
                     await db_mod.set_catalog_item_tg_file(
                         db,
-                        item_id=item["id"],
+                        item_id=item.id,
                         tg_file_id=msg.document.file_id,
                         tg_file_unique_id=getattr(msg.document, "file_unique_id", None),
                     )
+                    if ckey:
+                        await db_mod.set_tg_file_by_content(
+                            db,
+                            ckey,
+                            msg.document.file_id,
+                            getattr(msg.document, "file_unique_id", None),
+                        )
                 await db_mod.set_job_state(db, job_id, "succeeded")
                 JOBS_SUCCEEDED.inc()
-                log.info("job_succeeded", job_id=job_id, mode="tg_file_id")
+                if cached_mode == "content_hash":
+                    UPLOADS_DEDUPLICATED.inc()
+                log.info("job_succeeded", job_id=job_id, mode=cached_mode)
                 try:
                     await db_mod.insert_download_audit(
                         db,
                         job_id=job_id,
-                        tg_chat_id=int(job["tg_chat_id"]),
-                        tg_user_id=int(job["tg_user_id"]),
-                        catalog_item_id=int(job["catalog_item_id"]),
+                        tg_chat_id=int(job.tg_chat_id),
+                        tg_user_id=int(job.tg_user_id),
+                        catalog_item_id=int(job.catalog_item_id),
                         result="succeeded",
-                        mode="tg_file_id",
-                        bytes_sent=int(item.get("size_bytes") or 0) or None,
+                        mode=cached_mode,
+                        bytes_sent=int(item.size_bytes or 0) or None,
                         error=None,
                     )
                 except Exception:
@@ -415,14 +762,16 @@ async def process_one(settings: Settings, bot: Bot, storage: StorageClient, db,
                 return result
             except Exception as e:
                 # If cached file_id became invalid, drop it and retry via download/upload.
-                log.warning("tg_file_id_failed", job_id=job_id, err=str(e))
-                await db_mod.set_catalog_item_tg_file(db, item_id=item["id"], tg_file_id=None, tg_file_unique_id=None)
+                log.warning("tg_file_id_failed", job_id=job_id, mode=cached_mode, err=str(e))
+                await db_mod.set_catalog_item_tg_file(db, item_id=item.id, tg_file_id=None, tg_file_unique_id=None)
+                if ckey:
+                    await db_mod.drop_tg_file_by_content(db, ckey, cached_file_id)
 
         with tempfile.NamedTemporaryFile(prefix="adaspeas_", suffix=".bin", delete=True) as tmp:
             async def _download_to_tmp() -> None:
                 tmp.seek(0)
                 tmp.truncate(0)
-                async for chunk in storage.stream_download(item["yandex_id"]):
+                async for chunk in storage.stream_download(item.yandex_id):
                     tmp.write(chunk)
                 tmp.flush()
 
@@ -430,9 +779,9 @@ async def process_one(settings: Settings, bot: Bot, storage: StorageClient, db,
 
             msg = await _call_with_retry(
                 lambda: bot.send_document(
-                    chat_id=job["tg_chat_id"],
+                    chat_id=job.tg_chat_id,
                     document=FSInputFile(tmp.name),
-                    caption=item["title"],
+                    caption=item.title,
                 ),
                 attempts=attempts,
                 max_wait_sec=max_wait_sec,
@@ -440,10 +789,17 @@ async def process_one(settings: Settings, bot: Bot, storage: StorageClient, db,
             if getattr(msg, "document", None):
                 await db_mod.set_catalog_item_tg_file(
                     db,
-                    item_id=item["id"],
+                    item_id=item.id,
                     tg_file_id=msg.document.file_id,
                     tg_file_unique_id=getattr(msg.document, "file_unique_id", None),
                 )
+                if ckey:
+                    await db_mod.set_tg_file_by_content(
+                        db,
+                        ckey,
+                        msg.document.file_id,
+                        getattr(msg.document, "file_unique_id", None),
+                    )
 
         await db_mod.set_job_state(db, job_id, "succeeded")
         JOBS_SUCCEEDED.inc()
@@ -451,12 +807,12 @@ async def process_one(settings: Settings, bot: Bot, storage: StorageClient, db,
             await db_mod.insert_download_audit(
                 db,
                 job_id=job_id,
-                tg_chat_id=int(job["tg_chat_id"]),
-                tg_user_id=int(job["tg_user_id"]),
-                catalog_item_id=int(job["catalog_item_id"]),
+                tg_chat_id=int(job.tg_chat_id),
+                tg_user_id=int(job.tg_user_id),
+                catalog_item_id=int(job.catalog_item_id),
                 result="succeeded",
                 mode="upload",
-                bytes_sent=int(item.get("size_bytes") or 0) or None,
+                bytes_sent=int(item.size_bytes or 0) or None,
                 error=None,
             )
         except Exception:
@@ -490,12 +846,12 @@ async def process_one(settings: Settings, bot: Bot, storage: StorageClient, db,
                     await db_mod.insert_download_audit(
                         db,
                         job_id=job_id,
-                        tg_chat_id=int(job["tg_chat_id"]),
-                        tg_user_id=int(job["tg_user_id"]),
-                        catalog_item_id=int(job["catalog_item_id"]),
+                        tg_chat_id=int(job.tg_chat_id),
+                        tg_user_id=int(job.tg_user_id),
+                        catalog_item_id=int(job.catalog_item_id),
                         result="failed",
                         mode=None,
-                        bytes_sent=int(item.get("size_bytes") or 0) if "item" in locals() else None,
+                        bytes_sent=int(item.size_bytes or 0) if "item" in locals() else None,
                         error=err,
                     )
                 except Exception:
@@ -503,13 +859,13 @@ async def process_one(settings: Settings, bot: Bot, storage: StorageClient, db,
                 await notify_user(
                     bot,
                     settings,
-                    int(job.get("tg_chat_id") or job.get("tg_user_id") or 0),
+                    int(job.tg_chat_id or job.tg_user_id or 0),
                     f"❌ Не удалось отправить файл (задача #{job_id}). Сообщение: {err}",
                 )
                 await notify_admins(
                     bot,
                     settings,
-                    f"❌ Ошибка доставки файла: job=#{job_id}, user_id={job.get('tg_user_id')}, item_id={job.get('catalog_item_id')}. err={err}",
+                    f"❌ Ошибка доставки файла: job=#{job_id}, user_id={job.tg_user_id}, item_id={job.catalog_item_id}. err={err}",
                 )
             elif job_type == "sync_catalog":
                 await notify_admins(
@@ -547,10 +903,51 @@ async def worker_loop(settings: Settings, state: dict) -> None:
     db = await _init_db_with_retry(settings, state)
     r = await _init_redis_with_retry(settings, state)
 
+    # Sync jobs interrupted by a restart resume from the persisted frontier.
+    try:
+        for stale_id in await db_mod.requeue_running_sync_jobs(db):
+            await enqueue(r, stale_id)
+            log.info('sync_job_requeued', job_id=stale_id)
+    except Exception as e:
+        log.warning('sync_requeue_failed', err=str(e))
+
+    # The catalog root row: the bot's navigation is read-only and relies on it (sync maintains the rest).
+    try:
+        storage_mode = (getattr(settings, 'storage_mode', 'yandex') or 'yandex').strip().lower()
+        root_path = (getattr(settings, 'yandex_base_path', '/') or '/').strip() if storage_mode != 'local' else '/'
+        root_path = root_path or '/'
+        if await db_mod.fetch_catalog_item_by_path(db, root_path) is None:
+            await db_mod.upsert_catalog_item(
+                db,
+                path=root_path,
+                kind='folder',
+                title='Каталог',
+                yandex_id=root_path,
+                parent_path=None,
+            )
+    except Exception as e:
+        log.warning('catalog_root_init_failed', err=str(e))
+
+    # Data backfills registered by migrations run in the background; jobs are served meanwhile.
+    backfill_task = asyncio.create_task(backfill_loop(settings, db, state), name='backfills')
+
     scheduler_task: asyncio.Task | None = None
     if int(getattr(settings, 'catalog_sync_interval_sec', 0) or 0) > 0:
         scheduler_task = asyncio.create_task(periodic_sync_scheduler(settings, db, r), name='periodic_sync')
 
+    watch_task: asyncio.Task | None = None
+    storage_mode = (getattr(settings, 'storage_mode', 'yandex') or 'yandex').strip().lower()
+    if storage_mode == 'local' and int(getattr(settings, 'local_watch_enabled', 1) or 0):
+        watch_task = asyncio.create_task(local_watch_loop(settings, db, lambda: r, state), name='local_watch')
+
+    retention_task: asyncio.Task | None = None
+    if int(getattr(settings, 'jobs_retention_days', 0) or 0) > 0 or int(getattr(settings, 'audit_retention_days', 0) or 0) > 0:
+        retention_task = asyncio.create_task(retention_loop(settings, state), name='retention')
+
+    content_task: asyncio.Task | None = None
+    if int(getattr(settings, 'content_index_enabled', 0) or 0):
+        content_task = asyncio.create_task(content_index_loop(settings, storage, db, state), name='content_index')
+
     state["worker"] = "running"
 
     try:
@@ -581,11 +978,13 @@ async def worker_loop(settings: Settings, state: dict) -> None:
                 continue
             await process_one(settings, bot, storage, db, r, job_id, state=state)
     finally:
-        if scheduler_task is not None:
-            scheduler_task.cancel()
+        for task in (scheduler_task, watch_task, retention_task, backfill_task, content_task):
+            if task is None:
+                continue
+            task.cancel()
             try:
-                await scheduler_task
-            except Exception:
+                await task
+            except (asyncio.CancelledError, Exception):
                 pass
         try:
             await storage.close()
@@ -626,6 +1025,7 @@ async def main() -> None:
         "last_job_ok_at": None,
         "last_job_error": None,
         "last_job_error_at": None,
+        "local_watch": "off",
     }
 
     app = await make_app(state)
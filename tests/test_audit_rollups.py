@@ -0,0 +1,91 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+
+
+async def _raw_counts(db, minutes: int) -> dict[str, int]:
+    cur = await db.execute(
+        "SELECT result, COUNT(*) FROM download_audit WHERE created_at >= datetime('now', ?) GROUP BY result",
+        (f"-{minutes} minutes",),
+    )
+    out = {"succeeded": 0, "failed": 0}
+    out.update({str(r[0]): int(r[1]) for r in await cur.fetchall()})
+    return out
+
+
+async def _raw_top(db, minutes: int) -> list[tuple[int, int]]:
+    cur = await db.execute(
+        """
+        SELECT catalog_item_id, COUNT(*) AS cnt FROM download_audit
+        WHERE created_at >= datetime('now', ?) AND result='succeeded'
+        GROUP BY catalog_item_id ORDER BY cnt DESC, catalog_item_id ASC
+        """,
+        (f"-{minutes} minutes",),
+    )
+    return [(int(r[0]), int(r[1])) for r in await cur.fetchall()]
+
+
+@pytest.mark.asyncio
+async def test_stats_from_rollups_match_raw_audit():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            items = [
+                await db_mod.upsert_catalog_item(db, path=f"/f{i}.pdf", kind="file", title=f"f{i}", parent_path="/")
+                for i in range(3)
+            ]
+            for n in range(120):
+                item = items[n % 3 if n % 4 else 0]
+                job_id = await db_mod.insert_job(db, 1, 100 + n % 5, item, request_id=f"r{n}")
+                await db.execute(
+                    """
+                    INSERT INTO download_audit(created_at, job_id, tg_chat_id, tg_user_id, catalog_item_id, result, bytes)
+                    VALUES (datetime('now', ?), ?, 1, ?, ?, ?, 10)
+                    """,
+                    (f"-{n * 37} minutes", job_id, 100 + n % 5, item, "failed" if n % 7 == 0 else "succeeded"),
+                )
+            await db.commit()
+
+            windows = [1, 30, 59, 60, 61, 90, 24 * 60, 36 * 60 + 7, 7 * 24 * 60]
+            for minutes in windows:
+                assert await db_mod.count_download_audit_since(db, since_minutes=minutes) == await _raw_counts(db, minutes)
+                top = await db_mod.top_downloads_since(db, since_minutes=minutes, limit=10)
+                assert [(r["catalog_item_id"], r["count"]) for r in top] == await _raw_top(db, minutes)
+
+            assert await db_mod.count_active_downloaders(db, days=1) >= 1
+            assert await db_mod.count_active_downloaders(db, days=7) == 5
+
+            # Rollups are history: raw audit can be pruned without changing the stats.
+            before = await db_mod.count_download_audit_since(db, since_minutes=7 * 24 * 60)
+            await db.execute("DELETE FROM download_audit WHERE created_at < datetime('now', '-2 hours')")
+            await db.commit()
+            assert await db_mod.count_download_audit_since(db, since_minutes=7 * 24 * 60) == before
+
+            # The migration queues a background rollup of existing audit rows.
+            await db.execute("DELETE FROM download_audit_hourly")
+            await db.execute("DELETE FROM download_audit_daily_users")
+            await db.execute("DELETE FROM schema_backfills WHERE name='audit_rollups'")
+            await db.execute("UPDATE schema_version SET version=18")
+            await db.commit()
+            await db_mod.ensure_schema(db)
+            assert "audit_rollups" in await db_mod.pending_backfills(db)
+            assert await db_mod.archive_download_audit_batch(db, older_than_days=0) == 0
+            assert await db_mod.run_backfill_batch(db, "audit_rollups", batch_size=2)
+            # A download logged mid-backfill is counted once, by the backfill.
+            job_id = await db_mod.insert_job(db, 1, 101, items[0], request_id="late")
+            await db_mod.insert_download_audit(
+                db, job_id=job_id, tg_chat_id=1, tg_user_id=101, catalog_item_id=items[0], result="succeeded"
+            )
+            while await db_mod.run_backfill_batch(db, "audit_rollups", batch_size=2):
+                pass
+            for minutes in (60, 90, 24 * 60):
+                assert await db_mod.count_download_audit_since(db, since_minutes=minutes) == await _raw_counts(db, minutes)
+        finally:
+            await db.close()
@@ -0,0 +1,106 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+
+
+async def _fts_rows(db) -> set[tuple[int, str, str]]:
+    cur = await db.execute("SELECT rowid, title, path FROM catalog_items_fts")
+    return {(int(r[0]), str(r[1]), str(r[2])) for r in await cur.fetchall()}
+
+
+async def _fts_hits(db, query: str) -> set[int]:
+    cur = await db.execute("SELECT rowid FROM catalog_items_fts WHERE catalog_items_fts MATCH ?", (query,))
+    return {int(r[0]) for r in await cur.fetchall()}
+
+
+async def _catalog_rows(db) -> set[tuple[int, str, str]]:
+    cur = await db.execute("SELECT id, title, path FROM catalog_items")
+    return {(int(r[0]), str(r[1]), str(r[2])) for r in await cur.fetchall()}
+
+
+@pytest.mark.asyncio
+async def test_chunked_fts_rebuild_tracks_concurrent_writes():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            # Folder totals are queued by the migration instead of running at worker start.
+            assert await db_mod.pending_backfills(db) == ["folder_totals", "content_queue"]
+            for name in await db_mod.pending_backfills(db):
+                while await db_mod.run_backfill_batch(db, name):
+                    pass
+            assert (await db_mod.fetch_backfill_progress(db))["folder_totals"] == "done"
+
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            ids = [
+                await up(db, path=f"/doc{i}.pdf", kind="file", title=f"manual {i}", parent_path="/")
+                for i in range(20)
+            ]
+
+            await db_mod.request_backfill(db, "catalog_fts")
+            assert await db_mod.pending_backfills(db) == ["catalog_fts"]
+            progress = await db_mod.fetch_backfill_progress(db)
+            assert progress.pop("catalog_fts") == "0/21"
+            assert set(progress.values()) == {"done"}
+
+            assert await db_mod.run_backfill_batch(db, "catalog_fts", batch_size=6)
+            # Writes on both sides of the cursor while the rebuild is in flight.
+            await db.execute("UPDATE catalog_items SET title='guide 1' WHERE id=?", (ids[1],))
+            await db.execute("UPDATE catalog_items SET title='guide 15' WHERE id=?", (ids[15],))
+            await db.execute("DELETE FROM catalog_items WHERE id IN (?, ?)", (ids[2], ids[16]))
+            await db.commit()
+            await up(db, path="/late.pdf", kind="file", title="guide late", parent_path="/")
+
+            batches = 1
+            while await db_mod.run_backfill_batch(db, "catalog_fts", batch_size=6):
+                batches += 1
+            assert batches >= 3
+            assert await db_mod.pending_backfills(db) == []
+            assert (await db_mod.fetch_backfill_progress(db))["catalog_fts"] == "done"
+
+            assert await _fts_rows(db) == await _catalog_rows(db)
+            hits, _ = await db_mod.search_catalog_items(db, query="guide", scope_path="/", limit=10)
+            assert sorted(h.path for h in hits) == ["/doc1.pdf", "/doc15.pdf", "/late.pdf"]
+
+            # Done: triggers keep the index current again.
+            await db.execute("UPDATE catalog_items SET title='guide 3' WHERE id=?", (ids[3],))
+            await db.commit()
+            assert await _fts_rows(db) == await _catalog_rows(db)
+        finally:
+            await db.close()
+
+
+@pytest.mark.asyncio
+async def test_v8_queues_fts_backfill_instead_of_rebuild():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            assert (await db_mod.fetch_backfill_progress(db))["catalog_fts"] == "done"
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            for i in range(5):
+                await up(db, path=f"/doc{i}.pdf", kind="file", title=f"manual {i}", parent_path="/")
+
+            # A database from before v8: the migration leaves existing rows to the worker.
+            for table in ("catalog_items_fts", "catalog_items_trgm", "catalog_items_vocab"):
+                await db.execute(f"DROP TABLE {table}")
+            await db.execute("DELETE FROM schema_backfills WHERE name='catalog_fts'")
+            await db.execute("UPDATE schema_version SET version=7")
+            await db.commit()
+            await db_mod.ensure_schema(db)
+            assert await _fts_hits(db, "manual") == set()
+            assert "catalog_fts" in await db_mod.pending_backfills(db)
+
+            while await db_mod.run_backfill_batch(db, "catalog_fts", batch_size=2):
+                pass
+            assert len(await _fts_hits(db, "manual")) == 5
+        finally:
+            await db.close()
@@ -0,0 +1,92 @@
+import os
+import sys
+import tempfile
+
+import pytest
+from prometheus_client import CollectorRegistry, Counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+from adaspeas.common.cache import TTLCache, get_or_build
+
+
+def test_ttl_cache_lru_and_expiry():
+    now = [0.0]
+    cache: TTLCache[str, int] = TTLCache(2, 10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None and len(cache) == 2
+    now[0] = 9.9
+    assert cache.get("a") == 1
+    now[0] = 10.0
+    assert cache.get("a") is None and cache.get("c") is None and len(cache) == 0
+    assert (cache.hits, cache.misses) == (2, 3)
+
+    off: TTLCache[str, int] = TTLCache(0, 10)
+    off.set("a", 1)
+    assert off.get("a") is None
+
+
+
+@pytest.mark.asyncio
+async def test_get_or_build_keys_on_version():
+    registry = CollectorRegistry()
+    counter = Counter("cache_total", "lookups", ["result"], registry=registry)
+    cache: TTLCache[tuple, str] = TTLCache(10, 60)
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return f"page{len(builds)}"
+
+    def counts():
+        return tuple(registry.get_sample_value("cache_total", {"result": r}) or 0 for r in ("hit", "miss"))
+
+    key = ("/docs", 0, 1, None, None, False)
+    assert await get_or_build(cache, key, build, version=5, counter=counter) == "page1"
+    assert await get_or_build(cache, key, build, version=5, counter=counter) == "page1"
+    assert counts() == (1, 1) and cache.get((*key, 5)) == "page1"
+    # Another version or another key part (admin view) is a different entry.
+    assert await get_or_build(cache, key, build, version=6, counter=counter) == "page2"
+    assert await get_or_build(cache, key[:-1] + (True,), build, version=6, counter=counter) == "page3"
+    assert counts() == (1, 3)
+
+    # No version: always built, never stored or counted.
+    assert await get_or_build(cache, key, build, version=None, counter=counter) == "page4"
+    assert await get_or_build(cache, key, build, version=None, counter=counter) == "page5"
+    assert counts() == (1, 3) and len(cache) == 3
+
+    # keep() vetoes storing a result built from lagging data.
+    assert await get_or_build(cache, key, build, version=7, counter=counter, keep=lambda: False) == "page6"
+    assert await get_or_build(cache, key, build, version=7, counter=counter) == "page7"
+    assert await get_or_build(cache, key, build, version=7, counter=counter) == "page7"
+    assert counts() == (2, 5)
+
+@pytest.mark.asyncio
+async def test_cached_search_ids_page_by_primary_key():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            for i in range(9):
+                await up(db, path=f"/r{i}.pdf", kind="file", title=f"report {i % 3}", parent_path="/")
+
+            ranked, more = await db_mod.search_catalog_items_page(db, query="report", scope_path="/", limit=100)
+            ids = [it.id for it in ranked]
+            assert not more and len(ids) == 9
+
+            page = await db_mod.fetch_catalog_entries(db, ids[3:6])
+            assert page == ranked[3:6]
+
+            # Rows deleted since the ids were cached drop out of the page.
+            await db.execute("UPDATE catalog_items SET is_deleted=1 WHERE id=?", (ids[4],))
+            await db.commit()
+            assert [it.id for it in await db_mod.fetch_catalog_entries(db, ids[3:6])] == [ids[3], ids[5]]
+            assert await db_mod.fetch_catalog_entries(db, []) == []
+        finally:
+            await db.close()
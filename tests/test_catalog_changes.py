@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+from adaspeas.common.queue import listen_catalog_versions
+
+
+@pytest.mark.asyncio
+async def test_change_feed_versions_and_kinds():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        await db_mod.ensure_schema(db)
+        assert await db_mod.get_catalog_version(db) == 0
+
+        a = await db_mod.upsert_catalog_item(db, path="/a", kind="file", title="A", parent_path="/", size_bytes=1)
+        b = await db_mod.upsert_catalog_item(db, path="/b", kind="file", title="B", parent_path="/", size_bytes=1)
+        # Added and then updated inside one version stays "added".
+        await db_mod.upsert_catalog_item(db, path="/b", kind="file", title="B2", parent_path="/", size_bytes=1)
+        v1, counts = await db_mod.commit_catalog_version(db)
+        assert v1 == 1 and counts == {"added": 2}
+
+        # Re-upserting identical data (a sync touching every row) is not a change.
+        await db_mod.upsert_catalog_item(db, path="/a", kind="file", title="A", parent_path="/", size_bytes=1, sync_generation=5)
+        assert await db_mod.commit_catalog_version(db) == (1, {})
+
+        await db_mod.upsert_catalog_item(db, path="/a", kind="file", title="A", parent_path="/", size_bytes=2)
+        await db_mod.mark_deleted_before_generation(db, "/", 1)
+        v2, counts = await db_mod.commit_catalog_version(db)
+        assert v2 == 2 and counts == {"updated": 1, "removed": 1}
+        assert await db_mod.fetch_catalog_changes(db, 1) == [(2, a, "updated"), (2, b, "removed")]
+        assert [c[1] for c in await db_mod.fetch_catalog_changes(db, 0)] == [a, b, a, b]
+
+        await db.close()
+
+
+class _FakePubSub:
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.subscribed = False
+
+    async def subscribe(self, channel):
+        self.subscribed = True
+
+    async def get_message(self, *, ignore_subscribe_messages, timeout):
+        assert self.subscribed
+        if self.messages:
+            return self.messages.pop(0)
+        await asyncio.sleep(timeout)
+        return None
+
+    async def unsubscribe(self, channel):
+        self.subscribed = False
+
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_version_listener_reconciles_after_subscribing_and_periodically():
+    pubsub = _FakePubSub([{"type": "message", "data": "7"}, {"type": "message", "data": "junk"}])
+    r = type("R", (), {"pubsub": lambda self: pubsub})()
+    got = []
+    async for version in listen_catalog_versions(r, reconcile_sec=0.05):
+        # The first None comes once subscribed: reading the stored version then cannot miss a publish.
+        assert pubsub.subscribed
+        got.append(version)
+        if len(got) == 4:
+            break
+    assert got == [None, 7, None, None]
@@ -0,0 +1,136 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+
+
+async def _parents(db) -> dict[str, str | None]:
+    cur = await db.execute(
+        "SELECT c.path, p.path FROM catalog_items c LEFT JOIN catalog_items p ON p.id = c.parent_id"
+    )
+    return {str(r[0]): r[1] for r in await cur.fetchall()}
+
+
+@pytest.mark.asyncio
+async def test_parent_id_backfill_triggers_and_orphans():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            await up(db, path="/a", kind="folder", title="a", parent_path="/")
+            await up(db, path="/a/1.pdf", kind="file", title="1", parent_path="/a")
+            # Child written before its folder: served by parent_path, adopted once the folder appears.
+            await up(db, path="/b/2.pdf", kind="file", title="2", parent_path="/b")
+            assert [c.path for c in await db_mod.fetch_children(db, "/b")] == ["/b/2.pdf"]
+            assert (await _parents(db))["/b/2.pdf"] is None
+            await up(db, path="/b", kind="folder", title="b", parent_path="/")
+
+            expected = {"/": None, "/a": "/", "/a/1.pdf": "/a", "/b": "/", "/b/2.pdf": "/b"}
+            assert await _parents(db) == expected
+            assert [c.path for c in await db_mod.fetch_children(db, "/")] == ["/a", "/b"]
+            assert await db_mod.count_children(db, "/b") == 1
+
+            # Re-running v17 on a pre-v17 database queues a background fill of parent_id from parent_path.
+            await db.execute("UPDATE catalog_items SET parent_id=NULL")
+            await db.execute("DELETE FROM schema_backfills WHERE name='catalog_parent_id'")
+            await db.execute("UPDATE schema_version SET version=16")
+            await db.commit()
+            await db_mod.ensure_schema(db)
+            assert "catalog_parent_id" in await db_mod.pending_backfills(db)
+            while await db_mod.run_backfill_batch(db, "catalog_parent_id", batch_size=2):
+                pass
+            assert await _parents(db) == expected
+
+            cur = await db.execute("SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='catalog_items'")
+            names = {r[0] for r in await cur.fetchall()}
+            assert {"idx_catalog_children", "idx_catalog_orphans"} <= names
+            assert not names & {"idx_catalog_parent_path", "idx_catalog_deleted_parent", "idx_catalog_children_seek"}
+
+            cur = await db.execute(
+                "EXPLAIN QUERY PLAN SELECT COUNT(*) FROM catalog_items WHERE parent_id=? AND is_deleted=0", (1,)
+            )
+            assert "COVERING INDEX idx_catalog_children" in " ".join(str(r[-1]) for r in await cur.fetchall())
+        finally:
+            await db.close()
+
+
+async def _closure(db) -> set[tuple[str, str, int]]:
+    cur = await db.execute(
+        """
+        SELECT a.path, d.path, t.depth FROM catalog_tree t
+        JOIN catalog_items a ON a.id = t.ancestor_id
+        JOIN catalog_items d ON d.id = t.descendant_id
+        """
+    )
+    return {(str(r[0]), str(r[1]), int(r[2])) for r in await cur.fetchall()}
+
+
+@pytest.mark.asyncio
+async def test_closure_table_scopes_subtrees():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            await up(db, path="/a", kind="folder", title="a", parent_path="/")
+            await up(db, path="/a/report.pdf", kind="file", title="report", parent_path="/a")
+            # Orphan subtree: linked into the closure when "/b" appears.
+            await up(db, path="/b/c/report.pdf", kind="file", title="report", parent_path="/b/c")
+            await up(db, path="/b/c", kind="folder", title="c", parent_path="/b")
+            await up(db, path="/b", kind="folder", title="b", parent_path="/")
+            await up(db, path="/b_x", kind="folder", title="report", parent_path="/")
+
+            closure = await _closure(db)
+            assert ("/", "/b/c/report.pdf", 3) in closure
+            assert ("/b", "/b/c/report.pdf", 2) in closure
+            assert ("/a", "/b/c/report.pdf", 1) not in closure
+
+            # A rebuild from scratch (migration backfill) yields the same closure.
+            await db.execute("DELETE FROM catalog_tree")
+            await db.execute("DELETE FROM schema_backfills WHERE name='catalog_tree'")
+            await db.execute("UPDATE schema_version SET version=17")
+            await db.commit()
+            await db_mod.ensure_schema(db)
+            assert "catalog_tree" in await db_mod.pending_backfills(db)
+            assert await db_mod.run_backfill_batch(db, "catalog_tree", batch_size=3)
+            # A move behind the cursor restarts the backfill: rows it wrote may now be stale.
+            await db.execute("UPDATE catalog_items SET parent_path='/a' WHERE path='/b/c'")
+            await db.execute("UPDATE catalog_items SET parent_path='/b' WHERE path='/b/c'")
+            await db.commit()
+            assert (await db_mod.fetch_backfill_progress(db))["catalog_tree"].startswith("0/")
+            while await db_mod.run_backfill_batch(db, "catalog_tree", batch_size=3):
+                pass
+            assert await _closure(db) == closure
+
+            async def search(scope, query="report"):
+                items, _ = await db_mod.search_catalog_items_page(db, query=query, scope_path=scope, limit=10)
+                return sorted(it.path for it in items)
+
+            assert await search("/") == ["/a/report.pdf", "/b/c/report.pdf", "/b_x"]
+            # No word starts with "port": the substring is served by the trigram index.
+            assert await search("/", "port") == ["/a/report.pdf", "/b/c/report.pdf", "/b_x"]
+            assert await search("/b", "port") == ["/b/c/report.pdf"]
+            assert await search("/b") == ["/b/c/report.pdf"]
+            assert await search("/b/c") == ["/b/c/report.pdf"]
+
+            # Subtree soft-delete is driven by the closure range ("/b_x" shares the prefix, not the subtree).
+            assert await db_mod.apply_local_folder(db, folder_path="/b", items=None, generation=1) == (0, 3)
+            assert await search("/") == ["/a/report.pdf", "/b_x"]
+
+            cur = await db.execute(
+                "EXPLAIN QUERY PLAN UPDATE catalog_items SET is_deleted=1 "
+                "WHERE id IN (SELECT descendant_id FROM catalog_tree WHERE ancestor_id=? AND depth>=0) AND +is_deleted=0",
+                (1,),
+            )
+            plan = " ".join(str(r[-1]) for r in await cur.fetchall())
+            assert "INTEGER PRIMARY KEY" in plan and "SCAN catalog_items" not in plan
+        finally:
+            await db.close()
@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.bot.catalog_tree import load_catalog_tree
+from adaspeas.common import db as db_mod
+
+
+@pytest.mark.asyncio
+async def test_tree_pages_match_sqlite():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            # Duplicate and mixed-case/Cyrillic titles exercise the sort order and the id tie-breaker.
+            titles = ["report", "Report", "Отчёт", "отчёт", "a", "Z"]
+            for i in range(7):
+                await up(db, path=f"/d{i}", kind="folder", title=titles[i % len(titles)], parent_path="/")
+            for i in range(13):
+                await up(db, path=f"/f{i}.pdf", kind="file", title=titles[i % 4], parent_path="/", size_bytes=i + 1)
+            await up(db, path="/d0/inner.pdf", kind="file", title="inner", parent_path="/d0", size_bytes=100)
+            await up(db, path="/gone.pdf", kind="file", title="gone", parent_path="/")
+            await db.execute("UPDATE catalog_items SET is_deleted=1 WHERE path='/gone.pdf'")
+            await db.commit()
+            await db_mod.refresh_folder_totals(db)
+
+            tree = await load_catalog_tree(db, max_items=100, version=7)
+            assert tree is not None and len(tree) == 22 and tree.version == 7
+            assert tree.nbytes > 0
+            root, d0 = tree.folder("/"), tree.folder("/d0")
+            assert tree.folder("/f0.pdf") is None and tree.folder("/gone.pdf") is None
+            item = await db_mod.fetch_catalog_item_by_path(db, "/d0")
+            assert (d0.id, d0.kind, d0.title, d0.path) == (item.id, item.kind, item.title, item.path)
+            assert tree.child_count(root.id) == (await db_mod.fetch_folder_stats(db, "/")).child_count == 20
+            assert tree.folder_size(d0.id) == 100
+            assert tree.folder_size(root.id) == sum(range(1, 14)) + 100
+
+            full = await db_mod.fetch_children(db, "/", limit=100)
+            assert tree.children_page(root.id, limit=100) == (full, False)
+            assert tree.children_page(root.id, limit=6, offset=6)[0] == full[6:12]
+
+            # Same cursors, same pages, forward and back.
+            after = None
+            while True:
+                page = tree.children_page(root.id, limit=6, after_id=after)
+                assert page == await db_mod.fetch_children_page(db, "/", limit=6, after_id=after)
+                if not page[1]:
+                    break
+                after = page[0][-1].id
+            before = page[0][0].id
+            while True:
+                page = tree.children_page(root.id, limit=6, before_id=before)
+                assert page == await db_mod.fetch_children_page(db, "/", limit=6, before_id=before)
+                if not page[1]:
+                    break
+                before = page[0][0].id
+            # Unknown cursor: first page.
+            assert tree.children_page(root.id, limit=6, after_id=10**9) == (full[:6], True)
+            assert tree.children_page(tree.get(full[-1].id).id, limit=6) == ([], False)
+
+            # Over the cap: not loaded at all.
+            assert await load_catalog_tree(db, max_items=21, version=7) is None
+            assert await load_catalog_tree(db, max_items=0, version=7) is None
+        finally:
+            await db.close()
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+from adaspeas.common.settings import Settings
+from adaspeas.worker import main as worker_mod
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent: list[object] = []
+
+    async def send_document(self, chat_id, document, caption=None):
+        self.sent.append(document)
+        fid = document if isinstance(document, str) else f"file-{len(self.sent)}"
+        return SimpleNamespace(document=SimpleNamespace(file_id=fid, file_unique_id="u-" + fid))
+
+
+class FakeStorage:
+    async def stream_download(self, path: str, chunk_size: int = 1024 * 1024):
+        yield b"same bytes"
+
+
+class FakeRedis:
+    async def rpush(self, *_args):
+        return 1
+
+
+@pytest.mark.asyncio
+async def test_duplicate_content_reuses_upload_and_change_invalidates():
+    settings = Settings(bot_token="x", admin_user_ids="", net_retry_attempts=1)
+    bot = FakeBot()
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        await db_mod.ensure_schema(db)
+
+        a = await db_mod.upsert_catalog_item(db, path="/x/a.pdf", kind="file", title="a", parent_path="/x", size_bytes=10, content_sha256="AB")
+        b = await db_mod.upsert_catalog_item(db, path="/y/a.pdf", kind="file", title="a", parent_path="/y", size_bytes=10, content_sha256="ab")
+
+        for n, item_id in enumerate((a, b)):
+            jid = await db_mod.insert_job(db, tg_chat_id=1, tg_user_id=1, catalog_item_id=item_id, request_id=f"r{n}")
+            assert await worker_mod.process_one(settings, bot, FakeStorage(), db, FakeRedis(), jid) == "succeeded"
+
+        # One real upload, the copy is sent by the cached file_id.
+        assert not isinstance(bot.sent[0], str)
+        assert bot.sent[1] == "file-1"
+        assert (await db_mod.fetch_catalog_item(db, b))["tg_file_id"] == "file-1"
+        audit = await db_mod.fetch_recent_download_audit(db, limit=10)
+        assert sorted(r["mode"] for r in audit) == ["content_hash", "upload"]
+
+        # Content change in storage drops the stale per-item file_id.
+        await db_mod.upsert_catalog_item(db, path="/y/a.pdf", kind="file", title="a", parent_path="/y", size_bytes=10, content_sha256="cd")
+        assert (await db_mod.fetch_catalog_item(db, b))["tg_file_id"] is None
+        assert await db_mod.fetch_tg_file_by_content(db, "sha256:cd") is None
+
+        await db.close()
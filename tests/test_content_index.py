@@ -0,0 +1,217 @@
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+from adaspeas.common.settings import Settings
+from adaspeas.storage import LocalDiskClient
+from adaspeas.worker import extract as extract_mod
+from adaspeas.worker import main as worker_mod
+
+
+def _pdf(text: str) -> bytes:
+    """Smallest useful PDF: one page, one Helvetica text line."""
+    stream = f"BT /F1 12 Tf 72 712 Td ({text}) Tj ET".encode()
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R"
+        b" /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for n, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % n + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+
+def _docx(paragraphs: list[str]) -> bytes:
+    ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    body = "".join(f"<w:p><w:r><w:t>{p}</w:t></w:r></w:p>" for p in paragraphs)
+    path = tempfile.mktemp(suffix=".docx")
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("word/document.xml", f'<w:document xmlns:w="{ns}"><w:body>{body}</w:body></w:document>')
+    with open(path, "rb") as f:
+        data = f.read()
+    os.unlink(path)
+    return data
+
+
+@pytest.mark.asyncio
+async def test_content_index_extracts_and_searches_documents():
+    with tempfile.TemporaryDirectory() as root, tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        files = {
+            "/docs/a.pdf": _pdf("Invoice for turbine maintenance"),
+            "/docs/b.docx": _docx(["Договор поставки", "Срок действия: 2025"]),
+            "/docs/c.txt": "Протокол: обсудили турбину".encode("cp1251"),
+            "/docs/d.jpg": b"\xff\xd8 not text",
+            "/docs/e.txt": b"x" * 4096,
+        }
+        os.makedirs(os.path.join(root, "docs"))
+        for path, data in files.items():
+            with open(os.path.join(root, path.lstrip("/")), "wb") as f:
+                f.write(data)
+
+        settings = Settings(bot_token="x", content_index_max_bytes=1024)
+        storage = LocalDiskClient(root)
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            await up(db, path="/docs", kind="folder", title="docs", parent_path="/")
+            ids = {}
+            for path, data in files.items():
+                size = len(data) if not path.endswith("e.txt") else None  # size unknown: limit applies while streaming
+                ids[path] = await up(db, path=path, kind="file", title=path.rsplit("/", 1)[-1], parent_path="/docs", size_bytes=size)
+
+            tasks = await db_mod.fetch_content_pending(db, limit=10)
+            assert [t.item_id for t in tasks] == sorted(ids.values())
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                results = {t.path: await worker_mod.index_content_file(settings, storage, db, pool, t) for t in tasks}
+            assert results == {
+                "/docs/a.pdf": "done", "/docs/b.docx": "done", "/docs/c.txt": "done",
+                "/docs/d.jpg": "skipped", "/docs/e.txt": "skipped",
+            }
+            assert await db_mod.count_content_states(db) == {"done": 3, "skipped": 2}
+            assert await db_mod.fetch_content_pending(db) == []
+
+            async def search(query):
+                items, _ = await db_mod.search_catalog_items_page(db, query=query, scope_path="/", limit=10)
+                return sorted(it.path for it in items)
+
+            assert await search("turbine") == ["/docs/a.pdf"]
+            assert await search("турбин") == ["/docs/c.txt"]
+            assert await search("договор поставки") == ["/docs/b.docx"]
+            # Title/path hits still come first.
+            assert await search("docs") == sorted(["/docs", *files])
+
+            # A content change re-queues the file; a result computed for the old revision is dropped.
+            await up(db, path="/docs/c.txt", kind="file", title="c.txt", parent_path="/docs", size_bytes=1)
+            [task] = await db_mod.fetch_content_pending(db)
+            await up(db, path="/docs/c.txt", kind="file", title="c.txt", parent_path="/docs", size_bytes=2)
+            assert not await db_mod.store_content(db, task, state="done", body="stale")
+            [task] = await db_mod.fetch_content_pending(db)
+            assert await db_mod.store_content(db, task, state="done", body="новая редакция")
+            assert await search("турбин") == []
+            assert await search("редакция") == ["/docs/c.txt"]
+            # Unchanged metadata from a re-sync does not re-queue.
+            await up(db, path="/docs/c.txt", kind="file", title="c.txt", parent_path="/docs", size_bytes=2)
+            assert await db_mod.fetch_content_pending(db) == []
+
+            # Removed files leave the content index.
+            await db.execute("UPDATE catalog_items SET is_deleted=1 WHERE id=?", (ids["/docs/a.pdf"],))
+            await db.commit()
+            assert await search("turbine") == []
+            assert "done" in await db_mod.count_content_states(db)
+        finally:
+            await db.close()
+
+
+@pytest.mark.asyncio
+async def test_content_hits_follow_title_hits():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            bodies = {
+                "/Договор аренды.pdf": "аренда помещения",
+                "/scan1.pdf": "Договор поставки оборудования",
+                "/scan2.pdf": "договор подряда",
+                "/Договор займа.pdf": "договор займа",
+                "/scan3.pdf": "акт сверки",
+            }
+            ids = {}
+            for path in bodies:
+                ids[path] = await up(db, path=path, kind="file", title=path[1:-4], parent_path="/", size_bytes=1)
+            for task in await db_mod.fetch_content_pending(db, limit=10):
+                assert await db_mod.store_content(db, task, state="done", body=bodies[task.path])
+
+            titles = {ids["/Договор аренды.pdf"], ids["/Договор займа.pdf"]}
+            content = {ids["/scan1.pdf"], ids["/scan2.pdf"]}
+
+            # Title matches first, then files matching only by text; a file matching both appears once.
+            items, more = await db_mod.search_catalog_items_page(db, query="договор", scope_path="/", limit=10)
+            assert not more
+            assert {it.id for it in items[:2]} == titles and {it.id for it in items[2:]} == content
+            legacy, _ = await db_mod.search_catalog_items(db, query="договор", scope_path="/", limit=10)
+            assert [it.id for it in legacy] == [it.id for it in items]
+
+            # Keyset pages cross the tier boundary both ways.
+            pages, after = [], None
+            while True:
+                page, more = await db_mod.search_catalog_items_page(
+                    db, query="договор", scope_path="/", limit=1, after_id=after
+                )
+                pages.append(page[0].id)
+                if not more:
+                    break
+                after = page[0].id
+            assert pages == [it.id for it in items]
+            back, _ = await db_mod.search_catalog_items_page(
+                db, query="договор", scope_path="/", limit=3, before_id=pages[-1]
+            )
+            assert [it.id for it in back] == pages[:3]
+        finally:
+            await db.close()
+
+
+def _hang(path: str, suffix: str, max_chars: int) -> str:
+    time.sleep(60)
+    return ""
+
+
+@pytest.mark.asyncio
+async def test_content_index_times_out_hung_extraction(monkeypatch):
+    with tempfile.TemporaryDirectory() as root, tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        with open(os.path.join(root, "a.txt"), "wb") as f:
+            f.write(b"text")
+        monkeypatch.setattr(extract_mod, "extract_text", _hang)
+        settings = Settings(bot_token="x", content_index_timeout_sec=1)
+        db = await db_mod.connect(tmp.name)
+        pool = ProcessPoolExecutor(max_workers=1)
+        try:
+            await db_mod.ensure_schema(db)
+            await db_mod.upsert_catalog_item(db, path="/", kind="folder", title="root")
+            await db_mod.upsert_catalog_item(db, path="/a.txt", kind="file", title="a.txt", parent_path="/", size_bytes=4)
+            [task] = await db_mod.fetch_content_pending(db)
+            with pytest.raises(TimeoutError):
+                await worker_mod.index_content_file(settings, LocalDiskClient(root), db, pool, task)
+            # A failed attempt is recorded; the file stays queued until max_attempts.
+            [task] = await db_mod.fetch_content_pending(db)
+            assert task.attempts == 1
+            procs = list(pool._processes.values())
+            worker_mod._kill_pool(pool)
+            for p in procs:
+                p.join(5)
+                assert not p.is_alive()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            await db.close()
+
+
+def test_extract_text_formats(tmp_path):
+    p = tmp_path / "a.docx"
+    p.write_bytes(_docx(["Первый  абзац", "Второй"]))
+    assert extract_mod.extract_text(str(p), ".docx", 100) == "Первый абзац\nВторой"
+    p = tmp_path / "a.txt"
+    p.write_bytes("строка   один\n\n  строка два ".encode("utf-8"))
+    assert extract_mod.extract_text(str(p), ".txt", 9) == "строка од"
+    assert extract_mod.suffix_of("/x/Отчёт.PDF") == ".pdf" and extract_mod.suffix_of("/x/README") == ""
+    with pytest.raises(ValueError):
+        extract_mod.extract_text(str(p), ".jpg", 10)
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+
+
+@pytest.mark.asyncio
+async def test_reads_use_readonly_pool_and_see_committed_writes():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect_pool(tmp.name, read_pool_size=2)
+        try:
+            await db_mod.ensure_schema(db)
+            assert db.read_pool_size == 2
+            item_id = await db_mod.upsert_catalog_item(db, path="/a", kind="file", title="A", parent_path="/")
+            assert (await db_mod.fetch_catalog_item(db, item_id))["path"] == "/a"
+
+            # Pooled readers are read-only.
+            async with db.reader() as conn:
+                with pytest.raises(Exception):
+                    await conn.execute("DELETE FROM catalog_items")
+
+            # Reads are served while the writer holds an open transaction, and see only committed data.
+            await db.execute(
+                "INSERT INTO catalog_items(path, kind, title, parent_path) VALUES ('/b', 'file', 'B', '/')"
+            )
+            children = await asyncio.wait_for(db_mod.fetch_children(db, "/"), timeout=5)
+            assert [c["title"] for c in children] == ["A"]
+            await db.commit()
+            assert await db_mod.count_children(db, "/") == 2
+        finally:
+            await db.close()
+
+
+@pytest.mark.asyncio
+async def test_group_commit_shares_one_commit_across_callers():
+    from prometheus_client import REGISTRY
+
+    def commits() -> float:
+        return REGISTRY.get_sample_value("sqlite_commit_batch_size_count") or 0.0
+
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect_pool(tmp.name, read_pool_size=1, commit_window_ms=20, commit_max_batch=64)
+        try:
+            await db_mod.ensure_schema(db)
+            before = commits()
+            await asyncio.gather(*[db_mod.set_meta(db, f"k{i}", str(i)) for i in range(40)])
+            assert commits() - before < 40
+            # Every caller returned after the shared COMMIT: a reader sees all rows.
+            async with db.reader() as conn:
+                cur = await conn.execute("SELECT COUNT(*) FROM meta WHERE key LIKE 'k%'")
+                assert (await cur.fetchone())[0] == 40
+        finally:
+            await db.close()
+
+
+@pytest.mark.asyncio
+async def test_write_unit_is_not_committed_half_way_by_other_tasks():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect_pool(tmp.name, read_pool_size=1, commit_window_ms=20, commit_max_batch=64)
+        try:
+            await db_mod.ensure_schema(db)
+
+            async def committed(key: str) -> bool:
+                async with db.reader() as conn:
+                    cur = await conn.execute("SELECT 1 FROM meta WHERE key=?", (key,))
+                    return await cur.fetchone() is not None
+
+            gate = asyncio.Event()
+
+            async def unit() -> None:
+                async with db.write_unit():
+                    await db.execute("INSERT INTO meta(key, value) VALUES ('u1', '1')")
+                    await gate.wait()
+                    await db.execute("INSERT INTO meta(key, value) VALUES ('u2', '2')")
+                await db.commit()
+
+            unit_task = asyncio.create_task(unit())
+            await asyncio.sleep(0.01)
+            # Another task's write and group COMMIT wait for the unit instead of committing half of it.
+            other = asyncio.create_task(db_mod.set_meta(db, "other", "x"))
+            await asyncio.sleep(0.1)
+            assert not other.done()
+            assert not await committed("u1") and not await committed("other")
+            gate.set()
+            await asyncio.wait_for(asyncio.gather(unit_task, other), 5)
+            assert await committed("u1") and await committed("u2") and await committed("other")
+
+            # A failing unit is rolled back alone; a statement pending from before it is kept.
+            await db.execute("INSERT INTO meta(key, value) VALUES ('before', '1')")
+            with pytest.raises(RuntimeError):
+                async with db.write_unit():
+                    await db.execute("INSERT INTO meta(key, value) VALUES ('failed', '1')")
+                    raise RuntimeError("boom")
+            await db.commit()
+            assert await committed("before") and not await committed("failed")
+        finally:
+            await db.close()
@@ -0,0 +1,125 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+
+
+async def _stats(db, path):
+    st = await db_mod.fetch_folder_stats(db, path)
+    return (st.child_count, st.file_count, st.size_bytes, st.total_size_bytes) if st else None
+
+
+@pytest.mark.asyncio
+async def test_folder_stats_follow_catalog_changes():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            await up(db, path="/a", kind="folder", title="a", parent_path="/")
+            await up(db, path="/a/b", kind="folder", title="b", parent_path="/a")
+            await up(db, path="/a/1.pdf", kind="file", title="1", parent_path="/a", size_bytes=10, modified_at="2026-01-01T00:00:00+00:00")
+            await up(db, path="/a/b/2.pdf", kind="file", title="2", parent_path="/a/b", size_bytes=5, modified_at="2026-02-01T00:00:00+00:00")
+            await up(db, path="/x.pdf", kind="file", title="x", parent_path="/", size_bytes=1)
+
+            assert await _stats(db, "/") == (2, 1, 1, None)
+            assert await _stats(db, "/a") == (2, 1, 10, None)
+
+            assert await db_mod.refresh_folder_totals(db) == 3
+            assert await _stats(db, "/") == (2, 1, 1, 16)
+            assert await _stats(db, "/a/b") == (1, 1, 5, 5)
+            st = await db_mod.fetch_folder_stats(db, "/")
+            assert st.total_last_modified == "2026-02-01T00:00:00+00:00"
+
+            # Re-upserting unchanged rows does not drift the counters.
+            await up(db, path="/a/1.pdf", kind="file", title="1", parent_path="/a", size_bytes=10)
+            assert await _stats(db, "/a") == (2, 1, 10, 15)
+
+            # Size change + soft delete, then an incremental refresh of the touched folder and ancestors.
+            await up(db, path="/a/b/2.pdf", kind="file", title="2", parent_path="/a/b", size_bytes=50)
+            await db.execute("UPDATE catalog_items SET is_deleted=1 WHERE path='/a/1.pdf'")
+            await db.commit()
+            assert await _stats(db, "/a") == (1, 0, 0, 15)
+            assert await db_mod.refresh_folder_totals(db, ["/a/b", "/a"]) == 3
+            assert await _stats(db, "/a") == (1, 0, 0, 50)
+            assert await _stats(db, "/") == (2, 1, 1, 51)
+
+            # Revived row counts again.
+            await up(db, path="/a/1.pdf", kind="file", title="1", parent_path="/a", size_bytes=10)
+            assert await _stats(db, "/a") == (2, 1, 10, 50)
+        finally:
+            await db.close()
+
+
+@pytest.mark.asyncio
+async def test_folder_totals_backfill_runs_in_batches():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            for a in range(3):
+                await up(db, path=f"/a{a}", kind="folder", title=f"a{a}", parent_path="/")
+                for b in range(2):
+                    await up(db, path=f"/a{a}/b{b}", kind="folder", title=f"b{b}", parent_path=f"/a{a}")
+                    await up(db, path=f"/a{a}/b{b}/f.pdf", kind="file", title="f", parent_path=f"/a{a}/b{b}", size_bytes=a * 10 + b + 1)
+                await up(db, path=f"/a{a}/g.pdf", kind="file", title="g", parent_path=f"/a{a}", size_bytes=100)
+            await up(db, path="/gone", kind="folder", title="gone", parent_path="/")
+            await db.execute("UPDATE catalog_items SET is_deleted=1 WHERE path='/gone'")
+            await db.commit()
+
+            # Folder by folder, deepest level first: every step is one bounded transaction.
+            await db_mod.request_backfill(db, "folder_totals")
+            steps = 1
+            while await db_mod.run_backfill_batch(db, "folder_totals", batch_size=2):
+                steps += 1
+            assert steps >= 5
+            assert (await db_mod.fetch_backfill_progress(db))["folder_totals"] == "done"
+            batched = {p: await _stats(db, p) for p in ("/", "/a0", "/a2", "/a1/b1")}
+
+            assert await db_mod.refresh_folder_totals(db) == 10
+            assert {p: await _stats(db, p) for p in batched} == batched
+            assert batched["/"][3] == sum(a * 20 + 3 for a in range(3)) + 300
+        finally:
+            await db.close()
+
+
+@pytest.mark.asyncio
+async def test_folder_stats_backfill_counts_each_row_once():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            await up(db, path="/a", kind="folder", title="a", parent_path="/")
+            for i in range(6):
+                await up(db, path=f"/a/{i}.pdf", kind="file", title=str(i), parent_path="/a", size_bytes=10)
+            expected = {p: await _stats(db, p) for p in ("/", "/a")}
+
+            # A database from before v15: the migration only queues the count of existing rows.
+            await db.execute("DELETE FROM catalog_folder_stats")
+            await db.execute("DELETE FROM schema_backfills WHERE name='folder_stats'")
+            await db.execute("UPDATE schema_version SET version=14")
+            await db.commit()
+            await db_mod.ensure_schema(db)
+            assert "folder_stats" in await db_mod.pending_backfills(db)
+            assert await db_mod.run_backfill_batch(db, "folder_stats", batch_size=4)
+
+            # Writes on both sides of the cursor while the backfill is in flight.
+            await up(db, path="/a/1.pdf", kind="file", title="1", parent_path="/a", size_bytes=15)
+            await up(db, path="/a/5.pdf", kind="file", title="5", parent_path="/a", size_bytes=15)
+            await up(db, path="/a/6.pdf", kind="file", title="6", parent_path="/a", size_bytes=10)
+            while await db_mod.run_backfill_batch(db, "folder_stats", batch_size=4):
+                pass
+            assert await _stats(db, "/") == expected["/"]
+            assert await _stats(db, "/a") == (7, 7, 80, None)
+        finally:
+            await db.close()
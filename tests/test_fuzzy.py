@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+from adaspeas.common.fuzzy import FuzzyIndex, edit_distance
+
+
+def test_edit_distance_limits_and_transpositions():
+    assert edit_distance("протокол", "протокол", 2) == 0
+    assert edit_distance("протакол", "протокол", 2) == 1
+    assert edit_distance("ab", "ba", 1) == 1
+    assert edit_distance("kitten", "sitting", 2) == 3  # above the limit: limit + 1
+    assert edit_distance("a", "abcd", 1) == 2
+
+
+def test_fuzzy_index_corrects_typos():
+    index = FuzzyIndex([("приказ", 5), ("приказы", 1), ("отчёт", 3), ("инструкция", 2), ("протокол", 4), ("2023", 9)])
+    assert len(index) == 5  # numbers are not corrected
+    assert index.lookup("преказ") == "приказ"
+    assert index.lookup("ИНСТРУКЦЫЯ") == "инструкция"
+    assert index.correct("протакол 2023 отчот") == "протокол 2023 отчет"
+    # Known words and prefixes need no correction; unfixable words give no suggestion.
+    assert index.correct("Отчёт прик") is None
+    assert index.correct("преказ зззззззз") is None
+
+
+@pytest.mark.asyncio
+async def test_fuzzy_vocabulary_from_fts_index():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            await up(db, path="/Протоколы", kind="folder", title="Протоколы", parent_path="/")
+            await up(db, path="/Протоколы/Протокол собрания 2023.pdf", kind="file",
+                     title="Протокол собрания 2023", parent_path="/Протоколы")
+
+            vocab = dict(await db_mod.fetch_catalog_vocabulary(db))
+            assert vocab["протокол"] == 1 and vocab["протоколы"] == 2
+            assert "2023" not in vocab and "pdf" in vocab
+
+            query = "протакол сабрания"
+            assert (await db_mod.search_catalog_items_page(db, query=query, scope_path="/"))[0] == []
+            corrected = FuzzyIndex(vocab.items()).correct(query)
+            assert corrected == "протокол собрания"
+            items, _ = await db_mod.search_catalog_items_page(db, query=corrected, scope_path="/")
+            assert [it.title for it in items] == ["Протокол собрания 2023"]
+        finally:
+            await db.close()
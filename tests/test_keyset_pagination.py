@@ -0,0 +1,119 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+
+
+async def _walk(fetch, limit):
+    """Page forward to the end, then back to the start; return both id sequences."""
+    pages, after = [], None
+    while True:
+        items, more = await fetch(limit=limit, after_id=after)
+        pages.append([it.id for it in items])
+        if not more:
+            break
+        after = items[-1].id
+    back, before = [pages[-1]], pages[-1][0]
+    while True:
+        items, more = await fetch(limit=limit, before_id=before)
+        back.append([it.id for it in items])
+        if not more:
+            break
+        before = items[0].id
+    return pages, back[::-1]
+
+
+@pytest.mark.asyncio
+async def test_children_and_search_keyset_pages():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            # Duplicate titles exercise the id tie-breaker.
+            for i in range(7):
+                await up(db, path=f"/d{i}", kind="folder", title=f"report {i % 3}", parent_path="/")
+            for i in range(11):
+                await up(db, path=f"/f{i}.pdf", kind="file", title=f"report {i % 4}", parent_path="/", size_bytes=i)
+
+            full = [it.id for it in await db_mod.fetch_children(db, "/", limit=100)]
+            assert len(full) == 18
+
+            async def children(**kw):
+                return await db_mod.fetch_children_page(db, "/", **kw)
+
+            forward, backward = await _walk(children, 5)
+            assert sum(forward, []) == full
+            assert backward == forward
+            assert [len(p) for p in forward] == [5, 5, 5, 3]
+
+            # Unknown cursor restarts from the first page.
+            items, more = await db_mod.fetch_children_page(db, "/", limit=5, after_id=10_000)
+            assert [it.id for it in items] == full[:5] and more
+
+            # The seek is served by the index, without a temp b-tree sort.
+            cur = await db.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM catalog_items WHERE parent_id=? AND is_deleted=0 "
+                "AND kind=? AND (title, id) > (?, ?) ORDER BY title, id LIMIT 5",
+                (1, "file", "report 1", 1),
+            )
+            plan = " ".join(str(r[-1]) for r in await cur.fetchall())
+            assert "idx_catalog_children" in plan
+            assert "TEMP B-TREE" not in plan
+
+            for q in ("report", "repo"):
+                async def search(**kw):
+                    return await db_mod.search_catalog_items_page(db, query=q, scope_path="/", **kw)
+
+                forward, backward = await _walk(search, 4)
+                ids = sum(forward, [])
+                assert sorted(ids) == sorted(full)
+                assert len(set(ids)) == len(ids)
+                assert backward == forward
+        finally:
+            await db.close()
+
+
+@pytest.mark.asyncio
+async def test_folder_view_is_read_only():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            root_id = await up(db, path="/", kind="folder", title="root")
+            d_id = await up(db, path="/d", kind="folder", title="d", parent_path="/")
+            for i in range(9):
+                await up(db, path=f"/d/f{i}.pdf", kind="file", title=f"f {i % 3}", parent_path="/d", size_bytes=10)
+            await db_mod.refresh_folder_totals(db)
+            await db_mod.set_meta(db, "catalog_last_sync_at", "2026-01-01 00:00:00")
+
+            changes = db.total_changes
+
+            async def view(**kw):
+                v = await db_mod.fetch_folder_view(db, "/d", root_path="/", **kw)
+                return v.children, v.more
+
+            async def children(**kw):
+                return await db_mod.fetch_children_page(db, "/d", **kw)
+
+            v = await db_mod.fetch_folder_view(db, "/d", root_path="/", limit=4)
+            assert (v.folder.id, v.parent_id, v.root_id, v.total, v.size_bytes) == (d_id, root_id, root_id, 9, 90)
+            assert v.last_sync_at == "2026-01-01 00:00:00"
+            assert await _walk(view, 4) == await _walk(children, 4)
+            full = [it.id for it in await db_mod.fetch_children(db, "/d", limit=100)]
+            legacy = await db_mod.fetch_folder_view(db, "/d", root_path="/", limit=4, offset=4)
+            assert [it.id for it in legacy.children] == full[4:8] and legacy.more
+
+            # A missing folder is reported, not created.
+            assert await db_mod.fetch_folder_view(db, "/missing", root_path="/") is None
+            assert await db_mod.fetch_catalog_item_by_path(db, "/missing") is None
+            assert db.total_changes == changes
+        finally:
+            await db.close()
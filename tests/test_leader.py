@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common.leader import LEADER_KEY_PREFIX, LeaderLease
+
+
+class FakeRedis:
+    """The commands LeaderLease uses: SET NX PX, GET, and its two compare-and-set scripts."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, tuple[str, float]] = {}
+
+    def _live(self, key: str) -> str | None:
+        entry = self.data.get(key)
+        if entry is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            entry = None
+        return entry[0] if entry is not None else None
+
+    async def set(self, key, value, *, nx=False, px=None):
+        if nx and self._live(key) is not None:
+            return None
+        self.data[key] = (value, time.monotonic() + px / 1000 if px else float("inf"))
+        return True
+
+    async def get(self, key):
+        return self._live(key)
+
+    async def eval(self, script, numkeys, key, value, *args):
+        if self._live(key) != value:
+            return 0
+        if "'del'" in script:
+            del self.data[key]
+        else:
+            self.data[key] = (value, time.monotonic() + int(args[0]) / 1000)
+        return 1
+
+
+@pytest.mark.asyncio
+async def test_leader_lease_single_holder_renewal_and_release():
+    r = FakeRedis()
+    a = LeaderLease(r, "bot", replica_id="a", ttl_sec=30)
+    b = LeaderLease(r, "bot", replica_id="b", ttl_sec=30)
+
+    assert await a.try_acquire() and a.is_leader and a.role == "leader"
+    assert not await b.try_acquire() and b.role == "follower"
+    assert await a.holder() == await b.holder() == "a"
+    assert a.key == LEADER_KEY_PREFIX + "bot"
+
+    # Renewal extends the holder's own key.
+    r.data[a.key] = ("a", time.monotonic() + 1)
+    assert await a.try_acquire()
+    assert r.data[a.key][1] > time.monotonic() + 20
+
+    # A non-holder's release leaves the lease alone.
+    b._valid_until = time.monotonic() + 30  # b believes (wrongly) that it is leader
+    await b.release()
+    assert not b.is_leader and await a.holder() == "a"
+
+    await a.release()
+    assert not a.is_leader and await a.holder() is None
+    assert await b.try_acquire() and await b.holder() == "b"
+
+
+@pytest.mark.asyncio
+async def test_leader_lease_expires_after_ttl():
+    r = FakeRedis()
+    a = LeaderLease(r, "bot", replica_id="a", ttl_sec=1)
+    b = LeaderLease(r, "bot", replica_id="b", ttl_sec=1)
+    assert await a.try_acquire()
+    assert not await b.try_acquire()
+
+    # a stops renewing (dead or cut off from Redis): its own view and the key both lapse within ttl.
+    await asyncio.sleep(1.05)
+    assert not a.is_leader
+    assert await b.try_acquire() and await b.holder() == "b"
+    # a cannot renew a lease that is now b's.
+    assert not await a.try_acquire() and await a.holder() == "b"
+
+
+@pytest.mark.asyncio
+async def test_leader_lease_run_mirrors_role_and_releases():
+    r = FakeRedis()
+    lease = LeaderLease(r, "bot", replica_id="a", ttl_sec=3)
+    state: dict = {}
+    task = asyncio.create_task(lease.run(state))
+    await asyncio.sleep(0.05)
+    assert state["role"] == "leader" and await lease.holder() == "a"
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert await lease.holder() is None
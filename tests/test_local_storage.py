@@ -0,0 +1,42 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.storage import LocalDiskClient
+
+
+@pytest.mark.asyncio
+async def test_local_list_dir_paginates_with_metadata():
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, "docs", "sub"))
+        for i in range(7):
+            with open(os.path.join(root, "docs", f"f{i}.txt"), "wb") as f:
+                f.write(b"x" * i)
+
+        client = LocalDiskClient(root)
+        pages = [await client.list_dir("/docs", limit=3, offset=off) for off in (0, 3, 6, 9)]
+        names = [it["name"] for page in pages for it in page]
+        assert names == sorted(["sub"] + [f"f{i}.txt" for i in range(7)])
+        assert [len(p) for p in pages] == [3, 3, 2, 0]
+
+        by_name = {it["name"]: it for page in pages for it in page}
+        assert by_name["sub"]["type"] == "dir" and by_name["sub"]["path"] == "/docs/sub"
+        assert by_name["f5.txt"]["size"] == 5 and by_name["f5.txt"]["modified"]
+
+        # A new entry changes the directory mtime and invalidates the cached listing.
+        await asyncio.sleep(0.01)
+        with open(os.path.join(root, "docs", "a_new.txt"), "wb") as f:
+            f.write(b"")
+        first = await client.list_dir("/docs", limit=1)
+        assert first[0]["name"] == "a_new.txt"
+
+        root_items = await client.list_dir("/")
+        assert root_items == [{"name": "docs", "type": "dir", "path": "/docs", "modified": root_items[0]["modified"]}]
+
+        with pytest.raises(RuntimeError):
+            await client.list_dir("/../etc")
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+from adaspeas.common.settings import Settings
+from adaspeas.storage import LocalDiskClient
+from adaspeas.worker import main as worker_mod
+
+
+class FakeRedis:
+    def __init__(self):
+        self.published: list[tuple[str, str]] = []
+
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 1
+
+
+async def _live(db) -> dict[str, int]:
+    cur = await db.execute("SELECT path, COALESCE(size_bytes, -1) FROM catalog_items WHERE is_deleted=0")
+    return {str(r[0]): int(r[1]) for r in await cur.fetchall()}
+
+
+async def _wait_for(db, predicate, timeout: float = 8.0) -> dict[str, int]:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        live = await _live(db)
+        if predicate(live) or asyncio.get_running_loop().time() > deadline:
+            return live
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["inotify", "poll"])
+async def test_watcher_applies_only_changed_folders(backend):
+    if backend == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux-only")
+    with tempfile.TemporaryDirectory() as root, tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        base = Path(root)
+        (base / "a").mkdir()
+        (base / "a" / "x.txt").write_bytes(b"x")
+        (base / "a" / "old").mkdir()
+        (base / "a" / "old" / "deep.txt").write_bytes(b"d")
+
+        settings = Settings(
+            bot_token="x",
+            storage_mode="local",
+            local_storage_root=root,
+            local_watch_backend=backend,
+            local_watch_debounce_ms=50,
+            local_watch_poll_interval_sec=1,
+        )
+        db = await db_mod.connect(tmp.name)
+        task = None
+        try:
+            await db_mod.ensure_schema(db)
+            await worker_mod.sync_catalog(settings, LocalDiskClient(root), db, "/", max_nodes=100)
+            assert set(await _live(db)) == {"/", "/a", "/a/x.txt", "/a/old", "/a/old/deep.txt"}
+            await worker_mod.publish_catalog_changes(db, FakeRedis())
+            cur = await db.execute("SELECT updated_at FROM catalog_items WHERE path='/a/x.txt'")
+            untouched_at = (await cur.fetchone())[0]
+
+            r = FakeRedis()
+            state: dict = {}
+            task = asyncio.create_task(worker_mod.local_watch_loop(settings, db, lambda: r, state))
+            while state.get("local_watch") is None:
+                await asyncio.sleep(0.01)
+            assert state["local_watch"] == backend
+
+            (base / "a" / "y.txt").write_bytes(b"yy")
+            (base / "b" / "c").mkdir(parents=True)
+            (base / "b" / "c" / "z.txt").write_bytes(b"zzz")
+            (base / "a" / "old" / "deep.txt").unlink()
+            (base / "a" / "old").rmdir()
+
+            expected = {"/", "/a", "/a/x.txt", "/a/y.txt", "/b", "/b/c", "/b/c/z.txt"}
+            live = await _wait_for(db, lambda lv: set(lv) == expected)
+            assert set(live) == expected
+            assert live["/a/y.txt"] == 2 and live["/b/c/z.txt"] == 3
+
+            # Unchanged sibling rows are not rewritten.
+            cur = await db.execute("SELECT updated_at FROM catalog_items WHERE path='/a/x.txt'")
+            assert (await cur.fetchone())[0] == untouched_at
+            assert r.published, "catalog version must be announced"
+
+            # In-place modification updates size.
+            (base / "a" / "x.txt").write_bytes(b"xxxx")
+            live = await _wait_for(db, lambda lv: lv.get("/a/x.txt") == 4)
+            assert live["/a/x.txt"] == 4
+
+            # Renaming a folder moves its subtree.
+            (base / "b").rename(base / "b2")
+            expected = {"/", "/a", "/a/x.txt", "/a/y.txt", "/b2", "/b2/c", "/b2/c/z.txt"}
+            live = await _wait_for(db, lambda lv: set(lv) == expected)
+            assert set(live) == expected
+        finally:
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            await db.close()
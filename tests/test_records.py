@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+from adaspeas.common.records import CatalogEntry, CatalogItem, User
+
+
+@pytest.mark.asyncio
+async def test_fetch_helpers_return_compact_records():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            item_id = await db_mod.upsert_catalog_item(db, path="/f.pdf", kind="file", title="F", parent_path="/", size_bytes=7)
+            await db_mod.upsert_user(db, 42)
+
+            item = await db_mod.fetch_catalog_item(db, item_id)
+            assert isinstance(item, CatalogItem)
+            assert not hasattr(item, "__dict__")
+            assert (item.id, item.path, item.is_deleted) == (item_id, "/f.pdf", 0)
+            # Mapping-style access keeps older call sites working.
+            assert item["title"] == "F" and item.get("size_bytes") == 7 and item.get("missing") is None
+            with pytest.raises(KeyError):
+                item["missing"]
+
+            (child,) = await db_mod.fetch_children(db, "/")
+            assert child == CatalogEntry(item_id, "file", "F", 7, "/f.pdf")
+
+            user = await db_mod.fetch_user_by_tg_user_id(db, 42)
+            assert isinstance(user, User) and user.tg_user_id == 42 and user.status == "guest"
+        finally:
+            await db.close()
@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+from adaspeas.common.settings import Settings
+from adaspeas.worker import main as worker_mod
+
+
+async def _ids(db, table: str) -> set[int]:
+    cur = await db.execute(f"SELECT id FROM {table}")
+    return {int(r[0]) for r in await cur.fetchall()}
+
+
+@pytest.mark.asyncio
+async def test_retention_moves_old_rows_to_archive_in_batches():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        main_path = os.path.join(tmpdir, "app.db")
+        archive_path = os.path.join(tmpdir, "archive.db")
+        settings = Settings(
+            bot_token="x",
+            sqlite_path=main_path,
+            archive_sqlite_path=archive_path,
+            jobs_retention_days=30,
+            audit_retention_days=90,
+            retention_batch_size=2,
+        )
+        db = await db_mod.connect(main_path)
+        try:
+            await db_mod.ensure_schema(db)
+            assert await db_mod.fetch_archived_download_audit(archive_path) == []
+
+            item = await db_mod.upsert_catalog_item(db, path="/a.pdf", kind="file", title="A", parent_path="/")
+            # (age in days, job state, audited)
+            plan = [(200, "succeeded", True), (120, "failed", True), (100, "succeeded", True),
+                    (60, "succeeded", True), (45, "succeeded", False), (40, "cancelled", False),
+                    (35, "queued", False), (5, "succeeded", False)]
+            jobs: dict[int, tuple[int, bool]] = {}
+            for n, (age, state, audited) in enumerate(plan):
+                job_id = await db_mod.insert_job(db, 1, 7, item, request_id=f"r{n}")
+                await db.execute(
+                    "UPDATE jobs SET state=?, created_at=datetime('now', ?), updated_at=datetime('now', ?) WHERE id=?",
+                    (state, f"-{age} days", f"-{age} days", job_id),
+                )
+                if audited:
+                    await db.execute(
+                        "INSERT INTO download_audit(created_at, job_id, tg_chat_id, tg_user_id, catalog_item_id, result)"
+                        " VALUES (datetime('now', ?), ?, 1, 7, ?, ?)",
+                        (f"-{age} days", job_id, item, "failed" if state == "failed" else "succeeded"),
+                    )
+                jobs[job_id] = (age, audited)
+            await db.commit()
+            stats_before = await db_mod.count_download_audit_since(db, since_minutes=365 * 24 * 60)
+
+            await db_mod.attach_archive(db, archive_path)
+            await db_mod.attach_archive(db, archive_path)  # idempotent
+            moved = await worker_mod.retention_pass(settings, db)
+
+            by_age = {age: j for j, (age, _audited) in jobs.items()}
+            assert moved == {"download_audit": 3, "jobs": 5}
+            cur = await db.execute("SELECT job_id FROM archive.download_audit")
+            assert {int(r[0]) for r in await cur.fetchall()} == {by_age[200], by_age[120], by_age[100]}
+            # Jobs whose audit is still live stay; queued jobs never move.
+            assert await _ids(db, "main.jobs") == {by_age[60], by_age[35], by_age[5]}
+            assert await _ids(db, "archive.jobs") == {by_age[a] for a in (200, 120, 100, 45, 40)}
+
+            # Rollup-backed /stats do not change; archived audit stays readable with its item snapshot.
+            assert await db_mod.count_download_audit_since(db, since_minutes=365 * 24 * 60) == stats_before
+            archived = await db_mod.fetch_archived_download_audit(archive_path, limit=10)
+            assert [r.title for r in archived] == ["A", "A", "A"]
+            assert archived[0].created_at > archived[-1].created_at
+
+            # Nothing left to move.
+            assert await worker_mod.retention_pass(settings, db) == {"download_audit": 0, "jobs": 0}
+        finally:
+            await db.close()
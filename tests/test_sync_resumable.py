@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+from adaspeas.common.settings import Settings
+from adaspeas.worker import main as worker_mod
+
+
+class FakeStorage:
+    """In-memory tree: /root with 3 folders x 4 files."""
+
+    def __init__(self):
+        self.tree = {"/root": [{"name": f"d{i}", "type": "dir", "path": f"/root/d{i}"} for i in range(3)]}
+        for i in range(3):
+            self.tree[f"/root/d{i}"] = [
+                {"name": f"f{j}.pdf", "type": "file", "path": f"/root/d{i}/f{j}.pdf", "size": j} for j in range(4)
+            ]
+        self.calls: list[str] = []
+
+    async def list_dir(self, path: str, *, limit: int = 200, offset: int = 0) -> list[dict]:
+        self.calls.append(path)
+        return list(self.tree.get(path, []))[offset: offset + limit]
+
+
+@pytest.mark.asyncio
+async def test_sync_runs_in_resumable_slices():
+    settings = Settings(bot_token="x", admin_user_ids="", net_retry_attempts=1)
+    storage = FakeStorage()
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        await db_mod.ensure_schema(db)
+
+        n1, deleted1, pending1 = await worker_mod.sync_catalog(settings, storage, db, "/root", max_nodes=3)
+        assert (n1, deleted1) == (3, 0)
+        assert pending1 == 3
+
+        # "Restart": a fresh connection continues from the persisted frontier.
+        await db.close()
+        db = await db_mod.connect(tmp.name)
+
+        total = n1
+        pending = pending1
+        while pending:
+            n, _deleted, pending = await worker_mod.sync_catalog(settings, storage, db, "/root", max_nodes=5)
+            total += n
+        assert total == 15
+        assert await db_mod.get_meta(db, "catalog_sync_run_items") == "15"
+        # Each folder listed exactly once across slices.
+        assert sorted(storage.calls) == ["/root", "/root/d0", "/root/d1", "/root/d2"]
+        assert await db_mod.sync_frontier_counts(db, "/root") == (0, 0)
+        assert await db_mod.count_children(db, "/root/d1") == 4
+
+        await db.close()
+
+
+@pytest.mark.asyncio
+async def test_generation_soft_delete_is_precise_and_indexed():
+    settings = Settings(bot_token="x", admin_user_ids="", net_retry_attempts=1)
+    storage = FakeStorage()
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        await db_mod.ensure_schema(db)
+
+        _n, deleted, pending = await worker_mod.sync_catalog(settings, storage, db, "/root", max_nodes=1000)
+        assert (deleted, pending) == (0, 0)
+
+        # Same-second resync after removing a folder: generations, not timestamps, decide.
+        storage.tree["/root"] = storage.tree["/root"][:2]
+        del storage.tree["/root/d2"]
+        _n, deleted, pending = await worker_mod.sync_catalog(settings, storage, db, "/root", max_nodes=1000)
+        assert (deleted, pending) == (5, 0)
+        assert (await db_mod.fetch_catalog_item_by_path(db, "/root/d2/f0.pdf"))["is_deleted"] == 1
+        assert (await db_mod.fetch_catalog_item_by_path(db, "/root/d1/f0.pdf"))["is_deleted"] == 0
+
+        cur = await db.execute(
+            "EXPLAIN QUERY PLAN UPDATE catalog_items SET is_deleted=1 "
+            "WHERE is_deleted=0 AND sync_generation < 3 AND path LIKE '/root/%' AND path != '/root'"
+        )
+        plan = " ".join(str(r[3]) for r in await cur.fetchall())
+        assert "idx_catalog_deleted_generation" in plan
+
+        await db.close()
@@ -0,0 +1,86 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.common import db as db_mod
+
+
+@pytest.mark.asyncio
+async def test_substring_search_uses_trigram_index():
+    with tempfile.NamedTemporaryFile(suffix=".sqlite") as tmp:
+        db = await db_mod.connect(tmp.name)
+        try:
+            await db_mod.ensure_schema(db)
+            up = db_mod.upsert_catalog_item
+            await up(db, path="/", kind="folder", title="root")
+            await up(db, path="/Приказы", kind="folder", title="Приказы", parent_path="/")
+            await up(db, path="/Приказы/АБ-123456.pdf", kind="file", title="Приказ АБ-123456", parent_path="/Приказы")
+            await up(db, path="/Приказы/АБ-654321.pdf", kind="file", title="Приказ АБ-654321", parent_path="/Приказы")
+            await up(db, path="/manual.pdf", kind="file", title="Manual", parent_path="/")
+
+            async def search(query, scope="/"):
+                items, _ = await db_mod.search_catalog_items_page(db, query=query, scope_path=scope, limit=10)
+                legacy, _ = await db_mod.search_catalog_items(db, query=query, scope_path=scope, limit=10)
+                assert sorted(it.id for it in items) == sorted(it.id for it in legacy)
+                return sorted(it.path for it in items)
+
+            # Word prefixes still go through catalog_items_fts.
+            assert await search("прик") == ["/Приказы", "/Приказы/АБ-123456.pdf", "/Приказы/АБ-654321.pdf"]
+            # Infix parts of document numbers, case-insensitive, with punctuation.
+            assert await search("2345") == ["/Приказы/АБ-123456.pdf"]
+            assert await search("б-65") == ["/Приказы/АБ-654321.pdf"]
+            assert await search("anua") == ["/manual.pdf"]
+            assert await search("anua", "/Приказы") == []
+            # Too short for a trigram and no word starts with it: nothing, rather than a table scan.
+            assert await search("45") == []
+
+            # A pending trigram backfill is not used until it completes.
+            await db_mod.request_backfill(db, "catalog_trgm")
+            assert await search("2345") == []
+            while await db_mod.run_backfill_batch(db, "catalog_trgm", batch_size=2):
+                pass
+            assert await search("2345") == ["/Приказы/АБ-123456.pdf"]
+
+            # Triggers keep the index current.
+            await db.execute(
+                "UPDATE catalog_items SET title='Приказ АБ-777000', path='/Приказы/АБ-777000.pdf'"
+                " WHERE path='/Приказы/АБ-123456.pdf'"
+            )
+            await db.commit()
+            assert await search("7770") == ["/Приказы/АБ-777000.pdf"]
+            assert await search("2345") == []
+
+            # Trigram pages follow id order, forward and back.
+            for i in range(7):
+                await up(db, path=f"/m{i}.pdf", kind="file", title=f"Manual {i}", parent_path="/")
+            pages, after = [], None
+            while True:
+                items, more = await db_mod.search_catalog_items_page(db, query="anua", scope_path="/", limit=3, after_id=after)
+                pages.append([it.id for it in items])
+                if not more:
+                    break
+                after = items[-1].id
+            ids = sum(pages, [])
+            assert len(ids) == 8 and ids == sorted(ids)
+            items, more = await db_mod.search_catalog_items_page(
+                db, query="anua", scope_path="/", limit=3, before_id=pages[-1][0]
+            )
+            assert [it.id for it in items] == pages[-2] and more
+
+            # Both the hit probe and the ranked page are driven by the FTS index, never by a catalog scan.
+            for sql in (
+                "SELECT 1 FROM catalog_items_fts CROSS JOIN catalog_items c ON c.id = catalog_items_fts.rowid "
+                "WHERE catalog_items_fts MATCH ? AND c.is_deleted=0 LIMIT 1",
+                "SELECT c.id FROM catalog_items_trgm JOIN catalog_items c ON c.id = catalog_items_trgm.rowid "
+                "WHERE catalog_items_trgm MATCH ? AND c.is_deleted=0 ORDER BY bm25(catalog_items_trgm), c.id LIMIT 5",
+            ):
+                cur = await db.execute("EXPLAIN QUERY PLAN " + sql, ('"2345"',))
+                plan = [str(r[-1]) for r in await cur.fetchall()]
+                assert plan[0].startswith("SCAN catalog_items_") and "VIRTUAL TABLE INDEX" in plan[0]
+                assert "SEARCH c USING INTEGER PRIMARY KEY" in plan[1]
+        finally:
+            await db.close()
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from prometheus_client import REGISTRY
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+
+from adaspeas.bot.webhook import SECRET_HEADER, make_webhook_handler, update_lag_middleware
+
+TOKEN = "123456789:AABBCCDDEEFFaabbccddeeff1234567890"
+
+
+def _update(update_id: int, text: str = "hi", *, age_sec: float = 0.0) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time() - age_sec),
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "u"},
+            "text": text,
+        },
+    }
+
+
+def _requests(result: str) -> float:
+    return REGISTRY.get_sample_value("bot_webhook_requests_total", {"result": result}) or 0.0
+
+
+def _client(dp: Dispatcher, *, max_concurrency: int = 4) -> TestClient:
+    app = web.Application()
+    handler = make_webhook_handler(dp, Bot(TOKEN), secret="s3cret", max_concurrency=max_concurrency)
+    app.router.add_post("/tg/webhook", handler)
+    return TestClient(TestServer(app))
+
+
+def test_webhook_handler_requires_secret():
+    with pytest.raises(ValueError):
+        make_webhook_handler(Dispatcher(), Bot(TOKEN), secret="", max_concurrency=1)
+
+
+@pytest.mark.asyncio
+async def test_webhook_rejects_missing_or_wrong_secret_and_invalid_body():
+    dp, seen = Dispatcher(), []
+
+    @dp.message()
+    async def on_message(message):
+        seen.append(message.text)
+
+    unauthorized, invalid = _requests("unauthorized"), _requests("invalid")
+    async with _client(dp) as client:
+        r = await client.post("/tg/webhook", json=_update(1))
+        assert r.status == 401
+        r = await client.post("/tg/webhook", json=_update(2), headers={SECRET_HEADER: "s3cre"})
+        assert r.status == 401
+        # Not an Update: acknowledged (Telegram would retry it forever) but never dispatched.
+        r = await client.post("/tg/webhook", data=b"not json", headers={SECRET_HEADER: "s3cret"})
+        assert r.status == 200
+        r = await client.post("/tg/webhook", json={"message": {}}, headers={SECRET_HEADER: "s3cret"})
+        assert r.status == 200
+        await asyncio.sleep(0.05)
+        assert seen == []
+
+        r = await client.post("/tg/webhook", json=_update(3, "ok"), headers={SECRET_HEADER: "s3cret"})
+        assert r.status == 200
+        await asyncio.sleep(0.05)
+        assert seen == ["ok"]
+    assert _requests("unauthorized") - unauthorized == 2
+    assert _requests("invalid") - invalid == 2
+
+
+@pytest.mark.asyncio
+async def test_webhook_bounds_updates_in_flight():
+    dp, seen = Dispatcher(), []
+    gate = asyncio.Event()
+
+    @dp.message()
+    async def on_message(message):
+        seen.append(message.text)
+        if message.text == "boom":
+            raise RuntimeError("handler failed")
+        await gate.wait()
+
+    headers = {SECRET_HEADER: "s3cret"}
+    async with _client(dp, max_concurrency=1) as client:
+        # A failing update still frees its slot.
+        r = await client.post("/tg/webhook", json=_update(1, "boom"), headers=headers)
+        assert r.status == 200
+        r = await client.post("/tg/webhook", json=_update(2, "first"), headers=headers)
+        assert r.status == 200
+        await asyncio.sleep(0.05)
+        assert seen == ["boom", "first"]
+        assert REGISTRY.get_sample_value("bot_updates_inflight") == 1
+
+        # The only slot is taken: the next request waits for it instead of piling up tasks.
+        second = asyncio.create_task(client.post("/tg/webhook", json=_update(3, "second"), headers=headers))
+        await asyncio.sleep(0.1)
+        assert not second.done() and seen == ["boom", "first"]
+
+        gate.set()
+        r = await asyncio.wait_for(second, 5)
+        assert r.status == 200
+        await asyncio.sleep(0.05)
+        assert seen == ["boom", "first", "second"]
+        assert REGISTRY.get_sample_value("bot_updates_inflight") == 0
+
+
+@pytest.mark.asyncio
+async def test_update_lag_middleware_observes_event_age():
+    dp = Dispatcher()
+    dp.update.outer_middleware(update_lag_middleware("test"))
+
+    @dp.message()
+    async def on_message(message):
+        pass
+
+    labels = {"mode": "test"}
+    bot = Bot(TOKEN)
+    await dp.feed_update(bot, Update.model_validate(_update(1, age_sec=30)))
+    assert REGISTRY.get_sample_value("bot_update_lag_seconds_count", labels) == 1
+    assert 29 <= REGISTRY.get_sample_value("bot_update_lag_seconds_sum", labels) < 60
+    # Updates without an event date (callback queries) are not observed.
+    query = {"id": "q", "from": {"id": 42, "is_bot": False, "first_name": "u"}, "chat_instance": "c", "data": "x"}
+    await dp.feed_update(bot, Update.model_validate({"update_id": 2, "callback_query": query}))
+    assert REGISTRY.get_sample_value("bot_update_lag_seconds_count", labels) == 1